@@ -11,6 +11,8 @@ const dotenv = require('dotenv');
 const openaiRoutes = require('./openai-routes');
 const morgan = require('morgan');
 const logger = require('./utils/logger');
+const fileReader = require('./utils/file-reader');
+const { contentHash, createChangeJournal } = require('./utils/change-journal');
 const archiver = require('archiver');
 const multer = require('multer');
 const AdmZip = require('adm-zip');
@@ -28,8 +30,12 @@ function createApp() {
     const port = process.env.PORT || 4000;
     let server = null;
     let childProcess = null;
+    // Commands running that may change files; like the app server they write without journal entries
+    let runningWriters = 0;
     let wss = null;
     const shellSessions = new Map();
+    const runningCommands = new Map();
+    const changes = createChangeJournal();
 
     // Add response time tracking
     app.use((req, res, next) => {
@@ -128,6 +134,57 @@ function createApp() {
                 
                 res.json(fileDetails);
             } else {
+                const { start_line, end_line, offset, length, match, context, meta, full } = req.query;
+                const metadata = { path: relativePath, size: stats.size, modified: stats.mtime };
+
+                if (meta === 'true') {
+                    return res.json(metadata);
+                }
+
+                if (start_line !== undefined || end_line !== undefined) {
+                    const start = parseInt(start_line || '1', 10);
+                    const end = end_line !== undefined ? parseInt(end_line, 10) : Infinity;
+                    if (!(start >= 1) || !(end >= start)) {
+                        return res.status(400).json({ error: 'start_line and end_line must be positive, with end_line >= start_line' });
+                    }
+                    const range = await fileReader.readLineRange(fullPath, start, end);
+                    logger.info('File line range read', { path: relativePath, start, end: range.endLine });
+                    return res.json({ ...metadata, ...range });
+                }
+
+                if (offset !== undefined || length !== undefined) {
+                    const start = parseInt(offset || '0', 10);
+                    const count = length !== undefined ? parseInt(length, 10) : fileReader.MAX_RANGE_BYTES;
+                    if (!(start >= 0) || !(count >= 0)) {
+                        return res.status(400).json({ error: 'offset and length must be non-negative' });
+                    }
+                    const range = await fileReader.readByteRange(fullPath, start, count);
+                    logger.info('File byte range read', { path: relativePath, offset: start, length: range.length });
+                    return res.json({ ...metadata, ...range });
+                }
+
+                if (match !== undefined) {
+                    const contextLines = parseInt(context || '5', 10);
+                    let matches;
+                    try {
+                        matches = await fileReader.readAroundMatch(fullPath, match, Math.max(0, contextLines || 0));
+                    } catch (error) {
+                        if (error instanceof SyntaxError) {
+                            return res.status(400).json({ error: `Invalid match pattern: ${error.message}` });
+                        }
+                        throw error;
+                    }
+                    logger.info('File searched', { path: relativePath, matches: matches.length });
+                    return res.json({ ...metadata, matches });
+                }
+
+                if (stats.size > fileReader.LARGE_FILE_BYTES && full !== 'true') {
+                    // Large files are summarized; the client asks for the part it needs
+                    const summary = await fileReader.summarize(fullPath);
+                    logger.info('Large file summarized', { path: relativePath, size: stats.size, lines: summary.lines });
+                    return res.json({ ...metadata, ...summary, truncated: true });
+                }
+
                 const content = await fs.readFile(fullPath, 'utf8');
                 logger.info('File read successful', { 
                     path: relativePath, 
@@ -160,6 +217,7 @@ function createApp() {
                 await fs.ensureFile(fullPath);
                 await fs.writeFile(fullPath, content);
             }
+            changes.record(relativePath, isDirectory ? '*' : contentHash(content));
             
             logger.info('File created successfully', { 
                 path: relativePath, 
@@ -187,6 +245,7 @@ function createApp() {
 
             const { content } = req.body;
             await fs.writeFile(fullPath, content);
+            changes.record(relativePath, contentHash(content));
             logger.info('File updated successfully', { 
                 path: relativePath, 
                 size: content.length 
@@ -211,6 +270,7 @@ function createApp() {
             }
 
             await fs.remove(fullPath);
+            changes.record(relativePath, null);
             logger.info('File deleted successfully', { 
                 path: relativePath 
             });
@@ -268,6 +328,7 @@ function createApp() {
                 });
                 logger.info('Dependencies installed');
 
+                changes.recordUnknown();
                 logger.info('App restored successfully');
                 res.json({ message: 'App restored successfully' });
             } finally {
@@ -373,6 +434,8 @@ function createApp() {
 
             // Move the file
             await fs.promises.rename(absoluteSourcePath, absoluteTargetPath);
+            changes.record(sourcePath, null);
+            changes.record(targetPath, '*');
             logger.info('File moved successfully', { 
                 sourcePath: absoluteSourcePath, 
                 targetPath: absoluteTargetPath 
@@ -414,6 +477,7 @@ function createApp() {
             } else {
                 await fs.promises.unlink(absolutePath);
             }
+            changes.record(filePath, null);
 
             logger.info('File deleted successfully', { 
                 path: absolutePath 
@@ -426,13 +490,38 @@ function createApp() {
     });
 
     // Command Execution
+    // Changes since a version of the change journal, for clients caching what they read
+    app.get('/workspace/changes', (req, res) => {
+        // Processes still running may write at any time (logs, build output, databases), so until they exit
+        // every client has to assume anything changed
+        if (childProcess || runningWriters > 0) {
+            changes.recordUnknown();
+        }
+        res.json(changes.since(req.query.since));
+    });
+
     app.post('/execute', (req, res) => {
         const { command, args = [] } = req.body;
+        // Clients mark commands that only read, like listings and type checks; any other command may change anything
+        const readOnly = req.get('X-Read-Only') === 'true';
         
         logger.logRequest(req, { 
             command, 
-            args 
+            args,
+            readOnly
         });
+        let writing = !readOnly;
+        if (writing) {
+            runningWriters += 1;
+            changes.recordUnknown();
+        }
+        const finishWriting = () => {
+            if (writing) {
+                writing = false;
+                runningWriters -= 1;
+                changes.recordUnknown();
+            }
+        };
 
         const proc = spawn(command, args, { 
             cwd: APP_DIR,
@@ -440,6 +529,20 @@ function createApp() {
             shell: true
         });
 
+        // Commands can be killed by id (DELETE /execute/:id) when the agent run is cancelled
+        const executionId = req.get('X-Execution-Id');
+        if (executionId) {
+            runningCommands.set(executionId, proc);
+        }
+
+        // Don't keep the container busy for a client that has gone away
+        res.on('close', () => {
+            if (!res.writableFinished && proc.exitCode === null) {
+                logger.info('Client disconnected, killing command', { command, args });
+                treeKill(proc.pid);
+            }
+        });
+
         let stdout = '';
         let stderr = '';
 
@@ -452,6 +555,13 @@ function createApp() {
         });
 
         proc.on('close', (code) => {
+            if (executionId) {
+                runningCommands.delete(executionId);
+            }
+            finishWriting();
+            if (res.headersSent || res.destroyed) {
+                return;
+            }
             if (code !== 0) {
                 logger.warn('Command execution failed', { 
                     command, 
@@ -478,6 +588,13 @@ function createApp() {
 
         proc.on('error', (error) => {
             logger.logError(error, req);
+            if (executionId) {
+                runningCommands.delete(executionId);
+            }
+            finishWriting();
+            if (res.headersSent) {
+                return;
+            }
             res.status(500).json({ 
                 error: error.message, 
                 stdout,
@@ -486,6 +603,18 @@ function createApp() {
         });
     });
 
+    app.delete('/execute/:id', (req, res) => {
+        const proc = runningCommands.get(req.params.id);
+        if (!proc) {
+            return res.status(404).json({ error: 'No running command with this id' });
+        }
+
+        logger.info('Killing command', { executionId: req.params.id });
+        treeKill(proc.pid);
+        runningCommands.delete(req.params.id);
+        res.json({ message: 'Command killed' });
+    });
+
     // App Server Management
     app.post('/server/start', (req, res) => {
         if (childProcess) {
@@ -495,6 +624,7 @@ function createApp() {
 
         const { command = 'npm', args = ['start'] } = req.body;
         childProcess = spawn(command, args, { cwd: APP_DIR });
+        changes.recordUnknown();
 
         childProcess.stdout.on('data', (data) => {
             logger.info('App output', { 
@@ -513,6 +643,7 @@ function createApp() {
                 code 
             });
             childProcess = null;
+            changes.recordUnknown();
         });
 
         logger.info('Server started', { 
@@ -585,6 +716,7 @@ function createApp() {
                             const { type, data } = JSON.parse(message);
                             switch (type) {
                                 case 'input':
+                                    changes.recordUnknown();
                                     term.write(data);
                                     break;
                                 case 'resize':
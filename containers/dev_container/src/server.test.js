@@ -58,6 +58,71 @@ describe('File System API', () => {
             expect(response.body.content).toBe(TEST_FILE_CONTENT);
         });
 
+        it('should read a line range', async () => {
+            const lines = Array.from({ length: 50 }, (_, i) => `line ${i + 1}`);
+            await fs.writeFile(path.join(APP_DIR, TEST_FILE_PATH), lines.join('\n'));
+
+            const response = await request(app)
+                .get(`/files/${TEST_FILE_PATH}?start_line=10&end_line=12`);
+
+            expect(response.status).toBe(200);
+            expect(response.body.content).toBe('line 10\nline 11\nline 12');
+            expect(response.body.endLine).toBe(12);
+        });
+
+        it('should read a byte range', async () => {
+            await fs.writeFile(path.join(APP_DIR, TEST_FILE_PATH), TEST_FILE_CONTENT);
+
+            const response = await request(app)
+                .get(`/files/${TEST_FILE_PATH}?offset=7&length=5`);
+
+            expect(response.status).toBe(200);
+            expect(response.body.content).toBe('World');
+            expect(response.body.size).toBe(TEST_FILE_CONTENT.length);
+        });
+
+        it('should return the lines around a match', async () => {
+            const lines = Array.from({ length: 50 }, (_, i) => (i === 29 ? 'function target() {' : `line ${i + 1}`));
+            await fs.writeFile(path.join(APP_DIR, TEST_FILE_PATH), lines.join('\n'));
+
+            const response = await request(app)
+                .get(`/files/${TEST_FILE_PATH}?match=target&context=1`);
+
+            expect(response.status).toBe(200);
+            expect(response.body.matches).toEqual([
+                { startLine: 29, endLine: 31, content: 'line 29\nfunction target() {\nline 31' },
+            ]);
+        });
+
+        it('should merge the windows of nearby matches', async () => {
+            const lines = Array.from({ length: 30 }, (_, i) => (i === 9 || i === 17 ? `target ${i + 1}` : `line ${i + 1}`));
+            await fs.writeFile(path.join(APP_DIR, TEST_FILE_PATH), lines.join('\n'));
+
+            const response = await request(app)
+                .get(`/files/${TEST_FILE_PATH}?match=target&context=5`);
+
+            expect(response.status).toBe(200);
+            expect(response.body.matches).toEqual([
+                { startLine: 5, endLine: 23, content: lines.slice(4, 23).join('\n') },
+            ]);
+        });
+
+        it('should summarize large files unless the full body is requested', async () => {
+            const lines = Array.from({ length: 5000 }, (_, i) => (i % 100 === 0 ? `def function_${i}():` : '    pass  # padding'));
+            await fs.writeFile(path.join(APP_DIR, 'large.py'), lines.join('\n'));
+
+            const response = await request(app).get('/files/large.py');
+
+            expect(response.status).toBe(200);
+            expect(response.body.content).toBeUndefined();
+            expect(response.body.truncated).toBe(true);
+            expect(response.body.lines).toBe(5000);
+            expect(response.body.outline[1]).toEqual({ line: 101, text: 'def function_100():' });
+
+            const full = await request(app).get('/files/large.py?full=true');
+            expect(full.body.content).toBe(lines.join('\n'));
+        });
+
         it('should return 404 for non-existent files', async () => {
             const response = await request(app)
                 .get('/files/nonexistent.txt');
@@ -193,6 +258,81 @@ describe('Command Execution API', () => {
 
         expect(response.status).toBe(500);
     });
+
+    it('should kill a running command by execution id', async () => {
+        const running = request(app)
+            .post('/execute')
+            .set('X-Execution-Id', 'test-execution')
+            .send({ command: 'sleep', args: ['30'] })
+            .then(response => response);
+
+        await new Promise(resolve => setTimeout(resolve, 200));
+        const killResponse = await request(app).delete('/execute/test-execution');
+        expect(killResponse.status).toBe(200);
+
+        const response = await running;
+        expect(response.status).toBe(500);
+    });
+
+    it('should return 404 when killing an unknown command', async () => {
+        const response = await request(app).delete('/execute/unknown');
+        expect(response.status).toBe(404);
+    });
+});
+
+describe('Change Journal API', () => {
+    let app;
+    let stopServer;
+
+    beforeEach(async () => {
+        await fs.emptyDir(APP_DIR);
+        const instance = createApp();
+        app = instance.app;
+        stopServer = instance.stopServer;
+    });
+
+    afterEach(async () => {
+        if (stopServer) {
+            await stopServer();
+        }
+    });
+
+    it('should report file changes with their content hash', async () => {
+        const start = (await request(app).get('/workspace/changes?since=0')).body;
+        await request(app).post('/files/src/app.js').send({ content: 'x' });
+        await request(app).delete(`/files/src/app.js`);
+
+        const response = await request(app).get(`/workspace/changes?since=${start.version}`);
+        expect(response.status).toBe(200);
+        expect(response.body.reset).toBe(false);
+        expect(response.body.changes).toEqual([
+            { path: 'src/app.js', hash: '11f6ad8ec52a2984abaafd7c3b516503785c2072' },
+            { path: 'src/app.js', hash: null },
+        ]);
+    });
+
+    it('should reset after commands that may change files', async () => {
+        const start = (await request(app).get('/workspace/changes?since=0')).body;
+        await request(app).post('/execute').set('X-Read-Only', 'true').send({ command: 'ls' });
+        expect((await request(app).get(`/workspace/changes?since=${start.version}`)).body.reset).toBe(false);
+
+        await request(app).post('/execute').send({ command: 'touch', args: ['new.txt'] });
+        expect((await request(app).get(`/workspace/changes?since=${start.version}`)).body.reset).toBe(true);
+    });
+
+    it('should reset on every request while the app server runs', async () => {
+        await request(app).post('/server/start').send({ command: 'node', args: ['-e', 'setInterval(() => {}, 1000)'] });
+        const first = (await request(app).get('/workspace/changes?since=0')).body;
+        const second = (await request(app).get(`/workspace/changes?since=${first.version}`)).body;
+        expect(second.reset).toBe(true);
+
+        await request(app).post('/server/stop');
+        // The exit of the app is a last change
+        await new Promise((resolve) => setTimeout(resolve, 200));
+        const stopped = (await request(app).get(`/workspace/changes?since=${second.version}`)).body;
+        const after = (await request(app).get(`/workspace/changes?since=${stopped.version}`)).body;
+        expect(after.reset).toBe(false);
+    });
 });
 
 describe('Server Management API', () => {
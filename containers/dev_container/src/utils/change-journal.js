@@ -0,0 +1,70 @@
+const crypto = require('crypto');
+const path = require('path');
+
+// Most changes kept; clients further behind start over
+const CHANGE_JOURNAL_SIZE = parseInt(process.env.CHANGE_JOURNAL_SIZE || '1000', 10);
+
+// Content written by a file endpoint, hashed the same way by the agent
+function contentHash(content) {
+    return crypto.createHash('sha1').update(content || '', 'utf8').digest('hex');
+}
+
+function normalize(relativePath) {
+    const normalized = path.posix.normalize(String(relativePath || '').replace(/^\/+|\/+$/g, ''));
+    return normalized === '' ? '.' : normalized;
+}
+
+// Journal of changes to the app directory, so clients can tell what changed since they last looked.
+// Each change has a version; a change of a known path carries the content hash of the file, null
+// when the path was deleted, or '*' when its content is unknown (a directory, a moved file).
+// Changes the server cannot attribute to paths (commands, terminal input, uploads) reset the journal:
+// clients behind such a change must assume anything may have changed.
+function createChangeJournal(maxEntries = CHANGE_JOURNAL_SIZE) {
+    // Tells clients apart from a journal of an earlier server process
+    const instance = crypto.randomBytes(8).toString('hex');
+    let version = 0;
+    let resetAt = 0;
+    let droppedUpTo = 0;
+    let entries = [];
+
+    return {
+        instance,
+
+        get version() {
+            return version;
+        },
+
+        record(relativePath, hash) {
+            version += 1;
+            entries.push({ version, path: normalize(relativePath), hash });
+            if (entries.length > maxEntries) {
+                droppedUpTo = entries[entries.length - maxEntries - 1].version;
+                entries = entries.slice(-maxEntries);
+            }
+        },
+
+        recordUnknown() {
+            version += 1;
+            resetAt = version;
+            entries = [];
+        },
+
+        since(clientVersion) {
+            const since = Number.parseInt(clientVersion, 10);
+            const reset = !(since >= 0) || since > version || since < resetAt || since < droppedUpTo;
+            return {
+                instance,
+                version,
+                reset,
+                changes: reset ? [] : entries
+                    .filter((entry) => entry.version > since)
+                    .map(({ path: changedPath, hash }) => ({ path: changedPath, hash })),
+            };
+        },
+    };
+}
+
+module.exports = {
+    contentHash,
+    createChangeJournal,
+};
@@ -0,0 +1,142 @@
+const fs = require('fs-extra');
+const readline = require('readline');
+
+// Files larger than this are summarized unless a range or the full body is requested
+const LARGE_FILE_BYTES = parseInt(process.env.LARGE_FILE_BYTES || '65536', 10);
+// Most bytes returned by a single byte-range read
+const MAX_RANGE_BYTES = parseInt(process.env.MAX_RANGE_BYTES || '262144', 10);
+const MAX_OUTLINE_ENTRIES = 200;
+const MAX_MATCHES = 20;
+
+// Declarations worth listing in an outline, across the languages the workspace usually holds
+const OUTLINE_PATTERNS = [
+    /^\s*(?:export\s+)?(?:default\s+)?(?:async\s+)?(?:function\*?|class|interface|type|enum)\s+[\w$]+/,
+    /^\s*(?:export\s+)?(?:const|let|var)\s+[\w$]+\s*=\s*(?:async\s+)?(?:function|\([^)]*\)\s*=>|[\w$]+\s*=>)/,
+    /^\s*(?:async\s+)?def\s+\w+|^\s*class\s+\w+/,
+    /^\s*(?:pub\s+)?(?:fn|struct|enum|trait|impl)\b/,
+    /^\s*func\s+/,
+    /^#{1,6}\s+\S/,
+];
+
+function lineReader(fullPath) {
+    return readline.createInterface({
+        input: fs.createReadStream(fullPath, { encoding: 'utf8' }),
+        crlfDelay: Infinity,
+    });
+}
+
+// Read lines start..end (1-based, inclusive) without loading the rest of the file
+async function readLineRange(fullPath, start, end) {
+    const lines = [];
+    let lineNumber = 0;
+    const reader = lineReader(fullPath);
+    for await (const line of reader) {
+        lineNumber += 1;
+        if (lineNumber > end) {
+            break;
+        }
+        if (lineNumber >= start) {
+            lines.push(line);
+        }
+    }
+    reader.close();
+    return {
+        content: lines.join('\n'),
+        startLine: start,
+        endLine: start + lines.length - 1,
+    };
+}
+
+// Read `length` bytes from `offset`, capped at MAX_RANGE_BYTES
+async function readByteRange(fullPath, offset, length) {
+    const size = Math.max(0, Math.min(length, MAX_RANGE_BYTES));
+    const buffer = Buffer.alloc(size);
+    const fd = await fs.open(fullPath, 'r');
+    try {
+        const { bytesRead } = await fs.read(fd, buffer, 0, size, offset);
+        return { content: buffer.subarray(0, bytesRead).toString('utf8'), offset, length: bytesRead };
+    } finally {
+        await fs.close(fd);
+    }
+}
+
+// Lines matching a pattern, each with `context` lines around it; overlapping windows are merged
+// Open a window for a match, extending the previous one if their context overlaps or touches
+function startWindow(windows, lineNumber, before) {
+    const startLine = lineNumber - before.length;
+    const previous = windows[windows.length - 1];
+    if (!previous || previous.startLine + previous.lines.length < startLine) {
+        return { startLine, lines: [...before] };
+    }
+    windows.pop();
+    const gap = lineNumber - (previous.startLine + previous.lines.length);
+    previous.lines.push(...before.slice(before.length - gap));
+    return previous;
+}
+
+async function readAroundMatch(fullPath, pattern, context) {
+    const regex = new RegExp(pattern);
+    const before = [];
+    const windows = [];
+    let current = null;
+    let lineNumber = 0;
+    let matches = 0;
+    const reader = lineReader(fullPath);
+    for await (const line of reader) {
+        lineNumber += 1;
+        const matched = matches < MAX_MATCHES && regex.test(line);
+        if (matched) {
+            matches += 1;
+            if (!current) {
+                current = startWindow(windows, lineNumber, before);
+            }
+            current.lines.push(line);
+            current.until = lineNumber + context;
+        } else if (current && lineNumber <= current.until) {
+            current.lines.push(line);
+        } else if (current) {
+            windows.push(current);
+            current = null;
+            if (matches >= MAX_MATCHES) {
+                break;
+            }
+        }
+        before.push(line);
+        if (before.length > context) {
+            before.shift();
+        }
+    }
+    reader.close();
+    if (current) {
+        windows.push(current);
+    }
+    return windows.map(({ startLine, lines }) => ({
+        startLine,
+        endLine: startLine + lines.length - 1,
+        content: lines.join('\n'),
+    }));
+}
+
+// Line count and top-level declarations of a file, for files too large to return whole
+async function summarize(fullPath) {
+    const outline = [];
+    let lineNumber = 0;
+    const reader = lineReader(fullPath);
+    for await (const line of reader) {
+        lineNumber += 1;
+        if (outline.length < MAX_OUTLINE_ENTRIES && line.length < 300 && OUTLINE_PATTERNS.some((p) => p.test(line))) {
+            outline.push({ line: lineNumber, text: line.trim() });
+        }
+    }
+    reader.close();
+    return { lines: lineNumber, outline };
+}
+
+module.exports = {
+    LARGE_FILE_BYTES,
+    MAX_RANGE_BYTES,
+    readLineRange,
+    readByteRange,
+    readAroundMatch,
+    summarize,
+};
@@ -0,0 +1,5 @@
+"""Offline benchmarks for the agent runtime.
+
+They run the real AgentGraph against a scripted LLM and an in-process stub of
+the dev_container API, so they need neither network access nor API keys.
+"""
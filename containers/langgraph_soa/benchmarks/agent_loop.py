@@ -0,0 +1,241 @@
+"""Micro-benchmarks of the agent loop.
+
+Runs sessions of 10, 100 and 500 steps through the real AgentGraph with a
+scripted LLM and an in-process dev_container stub, and measures:
+
+- the wall time of a step and the framework overhead within it (everything
+  except the LLM call and the tool's HTTP round trip),
+- how much slower the last steps of a session are than the first ones,
+  which exposes per-step work that grows with the history,
+- the cost of formatting the history for the provider, per message,
+- the memory retained per step (tracemalloc, in a separate pass).
+
+Results are compared against ``baseline.json``, and the growth metrics
+against absolute limits as well, so a baseline recorded with a regression
+does not make it acceptable. The command exits with status 1 on a
+regression, so it can gate changes to the runtime:
+
+    python -m benchmarks.agent_loop                    # compare with the baseline
+    python -m benchmarks.agent_loop --update-baseline  # after an intended change
+"""
+from typing import Any, Dict, List, Optional, Sequence
+import argparse
+import gc
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+# src.agent.graph builds a default agent at import time; keep it offline and in memory
+os.environ.setdefault("ANTHROPIC_API_KEY", "benchmark")
+os.environ["CHECKPOINT_URL"] = "memory"
+
+from langchain_core.messages import HumanMessage, SystemMessage
+
+from benchmarks.fakes import DevContainerStub
+from src.agent.checkpoint import create_checkpointer
+from src.agent.graph import AgentGraph
+from src.config.llm_config import LLMConfig
+from src.llm.anthropic_llm import AnthropicLLM
+from src.runtime.budget import ExecutionBudget, StopReason
+from src.runtime.context import RunContext
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+DEFAULT_STEPS = (10, 100, 500)
+
+# Allowed slowdown relative to the baseline, by metric. Absolute timings vary
+# between machines, so they only catch gross regressions; the scaling ratio
+# and memory per step are stable and catch growth with the history.
+TOLERANCES = {
+    "us_per_step": 2.0,
+    "overhead_us_per_step": 2.0,
+    "format_us_per_message": 2.0,
+    "late_early_ratio": 1.5,
+    "kb_per_step": 1.3,
+}
+# Differences below these are noise, whatever the ratio
+ABSOLUTE_SLACK = {
+    "us_per_step": 200.0,
+    "overhead_us_per_step": 200.0,
+    "format_us_per_message": 2.0,
+    "late_early_ratio": 0.3,
+    "kb_per_step": 4.0,
+}
+# Limits whatever the baseline: the last steps of a session may not be much
+# slower than the first ones, and a step may only retain its own messages
+ABSOLUTE_LIMITS = {
+    "late_early_ratio": 2.0,
+    "kb_per_step": 32.0,
+}
+
+def run_session(steps: int, stub: DevContainerStub, context: Optional[RunContext] = None) -> Dict[str, Any]:
+    """Run one session of the given number of steps against the stub.
+
+    Returns:
+        Final state of the run
+    """
+    # Checkpoints go to SQLite as in production; an in-memory saver keeps a copy
+    # of the history per step, and collecting it slows the late steps down
+    with tempfile.TemporaryDirectory() as directory:
+        checkpointer = create_checkpointer(f"sqlite:///{os.path.join(directory, 'checkpoints.sqlite')}")
+        try:
+            return _run_session(steps, stub, context, checkpointer)
+        finally:
+            checkpointer.conn.close()
+
+def _run_session(steps: int, stub: DevContainerStub, context: Optional[RunContext], checkpointer: Any) -> Dict[str, Any]:
+    graph = AgentGraph(LLMConfig(llm_type="scripted", model_name="scripted", temperature=0.0), checkpointer=checkpointer)
+    graph.llm.steps = steps
+    # Speculative reads overlap the LLM call, which would blur the split between LLM, tool and framework time
+    graph.speculative_tool_calls = False
+    for tool in graph.tools:
+        tool.base_url = stub.url
+
+    state = {"messages": [HumanMessage(content="Implement the modules and run their tests.")], "chat_history": [], "session_id": f"bench-{steps}"}
+    result = graph.run(state, budget=ExecutionBudget.unlimited(), context=context)
+    graph.tool_executor.shutdown()
+    if result["stop_reason"] != StopReason.COMPLETED or result["usage"]["steps"] != steps + 1:
+        raise RuntimeError(f"Benchmark session did not complete as scripted: {result['stop_reason']} after {result['usage']['steps']} steps")
+    return result
+
+def measure_loop(steps: int, stub: DevContainerStub) -> Dict[str, Any]:
+    """Time the steps of one session from its trace."""
+    gc.collect()
+    context = RunContext()
+    result = run_session(steps, stub, context)
+    events = context.tracer.to_chrome_trace()["traceEvents"]
+
+    step_starts = sorted(e["ts"] for e in events if e["name"] == "node:agent")
+    session_end = max(e["ts"] + e.get("dur", 0) for e in events if e["ph"] != "M")
+    boundaries = step_starts + [session_end]
+    step_times = []
+    overheads = []
+    for start, end in zip(boundaries, boundaries[1:]):
+        # LLM and tool spans never overlap without speculative reads
+        work = sum(
+            e["dur"] for e in events
+            if e["ph"] == "X" and (e["name"] == "llm_call" or e["name"].startswith("tool:")) and start <= e["ts"] < end
+        )
+        step_times.append(end - start)
+        overheads.append(end - start - work)
+    # The final answer step has no tool call
+    step_times, overheads = step_times[:-1], overheads[:-1]
+
+    window = max(1, steps // 10)
+    metrics = {
+        "us_per_step": statistics.median(step_times),
+        "overhead_us_per_step": statistics.median(overheads),
+    }
+    if steps >= 100:
+        metrics["late_early_ratio"] = statistics.median(step_times[-window:]) / statistics.median(step_times[:window])
+    return {"metrics": metrics, "messages": result["messages"]}
+
+def measure_formatting(messages: Sequence[Any], repeat: int = 5) -> float:
+    """Microseconds spent per message formatting a history for the Anthropic API."""
+    adapter = AnthropicLLM()
+    history = [SystemMessage(content="benchmark")] + list(messages)
+    timings = []
+    for _ in range(repeat):
+        started_at = time.perf_counter()
+        adapter._format_messages_for_anthropic(history)
+        timings.append(time.perf_counter() - started_at)
+    return min(timings) * 1_000_000 / len(history)
+
+def measure_memory(steps: int, stub: DevContainerStub) -> float:
+    """Kilobytes retained per step once a session has finished."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        result = run_session(steps, stub)
+        # The graph of the session is garbage by now, but only freed by the cycle collector
+        gc.collect()
+        retained = tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+    del result
+    return retained / 1024 / steps
+
+def run_benchmarks(step_counts: Sequence[int]) -> Dict[str, Dict[str, float]]:
+    """Run every benchmark for each session length.
+
+    Returns:
+        Metrics by session length, e.g. ``{"steps_100": {"us_per_step": ...}}``
+    """
+    results = {}
+    with DevContainerStub() as stub:
+        # Warm up imports, connection pools and caches
+        run_session(5, stub)
+        for steps in step_counts:
+            # Timings are noisy, so repeat each session and keep the best run
+            runs = [measure_loop(steps, stub) for _ in range(max(3, 200 // steps))]
+            metrics = {key: min(run["metrics"][key] for run in runs) for key in runs[0]["metrics"]}
+            metrics["format_us_per_message"] = measure_formatting(runs[0]["messages"])
+            metrics["kb_per_step"] = measure_memory(steps, stub)
+            results[f"steps_{steps}"] = {key: round(value, 3) for key, value in metrics.items()}
+    return results
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]]) -> List[str]:
+    """Find the metrics that regressed beyond their tolerance or exceed their absolute limit.
+
+    Returns:
+        One description per regression
+    """
+    regressions = []
+    for session, metrics in results.items():
+        for key, value in metrics.items():
+            if key in ABSOLUTE_LIMITS and value > ABSOLUTE_LIMITS[key]:
+                regressions.append(f"{session}.{key}: {value:g} (absolute limit {ABSOLUTE_LIMITS[key]:g})")
+                continue
+            expected = baseline.get(session, {}).get(key)
+            if expected is None:
+                continue
+            limit = max(expected * TOLERANCES[key], expected + ABSOLUTE_SLACK[key])
+            if value > limit:
+                regressions.append(f"{session}.{key}: {value:g} (baseline {expected:g}, limit {limit:g})")
+    return regressions
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--steps", type=int, nargs="+", default=list(DEFAULT_STEPS), help="Session lengths to run")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="Baseline file to compare against")
+    parser.add_argument("--update-baseline", action="store_true", help="Store the results as the new baseline")
+    parser.add_argument("--output", help="Also write the results to this file")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.steps)
+    report = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+    print(json.dumps(report, indent=2))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.update_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+            f.write("\n")
+        print(f"Baseline written to {args.baseline}", file=sys.stderr)
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --update-baseline first", file=sys.stderr)
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)["results"]
+    regressions = compare(results, baseline)
+    for regression in regressions:
+        print(f"REGRESSION {regression}", file=sys.stderr)
+    if not regressions:
+        print("No regressions against the baseline", file=sys.stderr)
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
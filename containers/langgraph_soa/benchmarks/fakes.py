@@ -0,0 +1,266 @@
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+import hashlib
+import json
+import re
+import threading
+import time
+from urllib.parse import parse_qsl
+
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, HumanMessage
+
+from src.llm.base import BaseLLM, ToolCallCallback
+from src.llm.factory import LLMFactory
+
+class ScriptedLLM(BaseLLM):
+    """Deterministic stand-in for a model that works through a coding task.
+
+    Each step requests one tool call, cycling through writing a file, reading
+    it back and running a command, and the call after ``steps`` steps gives
+    the final answer. A prompt containing ``[steps=N]`` overrides the number
+    of steps for its run. The step is derived from the messages of the run,
+    so one instance can serve concurrent sessions. Asked to plan with the
+    planner prompt, it splits a prompt containing ``[subtasks=N]`` into N
+    subtasks of ``[steps=N]`` steps each.
+
+    Responses are streamed through ``_collect_stream`` like the real adapters
+    do, so the streaming path is part of the measurement. The latency
+    attributes mimic a real provider: ``first_token_latency`` seconds before
+    the first chunk and ``chunk_latency`` seconds before each further chunk.
+    """
+
+    def __init__(self, model_name: str = "scripted", temperature: float = 0.0):
+        self.model_name = model_name
+        self.steps = 10
+        self.first_token_latency = 0.0
+        self.chunk_latency = 0.0
+
+    def initialize(self) -> None:
+        pass
+
+    def invoke(self, messages: List[BaseMessage], tools: List[Dict[str, Any]] = None, on_tool_call: Optional[ToolCallCallback] = None) -> BaseMessage:
+        steps, step = self._progress(messages)
+        if not tools and '"subtasks"' in str(messages[0].content):
+            chunks = [AIMessageChunk(content=json.dumps({"subtasks": self._plan(messages, steps)}))]
+        elif step > steps:
+            chunks = [AIMessageChunk(content=f"Done after {steps} steps.")]
+        else:
+            name, arguments = self._tool_call(step)
+            encoded = json.dumps(arguments)
+            middle = len(encoded) // 2
+            chunks = [
+                AIMessageChunk(content=f"Step {step}: calling {name}."),
+                AIMessageChunk(content="", tool_call_chunks=[{"index": 0, "id": f"call_{step}", "name": name, "args": encoded[:middle]}]),
+                AIMessageChunk(content="", tool_call_chunks=[{"index": 0, "id": None, "name": None, "args": encoded[middle:]}]),
+            ]
+        chunks.append(AIMessageChunk(content="", usage_metadata={"input_tokens": 1000, "output_tokens": 50, "total_tokens": 1050}))
+        return self._collect_stream(self._stream(chunks), on_tool_call)
+
+    def get_model_name(self) -> str:
+        return self.model_name
+
+    def _progress(self, messages: List[BaseMessage]) -> tuple:
+        """Number of steps of the current run and the step about to be taken."""
+        prompt_index = max((i for i, msg in enumerate(messages) if isinstance(msg, HumanMessage)), default=-1)
+        steps = self.steps
+        if prompt_index >= 0:
+            match = re.search(r"\[steps=(\d+)\]", str(messages[prompt_index].content))
+            if match:
+                steps = int(match.group(1))
+        taken = sum(1 for msg in messages[prompt_index + 1:] if isinstance(msg, AIMessage) and msg.additional_kwargs.get("tool_calls"))
+        return steps, taken + 1
+
+    def _plan(self, messages: List[BaseMessage], steps: int) -> List[Dict[str, Any]]:
+        """Subtasks requested by the prompt for a planning call."""
+        match = re.search(r"\[subtasks=(\d+)\]", str(messages[-1].content))
+        count = int(match.group(1)) if match else 0
+        return [
+            {"title": f"Part {i}", "instructions": f"Write part {i} [steps={steps}]", "files": [f"src/module_{i}.py"]}
+            for i in range(1, count + 1)
+        ]
+
+    def _stream(self, chunks: List[AIMessageChunk]) -> Iterator[AIMessageChunk]:
+        for index, chunk in enumerate(chunks):
+            delay = self.first_token_latency if index == 0 else self.chunk_latency
+            if delay:
+                time.sleep(delay)
+            yield chunk
+
+    def _tool_call(self, step: int) -> tuple:
+        """Tool name and arguments requested at the given step."""
+        module = f"src/module_{(step - 1) // 3}.py"
+        kind = (step - 1) % 3
+        if kind == 0:
+            body = "".join(f"def function_{i}(value):\n    return value * {i}\n\n" for i in range(8))
+            return "file_system", {"path": module, "content": body}
+        if kind == 1:
+            return "file_system", {"path": module}
+        return "execute_command", {"command": "python", "args": ["-m", "pytest", "-q", module]}
+
+LLMFactory.register_llm("scripted", ScriptedLLM)
+
+class DevContainerStub:
+    """In-process HTTP server implementing the dev_container endpoints used by the tools.
+
+    Files are kept in memory and commands are echoed instead of executed.
+    Every request takes ``latency`` seconds, and commands ``command_latency``
+    seconds more, to mimic a real container. Setting ``unavailable`` answers
+    every request with 503, like a container that is restarting. A
+    ``command_handler`` takes the command line and returns its exit code and
+    output, for tests that need real command results. Changes are reported
+    through a change journal like the real container's.
+    """
+
+    def __init__(self, latency: float = 0.0, command_latency: float = 0.0):
+        self.files: Dict[str, str] = {}
+        self.requests = 0
+        self.latency = latency
+        self.command_latency = command_latency
+        self.unavailable = False
+        self.command_handler: Optional[Callable[[str], Tuple[int, str]]] = None
+        self.commands = 0
+        self.version = 0
+        self.reset_at = 0
+        self.changes: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), _handler_for(self))
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> 'DevContainerStub':
+        """Serve requests from a background thread."""
+        self._thread = threading.Thread(target=self._server.serve_forever, name="dev-container-stub", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Shut the server down and close its socket."""
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> 'DevContainerStub':
+        return self.start()
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.stop()
+
+    def handle(self, method: str, path: str, body: Dict[str, Any], headers: Optional[Dict[str, str]] = None) -> tuple:
+        """Serve one request.
+
+        Returns:
+            Tuple of HTTP status and JSON response body
+        """
+        with self._lock:
+            self.requests += 1
+            if self.unavailable:
+                return 503, {"error": "Service unavailable"}
+            if method == "GET" and path == "/server/status":
+                return 200, {"running": False, "pid": None}
+            if method == "GET" and path.startswith("/workspace/changes"):
+                since = int(dict(parse_qsl(path.partition("?")[2])).get("since", 0))
+                reset = since < self.reset_at or since > self.version
+                changes = [] if reset else [{"path": c["path"], "hash": c["hash"]} for c in self.changes if c["version"] > since]
+                return 200, {"instance": "stub", "version": self.version, "reset": reset, "changes": changes}
+            if path.startswith("/files/"):
+                path, _, query = path.partition("?")
+                return self._handle_file(method, path[len("/files/"):].strip("/"), body, dict(parse_qsl(query)))
+            if method == "POST" and path == "/execute":
+                arguments = " ".join([body.get("command", "")] + list(body.get("args", [])))
+                self.commands += 1
+                if (headers or {}).get("X-Read-Only") != "true":
+                    self.version += 1
+                    self.reset_at = self.version
+                if self.command_handler is not None:
+                    code, stdout = self.command_handler(arguments)
+                    if code != 0:
+                        return 500, {"error": f"Process exited with code {code}", "stdout": stdout, "stderr": "", "code": code}
+                    return 200, {"stdout": stdout, "stderr": ""}
+                return 200, {"stdout": f"$ {arguments}\n1 passed in 0.01s\n", "stderr": ""}
+            if method == "DELETE" and path.startswith("/execute/"):
+                return 404, {"error": "No running command with this id"}
+            if method == "POST" and path == "/move":
+                source, target = body.get("sourcePath", ""), body.get("targetPath", "")
+                if source not in self.files:
+                    return 404, {"error": "Source not found"}
+                self.files[target] = self.files.pop(source)
+                self._record(source, None)
+                self._record(target, "*")
+                return 200, {"message": "Moved successfully"}
+            if method == "DELETE" and path == "/delete":
+                prefix = body.get("path", "").strip("/") + "/"
+                for name in [name for name in self.files if name.startswith(prefix)]:
+                    del self.files[name]
+                self._record(prefix, None)
+                return 200, {"message": "Deleted successfully"}
+            return 404, {"error": "Not found"}
+
+    def _handle_file(self, method: str, name: str, body: Dict[str, Any], query: Dict[str, str]) -> tuple:
+        if method == "GET":
+            if name in self.files:
+                content = self.files[name]
+                if query.get("meta") == "true":
+                    return 200, {"path": name, "size": len(content.encode())}
+                if "start_line" in query:
+                    # Line ranges only; the other ranged reads return the whole file
+                    start = int(query["start_line"])
+                    lines = content.split("\n")[start - 1:int(query.get("end_line", 0)) or None]
+                    return 200, {"content": "\n".join(lines), "startLine": start, "endLine": start + len(lines) - 1}
+                return 200, {"content": content}
+            prefix = f"{name}/" if name else ""
+            entries = sorted({entry[len(prefix):].split("/")[0] for entry in self.files if entry.startswith(prefix)})
+            if not entries:
+                return 404, {"error": "File not found"}
+            return 200, [{"name": entry, "isDirectory": f"{prefix}{entry}" not in self.files} for entry in entries]
+        if method in ("POST", "PUT"):
+            if not body.get("isDirectory"):
+                self.files[name] = body.get("content") or ""
+                self._record(name, hashlib.sha1(self.files[name].encode()).hexdigest())
+            else:
+                self._record(name, "*")
+            return 200, {"message": "Created successfully" if method == "POST" else "Updated successfully"}
+        if method == "DELETE":
+            if self.files.pop(name, None) is None:
+                return 404, {"error": "File not found"}
+            self._record(name, None)
+            return 200, {"message": "Deleted successfully"}
+        return 405, {"error": "Method not allowed"}
+
+    def _record(self, path: str, hash_: Optional[str]) -> None:
+        """Add a change to the change journal."""
+        self.version += 1
+        self.changes.append({"version": self.version, "path": path.strip("/") or ".", "hash": hash_})
+
+def _handler_for(stub: DevContainerStub) -> type:
+    """Build a request handler class bound to a stub."""
+
+    class Handler(BaseHTTPRequestHandler):
+        # Keep-alive, so the tools' pooled connections are reused as with the real container
+        protocol_version = "HTTP/1.1"
+        # Headers and body are separate writes; without this, delayed ACKs add ~40ms per request
+        disable_nagle_algorithm = True
+
+        def _dispatch(self) -> None:
+            length = int(self.headers.get("Content-Length") or 0)
+            body = json.loads(self.rfile.read(length)) if length else {}
+            delay = stub.latency + (stub.command_latency if self.path == "/execute" else 0.0)
+            if delay:
+                time.sleep(delay)
+            status, payload = stub.handle(self.command, self.path, body, dict(self.headers))
+            encoded = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(encoded)))
+            self.end_headers()
+            self.wfile.write(encoded)
+
+        do_GET = do_POST = do_PUT = do_DELETE = _dispatch
+
+        def log_message(self, format: str, *args: Any) -> None:
+            pass
+
+    return Handler
@@ -0,0 +1,276 @@
+"""Load test of the FastAPI server.
+
+Serves ``server.app`` with uvicorn in this process, switches it to the
+scripted LLM through ``POST /api/llm/config`` and points the tools at an
+in-process dev_container stub. Simulated users then replay a mix of short,
+medium and long multi-turn sessions against ``/run`` at each concurrency
+level, and the run reports per level:
+
+- throughput and latency percentiles of ``/run``, and how many runs were
+  shed by the scheduler (429) or failed, counting runs whose tool calls all
+  failed as failed,
+- event-loop lag of the server, measured by a probe task on its loop,
+- resident memory of the process.
+
+Stub latencies default to values typical of a hosted model and can be set
+on the command line. Results are written as JSON, tagged with the current
+commit, so runs on different commits can be compared:
+
+    python -m benchmarks.load_test --concurrency 1 10 100 --duration 30
+"""
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import socket
+import subprocess
+import sys
+import threading
+import time
+import uuid
+
+# server.py builds the default agent at import time; keep it offline and in memory
+os.environ.setdefault("ANTHROPIC_API_KEY", "benchmark")
+os.environ.setdefault("LOG_LEVEL", "ERROR")
+os.environ["CHECKPOINT_URL"] = "memory"
+
+import httpx
+import uvicorn
+from langchain_core.messages import ToolMessage
+
+import server
+from benchmarks.fakes import DevContainerStub
+from src.llm.router import tool_failed
+
+DEFAULT_CONCURRENCY = (1, 10, 100)
+LAG_PROBE_INTERVAL = 0.05
+
+@dataclass
+class SessionProfile:
+    """A kind of session replayed by the simulated users."""
+    name: str
+    weight: float
+    turns: int
+    steps: int
+
+# Mostly quick questions, some longer iterations and a few big tasks
+WORKLOAD = [
+    SessionProfile("short", weight=0.5, turns=1, steps=2),
+    SessionProfile("medium", weight=0.35, turns=2, steps=6),
+    SessionProfile("long", weight=0.15, turns=1, steps=20),
+]
+
+class ServerUnderTest:
+    """Runs the app with uvicorn on its own thread and event loop."""
+
+    def __init__(self, app: Any):
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            self.port = sock.getsockname()[1]
+        self.url = f"http://127.0.0.1:{self.port}"
+        self.loop_lag: List[float] = []
+        self._server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=self.port, log_level="warning", lifespan="on"))
+        self._thread = threading.Thread(target=asyncio.run, args=(self._serve(),), name="server-under-test", daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+        while not self._server.started:
+            if not self._thread.is_alive():
+                raise RuntimeError("Server failed to start")
+            time.sleep(0.05)
+
+    def stop(self) -> None:
+        self._server.should_exit = True
+        self._thread.join()
+
+    async def _serve(self) -> None:
+        probe = asyncio.create_task(self._probe_loop_lag())
+        try:
+            await self._server.serve()
+        finally:
+            probe.cancel()
+
+    async def _probe_loop_lag(self) -> None:
+        """Record how late the loop wakes up a task that sleeps for a fixed interval."""
+        loop = asyncio.get_running_loop()
+        while True:
+            scheduled = loop.time() + LAG_PROBE_INTERVAL
+            await asyncio.sleep(LAG_PROBE_INTERVAL)
+            self.loop_lag.append(max(0.0, loop.time() - scheduled))
+
+class RssSampler:
+    """Samples the resident set size of this process in the background."""
+
+    def __init__(self, interval: float = 0.2):
+        self.interval = interval
+        self.samples: List[float] = []
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="rss-sampler", daemon=True)
+
+    def __enter__(self) -> 'RssSampler':
+        self.samples.append(rss_mb())
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self._stopped.set()
+        self._thread.join()
+        self.samples.append(rss_mb())
+
+    def _run(self) -> None:
+        while not self._stopped.wait(self.interval):
+            self.samples.append(rss_mb())
+
+def rss_mb() -> float:
+    """Current resident set size in MiB, or the peak where /proc is unavailable."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except OSError:
+        # ru_maxrss is in KiB on Linux and bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2**20 if sys.platform == "darwin" else peak / 2**10
+
+def tools_failed(body: Dict[str, Any]) -> bool:
+    """Whether a run made tool calls and all of them failed, e.g. because the dev_container was unreachable."""
+    calls = body.get("tool_calls") or []
+    return bool(calls) and all(
+        tool_failed(ToolMessage(content=str(call.get("response")), tool_call_id=call.get("id") or ""))
+        for call in calls
+    )
+
+def percentile(values: Sequence[float], q: float) -> Optional[float]:
+    """Nearest-rank percentile, or None without values."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(q / 100 * len(ordered)) - 1))]
+
+def summarize(values: Sequence[float], scale: float = 1000.0) -> Dict[str, Optional[float]]:
+    """p50/p90/p99/max of a series, in milliseconds by default."""
+    summary = {}
+    for name, q in (("p50", 50), ("p90", 90), ("p99", 99), ("max", 100)):
+        value = percentile(values, q)
+        summary[name] = round(value * scale, 3) if value is not None else None
+    return summary
+
+async def simulated_user(client: httpx.AsyncClient, rng: random.Random, deadline: float, samples: List[Dict[str, Any]]) -> None:
+    """Replay sessions from the workload mix until the deadline."""
+    while time.monotonic() < deadline:
+        profile = rng.choices(WORKLOAD, weights=[p.weight for p in WORKLOAD])[0]
+        session_id = f"load-{profile.name}-{uuid.uuid4().hex[:8]}"
+        for turn in range(profile.turns):
+            started_at = time.monotonic()
+            try:
+                response = await client.post("/run", json={
+                    "input": f"Turn {turn + 1}: implement the next module. [steps={profile.steps}]",
+                    "session_id": session_id,
+                })
+                status = response.status_code
+                failed_tools = status == 200 and tools_failed(response.json())
+            except (httpx.HTTPError, ValueError):
+                response, status, failed_tools = None, None, False
+            samples.append({"profile": profile.name, "status": status, "tools_failed": failed_tools, "latency": time.monotonic() - started_at})
+            if status == 429:
+                # Back off as a well-behaved client would
+                await asyncio.sleep(min(float(response.headers.get("Retry-After", "1")), max(0.0, deadline - time.monotonic())))
+            if status != 200 or failed_tools:
+                break
+
+async def run_level(server_under_test: ServerUnderTest, concurrency: int, duration: float, seed: int) -> Dict[str, Any]:
+    """Drive the server with the given number of concurrent users.
+
+    Users start no new session after ``duration`` seconds; sessions in
+    flight are completed and counted.
+    """
+    samples: List[Dict[str, Any]] = []
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    lag_start = len(server_under_test.loop_lag)
+    async with httpx.AsyncClient(base_url=server_under_test.url, timeout=None, limits=limits) as client:
+        with RssSampler() as rss:
+            started_at = time.monotonic()
+            deadline = started_at + duration
+            await asyncio.gather(*(
+                simulated_user(client, random.Random(seed * 1000 + user), deadline, samples)
+                for user in range(concurrency)
+            ))
+            elapsed = time.monotonic() - started_at
+
+    completed = [s for s in samples if s["status"] == 200 and not s["tools_failed"]]
+    by_profile = {
+        profile.name: summarize([s["latency"] for s in completed if s["profile"] == profile.name])
+        for profile in WORKLOAD
+    }
+    return {
+        "concurrency": concurrency,
+        "elapsed_seconds": round(elapsed, 3),
+        "requests": len(samples),
+        "completed": len(completed),
+        "rejected": sum(1 for s in samples if s["status"] == 429),
+        "failed": sum(1 for s in samples if s["status"] not in (200, 429) or s["tools_failed"]),
+        "tools_failed": sum(1 for s in samples if s["tools_failed"]),
+        "throughput_rps": round(len(completed) / elapsed, 3),
+        "latency_ms": summarize([s["latency"] for s in completed]),
+        "latency_ms_by_profile": by_profile,
+        "loop_lag_ms": summarize(server_under_test.loop_lag[lag_start:]),
+        "rss_mb": {
+            "start": round(rss.samples[0], 1),
+            "peak": round(max(rss.samples), 1),
+            "end": round(rss.samples[-1], 1),
+        },
+    }
+
+def current_commit() -> Optional[str]:
+    """The checked-out commit, if this is a git checkout."""
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=list(DEFAULT_CONCURRENCY), help="Concurrent users per level")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds during which users start new sessions, per level")
+    parser.add_argument("--first-token-latency", type=float, default=0.6, help="Seconds before the stub LLM's first chunk")
+    parser.add_argument("--chunk-latency", type=float, default=0.05, help="Seconds between further chunks of the stub LLM")
+    parser.add_argument("--tool-latency", type=float, default=0.01, help="Seconds per dev_container request")
+    parser.add_argument("--command-latency", type=float, default=0.3, help="Additional seconds per executed command")
+    parser.add_argument("--seed", type=int, default=1, help="Seed of the workload mix")
+    parser.add_argument("--output", help="Results file, defaults to load_test_<commit>.json")
+    args = parser.parse_args(argv)
+
+    commit = current_commit()
+    output = args.output or f"load_test_{commit or 'unknown'}.json"
+    config = {key: value for key, value in vars(args).items() if key != "output"}
+
+    with DevContainerStub(latency=args.tool_latency, command_latency=args.command_latency) as stub:
+        server_under_test = ServerUnderTest(server.app)
+        server_under_test.start()
+        try:
+            response = httpx.post(f"{server_under_test.url}/api/llm/config", json={"llm_type": "scripted", "model_name": "scripted", "temperature": 0.0})
+            response.raise_for_status()
+            server.agent.llm.first_token_latency = args.first_token_latency
+            server.agent.llm.chunk_latency = args.chunk_latency
+            # Sessions that name no workspace use the router's default
+            server.workspace_router.default_url = stub.url
+
+            levels = []
+            for concurrency in args.concurrency:
+                level = asyncio.run(run_level(server_under_test, concurrency, args.duration, args.seed))
+                print(json.dumps(level), file=sys.stderr)
+                levels.append(level)
+        finally:
+            server_under_test.stop()
+
+    report = {"commit": commit, "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()), "config": config, "workload": [vars(p) for p in WORKLOAD], "levels": levels}
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output}", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,33 +1,118 @@
 from fastapi import FastAPI, HTTPException, Request
-from fastapi.responses import JSONResponse
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
+from contextlib import asynccontextmanager, nullcontext
+from dataclasses import asdict
+import asyncio
+import hmac
 import os
 import json
 import logging
+import re
 import traceback
 from langchain_core.messages import HumanMessage, AIMessage, ToolMessage, SystemMessage
-from src.agent.graph import agent
-from src.llm.factory import LLMFactory
+from src.agent.graph import WorkspaceUnknown, agent
+from src.llm.pool import get_llm_pool
 from src.config.llm_config import LLMConfig, DEFAULT_CONFIG
+from src.observability import metrics
+from src.observability.logs import configure_logging, get_correlation_id, use_correlation_id
+from src.observability.memory_usage import AllocationTracker, SessionFootprint, process_memory
+from src.observability.profiler import ProfileStore, SamplingProfiler
+from src.observability.tracing import TraceStore
+from src.runtime.batch import Batch, BatchManager, BatchTask
+from src.runtime.budget import ExecutionBudget, StopReason
+from src.runtime.cancellation import CancellationRegistry, CancellationToken, RunCancelled
+from src.runtime.context import RunContext
+from src.runtime.scheduler import Lane, RunScheduler, SchedulerOverloaded
+from tools.command_cache import get_command_cache
+from tools.dev_container_client import dev_container
+from tools.workspace_router import get_workspace_router
 
-# Set up logging
-logging.basicConfig(
-    level=logging.DEBUG,
-    format='%(asctime)s [%(levelname)s] %(message)s',
-    datefmt='%Y-%m-%d %H:%M:%S'
-)
+# Structured logging through a background writer; see configure_logging for the settings
+configure_logging()
 logger = logging.getLogger(__name__)
 
 # Global variables
 chat_histories: Dict[str, List[Dict[str, str]]] = {}
 current_llm_config: LLMConfig = DEFAULT_CONFIG
+# Models chosen by sessions; other sessions use current_llm_config
+session_llm_configs: Dict[str, LLMConfig] = {}
+scheduler = RunScheduler.from_env()
+active_runs = CancellationRegistry()
+metrics.track_scheduler(scheduler)
+trace_store = TraceStore.from_env()
+profile_store = ProfileStore.from_env()
+batch_manager = BatchManager.from_env()
+workspace_router = get_workspace_router()
+# Sessions keep their dev_container across restarts; bindings of running sessions are kept
+workspace_router.recall = agent.recorded_workspace
+workspace_router.in_use = active_runs.has_runs
+allocation_tracker = AllocationTracker(frames=int(os.getenv("TRACEMALLOC_FRAMES", "1")))
 
 # Create LLM instance on startup
-LLMFactory.create_llm(current_llm_config)
+get_llm_pool().get(current_llm_config)
+
+async def prune_checkpoints_periodically():
+    """Apply the checkpoint retention policy in the background."""
+    interval = float(os.getenv("CHECKPOINT_PRUNE_INTERVAL_SECONDS", "3600"))
+    while True:
+        try:
+            await asyncio.to_thread(agent.prune_checkpoints)
+        except Exception as e:
+            logger.error("Error pruning checkpoints: %s", e)
+        await asyncio.sleep(interval)
+
+async def cancel_on_disconnect(request: Request, token: CancellationToken):
+    """Cancel a run as soon as the client that started it goes away."""
+    interval = float(os.getenv("DISCONNECT_POLL_SECONDS", "0.5"))
+    while not token.cancelled:
+        if await request.is_disconnected():
+            # Cancellation callbacks may block on HTTP calls, keep them off the event loop
+            await asyncio.to_thread(token.cancel, "client disconnected")
+            return
+        await asyncio.sleep(interval)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    prune_task = asyncio.create_task(prune_checkpoints_periodically())
+    yield
+    prune_task.cancel()
+
+# Client-supplied request ids become run ids, which are part of checkpoint thread ids
+REQUEST_ID = re.compile(r"[A-Za-z0-9._-]{1,64}")
+
+class CorrelationIdMiddleware:
+    """Tag the logs of a request, down to graph nodes and tools, with one correlation id.
+    
+    The id is the client's X-Request-Id if it is well-formed, and also
+    identifies the run, trace and profile the request produces.
+    Plain ASGI rather than BaseHTTPMiddleware, so disconnect detection keeps working.
+    """
+    
+    def __init__(self, app):
+        self.app = app
+        
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+            
+        headers = dict(scope["headers"])
+        correlation_id = headers.get(b"x-request-id", b"").decode("latin-1")
+        if not REQUEST_ID.fullmatch(correlation_id):
+            correlation_id = os.urandom(4).hex()
+        
+        async def send_with_correlation_id(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [(b"x-request-id", correlation_id.encode())]
+            await send(message)
+            
+        with use_correlation_id(correlation_id):
+            await self.app(scope, receive, send_with_correlation_id)
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
+app.add_middleware(CorrelationIdMiddleware)
 
 app.add_middleware(
     CORSMiddleware,
@@ -40,33 +125,225 @@ app.add_middleware(
 class QueryInput(BaseModel):
     input: str
     session_id: str = "default"  # Add session ID to support multiple conversations
+    workspace: Optional[str] = None  # dev_container URL the session's tools use from now on
+    container_id: Optional[str] = None  # Or a container created by the orchestrator
+    fan_out: Optional[bool] = None  # Split the request into parallel subtasks, defaults to FAN_OUT_ENABLED
+    llm: Optional[Dict[str, Any]] = None  # Model for this run only, e.g. {"llm_type": "openai", "model_name": "gpt-4o"}
 
 class LLMConfigInput(BaseModel):
     llm_type: str
     model_name: str
     temperature: float = 0.7
     additional_params: Dict[str, Any] = None
+    budget: Dict[str, Any] = None
+    fast_model: Optional[Dict[str, Any]] = None  # Routes simple steps to this model
+
+class LLMSelectionInput(BaseModel):
+    llm_type: Optional[str] = None
+    model_name: Optional[str] = None
+    temperature: Optional[float] = None
+    fast_model: Optional[Dict[str, Any]] = None
+
+class ProfilingInput(BaseModel):
+    runs: int = 1
+    session_id: Optional[str] = None  # Defaults to runs of any session
+
+class ResumeInput(BaseModel):
+    run_id: Optional[str] = None  # Defaults to the latest run of the session
+    budget: Dict[str, Any] = None
+    tenant: Optional[str] = None
+    priority: str = Lane.INTERACTIVE
+
+def overloaded_response(e: SchedulerOverloaded) -> JSONResponse:
+    """Tell the client to back off while the scheduler is saturated."""
+    return JSONResponse(
+        status_code=429,
+        content={"error": str(e), "retry_after": e.retry_after},
+        headers={"Retry-After": str(e.retry_after)}
+    )
+
+def cancelled_response(request_id: str, session_id: str) -> JSONResponse:
+    """Report a run that was cancelled before it was admitted."""
+    return JSONResponse(content={
+        "response": "Run cancelled before it started",
+        "tool_calls": [],
+        "session_id": session_id,
+        "run_id": request_id,
+        "stop_reason": StopReason.CANCELLED,
+        "usage": None,
+    })
+
+def finish_trace(response: JSONResponse, request: Request, request_id: str, context: RunContext, failed: bool = False) -> JSONResponse:
+    """Keep the request's trace if it is sampled and point the client to it."""
+    forced = request.headers.get("X-RoSE-Trace", "").lower() in ("1", "true", "yes")
+    if trace_store.offer(request_id, context.tracer, forced=forced, failed=failed):
+        response.headers["X-RoSE-Trace-Id"] = request_id
+    return response
+
+async def select_llm(base: LLMConfig, selection: Any) -> LLMConfig:
+    """Apply a session's or request's model selection to a configuration.
+    
+    Raises:
+        ValueError: If the selection is malformed or its model cannot be created
+    """
+    if not isinstance(selection, dict) or not selection:
+        raise ValueError("llm must be an object naming a model")
+    config = base.selected(selection)
+    try:
+        # Created once per model and shared by all runs using it
+        await asyncio.to_thread(get_llm_pool().get, config)
+    except ValueError:
+        raise
+    except Exception as e:
+        raise ValueError(f"Cannot create {config.llm_type} model {config.model_name}: {e}") from e
+    return config
+
+def is_admin(request: Request) -> bool:
+    """Check the admin token; admin features are disabled unless ROSE_ADMIN_TOKEN is set."""
+    token = os.getenv("ROSE_ADMIN_TOKEN")
+    return bool(token) and hmac.compare_digest(request.headers.get("X-RoSE-Admin-Token", ""), token)
+
+def finish_profile(response: JSONResponse, request_id: str, context: RunContext) -> JSONResponse:
+    """Store the profile of a profiled run and point the client to it."""
+    if context.profiler:
+        context.profiler.stop()
+        profile_store.save(request_id, context.profiler)
+        response.headers["X-RoSE-Profile-Id"] = request_id
+    return response
 
 @app.get("/")
 def root():
     return {"message": "RoSE LangGraph Agent API"}
 
+def format_run_response(result: Dict[str, Any], request_id: str) -> Dict[str, Any]:
+    """Convert the final state of a run into the /run response body."""
+    # Format the response
+    messages = result["messages"]
+    session_id = result.get("session_id", "default")
+    user_input = next((msg.content for msg in messages if isinstance(msg, HumanMessage)), None)
+    last_message = next(
+        (msg for msg in reversed(messages) if isinstance(msg, AIMessage)), 
+        None
+    )
+    
+    # Extract tool calls and responses
+    tool_calls = []
+    current_tool_call = None
+    
+    for msg in messages:
+        if isinstance(msg, AIMessage):
+            tool_calls_data = msg.additional_kwargs.get('tool_calls', [])
+            for tc in tool_calls_data:
+                current_tool_call = {
+                    'id': tc.get('id'),
+                    'name': tc.get('function', {}).get('name'),
+                    'arguments': tc.get('function', {}).get('arguments'),
+                    'response': None
+                }
+                tool_calls.append(current_tool_call)
+        elif isinstance(msg, ToolMessage) and current_tool_call and msg.tool_call_id == current_tool_call['id']:
+            current_tool_call['response'] = msg.content
+    
+    response = {
+        'response': last_message.content if last_message else "No response generated",
+        'tool_calls': tool_calls,
+        'session_id': session_id,
+        'run_id': result.get('run_id'),
+        'stop_reason': result.get('stop_reason'),
+        'usage': result.get('usage')
+    }
+    
+    # Update chat history
+    chat_history = result.get("chat_history", [])
+    chat_histories[session_id] = chat_history
+    
+    # Filter out the original message from the response
+    filtered_messages = [msg for msg in messages if not (
+        isinstance(msg, HumanMessage) and 
+        msg.content == user_input
+    ) and not isinstance(msg, SystemMessage)]  # Also filter out system messages
+    
+    # Deduplicate messages while preserving order
+    seen_contents = set()
+    deduplicated_messages = []
+    for msg in filtered_messages:
+        # Handle content that might be a list (e.g., from Claude)
+        content = msg.content
+        if isinstance(content, list):
+            content = json.dumps(content, sort_keys=True)
+        
+        # For tool messages, include tool-specific fields in the key
+        if isinstance(msg, ToolMessage):
+            msg_key = (
+                msg.__class__.__name__,
+                content,
+                msg.tool_call_id,
+                msg.name,
+                # Convert any unhashable types to strings for the key
+                json.dumps(msg.additional_kwargs, sort_keys=True) if msg.additional_kwargs else None
+            )
+        else:
+            msg_key = (
+                msg.__class__.__name__,
+                content,
+                # Convert any unhashable types to strings for the key
+                json.dumps(msg.additional_kwargs, sort_keys=True) if msg.additional_kwargs else None
+            )
+        
+        if msg_key not in seen_contents:
+            seen_contents.add(msg_key)
+            deduplicated_messages.append(msg)
+    
+    # Properly serialize each message with all fields
+    serialized_messages = []
+    for msg in deduplicated_messages:
+        msg_dict = {
+            "role": msg.__class__.__name__.replace("Message", "").lower(),
+            "content": msg.content
+        }
+        
+        # Add tool-specific fields for tool messages
+        if isinstance(msg, ToolMessage):
+            msg_dict.update({
+                "tool_call_id": getattr(msg, "tool_call_id", None),
+                "name": getattr(msg, "name", None)
+            })
+        
+        # Add any additional kwargs (like tool_calls)
+        if hasattr(msg, "additional_kwargs") and msg.additional_kwargs:
+            msg_dict.update(msg.additional_kwargs)
+        
+        serialized_messages.append(msg_dict)
+    
+    logger.debug("[Request: %s] Serialized messages: %s", request_id, serialized_messages)
+    logger.debug("[Request: %s] Chat history for session %s: %s", request_id, session_id, chat_history)
+    
+    # Ensure we have at least one message in the response
+    if not serialized_messages:
+        serialized_messages = [{
+            "role": "ai",
+            "content": last_message.content
+        }]
+    
+    response.update({
+        "messages": serialized_messages,
+        "chat_history": chat_history
+    })
+    
+    return response
+
 @app.post("/run")
 async def run_agent(request: Request):
     """Run the agent with the given input."""
+    # The correlation id of the request is also the id of its run, trace and profile
+    request_id = get_correlation_id() or os.urandom(4).hex()
+    # Every request is traced; the trace is kept if the request is slow, fails or asks for it
+    context = RunContext(slots=scheduler.slots)
+    
     try:
         # Get request data
-        data = await request.json()
-        
-        # Generate request ID
-        request_id = os.urandom(4).hex()
-        
-        # Pass request ID to LLM if supported
-        if hasattr(current_llm_config.llm, 'set_request_id'):
-            current_llm_config.llm.set_request_id(request_id)
-        
-        # Log current LLM configuration
-        logger.info(f"[Request: {request_id}] 🚀 Starting request with LLM API: {current_llm_config.llm_type}, Model: {current_llm_config.model_name}")
+        with context.tracer.span("parse_request", category="http"):
+            data = await request.json()
         
         # Extract input and session ID
         user_input = data.get("input", "")
@@ -78,6 +355,53 @@ async def run_agent(request: Request):
                 content={"error": "No input provided"}
             )
         
+        # A request id sent again would add to the checkpoints of the earlier run
+        if await asyncio.to_thread(agent.has_run, session_id, request_id):
+            return JSONResponse(
+                status_code=409,
+                content={"error": f"Run {request_id} of session {session_id} already exists; resume it or send a new X-Request-Id"}
+            )
+        
+        # The run uses the model chosen by the request or its session, if any
+        context.llm_config = session_llm_configs.get(session_id)
+        try:
+            if data.get("llm") is not None:
+                context.llm_config = await select_llm(context.llm_config or current_llm_config, data["llm"])
+        except ValueError as e:
+            return JSONResponse(
+                status_code=400,
+                content={"error": f"Invalid llm: {str(e)}"}
+            )
+        llm_config = context.llm_config or current_llm_config
+        logger.info("[Request: %s] 🚀 Starting request with LLM API: %s, Model: %s", request_id, llm_config.llm_type, llm_config.model_name)
+            
+        # Per-request budget overrides on top of the configured defaults
+        try:
+            budget = current_llm_config.budget.merged(data.get("budget"))
+        except ValueError as e:
+            return JSONResponse(
+                status_code=400,
+                content={"error": f"Invalid budget: {str(e)}"}
+            )
+        
+        # The session's tools use its own dev_container once it names one
+        try:
+            context.dev_container_url = await asyncio.to_thread(
+                workspace_router.resolve, session_id, workspace=data.get("workspace"), container_id=data.get("container_id")
+            )
+        except ValueError as e:
+            return JSONResponse(
+                status_code=400,
+                content={"error": f"Invalid workspace: {str(e)}"}
+            )
+        
+        # Large requests may be split into subtasks run by parallel sub-agents
+        if isinstance(data.get("fan_out"), bool):
+            context.fan_out = data["fan_out"]
+        
+        # Deterministic LLM calls may be answered from the response cache unless the request opts out
+        context.llm_cache = data.get("cache", True) is not False and "no-cache" not in request.headers.get("Cache-Control", "")
+        
         # Create initial state with chat history
         state = {
             "messages": [
@@ -88,138 +412,365 @@ async def run_agent(request: Request):
             "session_id": session_id
         }
         
-        # Run the agent
-        try:
-            result = agent.run(state)
-            
-            # Format the response
-            messages = result["messages"]
-            last_message = next(
-                (msg for msg in reversed(messages) if isinstance(msg, AIMessage)), 
-                None
+        # Runs of the same session are serialized; tenants share capacity by weight
+        tenant = request.headers.get("X-Tenant-Id") or data.get("tenant") or "default"
+        priority = data.get("priority") or request.headers.get("X-Priority") or Lane.INTERACTIVE
+        if priority not in Lane.ALL:
+            return JSONResponse(
+                status_code=400,
+                content={"error": f"Invalid priority: {priority}"}
             )
+        
+        # Opt-in sampling profiler, requested with admin headers or armed via /admin/profiling
+        if (request.headers.get("X-RoSE-Profile") and is_admin(request)) or profile_store.take_armed(session_id):
+            context.profiler = SamplingProfiler(profile_store.interval)
+        
+        # Run the agent; it can be cancelled while queued or running
+        disconnect_watcher = asyncio.create_task(cancel_on_disconnect(request, context.cancellation))
+        try:
+            with active_runs.register(session_id, context.cancellation):
+                async with scheduler.admit(session_id, tenant=tenant, lane=priority, cancellation=context.cancellation):
+                    context.tracer.instant("admitted", category="scheduler")
+                    if context.profiler:
+                        context.profiler.start()
+                    # The graph blocks on LLM and tool I/O, so keep it off the event loop
+                    with context.tracer.span("agent.run"):
+                        result = await asyncio.to_thread(
+                            agent.run, state, budget=budget, run_id=request_id, context=context
+                        )
             
-            # Extract tool calls and responses
-            tool_calls = []
-            current_tool_call = None
-            
-            for msg in messages:
-                if isinstance(msg, AIMessage):
-                    tool_calls_data = msg.additional_kwargs.get('tool_calls', [])
-                    for tc in tool_calls_data:
-                        current_tool_call = {
-                            'id': tc.get('id'),
-                            'name': tc.get('function', {}).get('name'),
-                            'arguments': tc.get('function', {}).get('arguments'),
-                            'response': None
-                        }
-                        tool_calls.append(current_tool_call)
-                elif isinstance(msg, ToolMessage) and current_tool_call and msg.tool_call_id == current_tool_call['id']:
-                    current_tool_call['response'] = msg.content
-            
-            response = {
-                'response': last_message.content if last_message else "No response generated",
-                'tool_calls': tool_calls,
-                'session_id': session_id
-            }
-            
-            # Update chat history
-            chat_history = result.get("chat_history", [])
-            chat_histories[session_id] = chat_history
-            
-            # Filter out the original message from the response
-            filtered_messages = [msg for msg in messages if not (
-                isinstance(msg, HumanMessage) and 
-                msg.content == user_input
-            ) and not isinstance(msg, SystemMessage)]  # Also filter out system messages
-            
-            # Deduplicate messages while preserving order
-            seen_contents = set()
-            deduplicated_messages = []
-            for msg in filtered_messages:
-                # Handle content that might be a list (e.g., from Claude)
-                content = msg.content
-                if isinstance(content, list):
-                    content = json.dumps(content, sort_keys=True)
-                
-                # For tool messages, include tool-specific fields in the key
-                if isinstance(msg, ToolMessage):
-                    msg_key = (
-                        msg.__class__.__name__,
-                        content,
-                        msg.tool_call_id,
-                        msg.name,
-                        # Convert any unhashable types to strings for the key
-                        json.dumps(msg.additional_kwargs, sort_keys=True) if msg.additional_kwargs else None
-                    )
-                else:
-                    msg_key = (
-                        msg.__class__.__name__,
-                        content,
-                        # Convert any unhashable types to strings for the key
-                        json.dumps(msg.additional_kwargs, sort_keys=True) if msg.additional_kwargs else None
-                    )
-                
-                if msg_key not in seen_contents:
-                    seen_contents.add(msg_key)
-                    deduplicated_messages.append(msg)
-            
-            # Properly serialize each message with all fields
-            serialized_messages = []
-            for msg in deduplicated_messages:
-                msg_dict = {
-                    "role": msg.__class__.__name__.replace("Message", "").lower(),
-                    "content": msg.content
-                }
-                
-                # Add tool-specific fields for tool messages
-                if isinstance(msg, ToolMessage):
-                    msg_dict.update({
-                        "tool_call_id": getattr(msg, "tool_call_id", None),
-                        "name": getattr(msg, "name", None)
-                    })
-                
-                # Add any additional kwargs (like tool_calls)
-                if hasattr(msg, "additional_kwargs") and msg.additional_kwargs:
-                    msg_dict.update(msg.additional_kwargs)
-                
-                serialized_messages.append(msg_dict)
-            
-            logger.debug(f"[Request: {request_id}] Serialized messages: {json.dumps(serialized_messages, indent=2)}")
-            logger.debug(f"[Request: {request_id}] Chat history for session {session_id}: {json.dumps(chat_history, indent=2)}")
-            
-            # Ensure we have at least one message in the response
-            if not serialized_messages:
-                serialized_messages = [{
-                    "role": "ai",
-                    "content": last_message.content
-                }]
-            
-            response.update({
-                "messages": serialized_messages,
-                "chat_history": chat_history
-            })
-            
-            return JSONResponse(content=response)
+            with context.tracer.span("serialize_response", category="http"), context.profiler.attach() if context.profiler else nullcontext():
+                response = JSONResponse(content=format_run_response(result, request_id))
+            finish_profile(response, request_id, context)
+            return finish_trace(response, request, request_id, context)
             
+        except SchedulerOverloaded as e:
+            logger.warning("[Request: %s] Shedding run for session %s: %s", request_id, session_id, e)
+            return overloaded_response(e)
+        except RunCancelled:
+            logger.info("[Request: %s] Run of session %s cancelled while queued", request_id, session_id)
+            return finish_trace(cancelled_response(request_id, session_id), request, request_id, context)
         except Exception as e:
-            logger.error(f"[Request: {request_id}] Error in run_agent: {str(e)}")
-            logger.error(f"[Request: {request_id}] Traceback: {traceback.format_exc()}")
-            return JSONResponse(
+            logger.error("[Request: %s] Error in run_agent: %s", request_id, e)
+            logger.error("[Request: %s] Traceback: %s", request_id, traceback.format_exc())
+            # Completed steps are checkpointed, so the run can be resumed
+            response = JSONResponse(
                 status_code=500,
-                content={"error": f"Agent error: {str(e)}"}
+                content={"error": f"Agent error: {str(e)}", "run_id": request_id, "session_id": session_id}
             )
+            finish_profile(response, request_id, context)
+            return finish_trace(response, request, request_id, context, failed=True)
+        finally:
+            disconnect_watcher.cancel()
+            if context.profiler:
+                context.profiler.stop()
             
     except Exception as e:
-        logger.error(f"[Request: {request_id}] Error processing request: {str(e)}")
+        logger.error("[Request: %s] Error processing request: %s", request_id, e)
         return JSONResponse(
             status_code=400,
             content={"error": f"Invalid request: {str(e)}"}
         )
 
+@app.post("/sessions/{session_id}/resume")
+async def resume_run(session_id: str, payload: Optional[ResumeInput] = None):
+    """Resume an interrupted run from its last completed node."""
+    request_id = get_correlation_id() or os.urandom(4).hex()
+    payload = payload or ResumeInput()
+    
+    try:
+        budget = current_llm_config.budget.merged(payload.budget)
+    except ValueError as e:
+        return JSONResponse(
+            status_code=400,
+            content={"error": f"Invalid budget: {str(e)}"}
+        )
+        
+    logger.info("[Request: %s] Resuming session %s, run %s", request_id, session_id, payload.run_id or 'latest')
+    # The run continues on the dev_container recorded with it
+    context = RunContext(slots=scheduler.slots, llm_config=session_llm_configs.get(session_id))
+    try:
+        with active_runs.register(session_id, context.cancellation):
+            async with scheduler.admit(session_id, tenant=payload.tenant or "default", lane=payload.priority, cancellation=context.cancellation):
+                result = await asyncio.to_thread(
+                    agent.resume, session_id, run_id=payload.run_id, budget=budget, context=context
+                )
+        return JSONResponse(content=format_run_response(result, request_id))
+    except SchedulerOverloaded as e:
+        return overloaded_response(e)
+    except RunCancelled:
+        return cancelled_response(request_id, session_id)
+    except ValueError as e:
+        return JSONResponse(
+            status_code=400,
+            content={"error": str(e)}
+        )
+    except WorkspaceUnknown as e:
+        return JSONResponse(
+            status_code=409,
+            content={"error": str(e)}
+        )
+    except LookupError as e:
+        return JSONResponse(
+            status_code=404,
+            content={"error": str(e)}
+        )
+    except Exception as e:
+        logger.error("[Request: %s] Error resuming run: %s", request_id, e)
+        logger.error("[Request: %s] Traceback: %s", request_id, traceback.format_exc())
+        return JSONResponse(
+            status_code=500,
+            content={"error": f"Agent error: {str(e)}", "session_id": session_id}
+        )
+
+@app.post("/sessions/{session_id}/cancel")
+async def cancel_session_runs(session_id: str):
+    """Cancel the queued and running runs of a session.
+    
+    Cancelled runs stop at the next safe point and return what they completed,
+    with stop_reason "cancelled".
+    """
+    cancelled = await asyncio.to_thread(active_runs.cancel_session, session_id, "cancelled by client")
+    if not cancelled:
+        return JSONResponse(
+            status_code=404,
+            content={"error": f"No active runs for session {session_id}"}
+        )
+    logger.info("Cancelled %s run(s) of session %s", cancelled, session_id)
+    return {"status": "cancelled", "session_id": session_id, "runs": cancelled}
+
+@app.get("/sessions/{session_id}/llm")
+async def get_session_llm(session_id: str):
+    """Get the model used by the session's runs."""
+    config = session_llm_configs.get(session_id)
+    return {"session_id": session_id, "source": "session" if config else "default", "config": (config or current_llm_config).to_dict()}
+
+@app.put("/sessions/{session_id}/llm")
+async def set_session_llm(session_id: str, selection: LLMSelectionInput):
+    """Choose the model for the session's runs, on top of the current default."""
+    try:
+        config = await select_llm(current_llm_config, selection.model_dump(exclude_none=True))
+    except ValueError as e:
+        return JSONResponse(
+            status_code=400,
+            content={"error": f"Invalid llm: {str(e)}"}
+        )
+    session_llm_configs[session_id] = config
+    logger.info("Session %s uses %s model %s", session_id, config.llm_type, config.model_name)
+    return {"session_id": session_id, "source": "session", "config": config.to_dict()}
+
+@app.delete("/sessions/{session_id}/llm")
+async def reset_session_llm(session_id: str):
+    """Make the session's runs use the default model again."""
+    session_llm_configs.pop(session_id, None)
+    return {"session_id": session_id, "source": "default", "config": current_llm_config.to_dict()}
+
+async def run_batch_task(batch: Batch, task: BatchTask, token: CancellationToken) -> Dict[str, Any]:
+    """Run one task of a batch in the batch lane, waiting out overload instead of failing."""
+    workspace = await asyncio.to_thread(workspace_router.resolve, task.session_id, workspace=task.workspace)
+    context = RunContext(slots=scheduler.slots, cancellation=token, dev_container_url=workspace, llm_config=session_llm_configs.get(task.session_id))
+    budget = current_llm_config.budget.merged(task.budget)
+    state = {
+        "messages": [HumanMessage(content=task.input)],
+        "pending_response": None,
+        "chat_history": [],
+        "session_id": task.session_id
+    }
+    
+    result = None
+    while True:
+        try:
+            with active_runs.register(task.session_id, token):
+                async with scheduler.admit(task.session_id, tenant=batch.tenant, lane=Lane.BATCH, cancellation=token):
+                    result = await asyncio.to_thread(agent.run, state, budget=budget, context=context)
+            break
+        except SchedulerOverloaded as e:
+            if token.cancelled:
+                break
+            await asyncio.sleep(e.retry_after)
+        except RunCancelled:
+            break
+    if token.cancelled and result is None:
+        return {"run_id": None, "stop_reason": StopReason.CANCELLED, "response": None, "tool_calls": [], "usage": None}
+    
+    response = format_run_response(result, result.get("run_id"))
+    return {key: response[key] for key in ("run_id", "stop_reason", "response", "tool_calls", "usage")}
+
+@app.post("/batches")
+async def create_batch(request: Request):
+    """Start a batch of independent agent tasks.
+    
+    The body is JSONL, one task per line: {"input", "task_id"?, "session_id"?,
+    "workspace"?, "budget"?}. Tasks run in the batch lane with at most
+    ``max_workers`` (query parameter, capped by BATCH_MAX_WORKERS) at a time,
+    and their results are appended to the batch's results file as they finish.
+    """
+    try:
+        payload = (await request.body()).decode("utf-8")
+        max_workers = request.query_params.get("max_workers")
+        tenant = request.headers.get("X-Tenant-Id") or request.query_params.get("tenant") or "default"
+        batch = batch_manager.create(payload, tenant=tenant, max_workers=int(max_workers) if max_workers else None)
+    except (UnicodeDecodeError, ValueError) as e:
+        return JSONResponse(
+            status_code=400,
+            content={"error": f"Invalid batch: {str(e)}"}
+        )
+    batch_manager.start(batch, run_batch_task)
+    return JSONResponse(status_code=202, content=batch.summary())
+
+@app.get("/batches/{batch_id}")
+async def get_batch(batch_id: str):
+    """Get the progress of a batch."""
+    batch = batch_manager.get(batch_id)
+    if batch is None:
+        return JSONResponse(status_code=404, content={"error": f"Batch {batch_id} not found"})
+    return batch.summary()
+
+@app.get("/batches/{batch_id}/results")
+async def get_batch_results(batch_id: str):
+    """Download the results of a batch as JSONL; a retried task's last line is its final result."""
+    batch = batch_manager.get(batch_id)
+    if batch is None:
+        return JSONResponse(status_code=404, content={"error": f"Batch {batch_id} not found"})
+    if not os.path.exists(batch.results_path):
+        return Response(content=b"", media_type="application/x-ndjson")
+    return FileResponse(batch.results_path, media_type="application/x-ndjson")
+
+@app.post("/batches/{batch_id}/resume")
+async def resume_batch(batch_id: str):
+    """Run the tasks of a batch that have not completed, e.g. after a restart or a cancel."""
+    batch = batch_manager.get(batch_id)
+    if batch is None:
+        return JSONResponse(status_code=404, content={"error": f"Batch {batch_id} not found"})
+    try:
+        batch_manager.start(batch, run_batch_task)
+    except ValueError as e:
+        return JSONResponse(status_code=409, content={"error": str(e)})
+    return JSONResponse(status_code=202, content=batch.summary())
+
+@app.post("/batches/{batch_id}/cancel")
+async def cancel_batch(batch_id: str):
+    """Stop a batch; running tasks stop at the next safe point."""
+    batch = batch_manager.get(batch_id)
+    if batch is None:
+        return JSONResponse(status_code=404, content={"error": f"Batch {batch_id} not found"})
+    cancelled = await asyncio.to_thread(batch_manager.cancel, batch)
+    return {"status": "cancelling", "batch_id": batch_id, "runs": cancelled}
+
+@app.get("/traces/{request_id}")
+async def get_trace(request_id: str):
+    """Get the span timeline of a request as Chrome trace / Perfetto JSON.
+    
+    Only sampled requests are kept: slow or failed ones, and those sent with
+    the X-RoSE-Trace: 1 header.
+    """
+    trace = trace_store.get(request_id)
+    if trace is None:
+        return JSONResponse(
+            status_code=404,
+            content={"error": f"No trace kept for request {request_id}"}
+        )
+    return trace
+
+@app.post("/admin/profiling")
+async def arm_profiling(request: Request, payload: ProfilingInput):
+    """Profile the next runs, e.g. runs started from the UI which cannot set headers."""
+    if not is_admin(request):
+        return JSONResponse(status_code=403, content={"error": "Admin token required"})
+    if payload.runs < 1:
+        return JSONResponse(status_code=400, content={"error": "runs must be positive"})
+    profile_store.arm(payload.runs, payload.session_id)
+    return {"status": "armed", "runs": payload.runs, "session_id": payload.session_id}
+
+@app.get("/admin/profiles/{request_id}")
+async def get_profile(request: Request, request_id: str):
+    """Get the profile of a run as collapsed stacks (flamegraph.pl / speedscope input)."""
+    if not is_admin(request):
+        return JSONResponse(status_code=403, content={"error": "Admin token required"})
+    profile = profile_store.get(request_id)
+    if profile is None:
+        return JSONResponse(
+            status_code=404,
+            content={"error": f"No profile for request {request_id}"}
+        )
+    return PlainTextResponse(profile)
+
+@app.get("/admin/workspaces")
+async def get_workspaces(request: Request):
+    """Get the dev_container each session is routed to."""
+    if not is_admin(request):
+        return JSONResponse(status_code=403, content={"error": "Admin token required"})
+    return {"default": workspace_router.default_url, "routes": workspace_router.routes, "sessions": workspace_router.bindings()}
+
+def session_footprints() -> List[SessionFootprint]:
+    """Memory held per session by the agent and by this API's chat histories, largest first."""
+    footprints = agent.session_footprints()
+    for session_id, history in list(chat_histories.items()):
+        footprints.setdefault(session_id, SessionFootprint(session_id)).add_messages(history)
+    return sorted(footprints.values(), key=lambda footprint: footprint.total_bytes, reverse=True)
+
+@app.get("/admin/memory")
+async def get_memory_usage(request: Request, limit: int = 50):
+    """Get the approximate memory held per session, largest first, and the memory of the process."""
+    if not is_admin(request):
+        return JSONResponse(status_code=403, content={"error": "Admin token required"})
+    if limit < 1:
+        return JSONResponse(status_code=400, content={"error": "limit must be positive"})
+    footprints = await asyncio.to_thread(session_footprints)
+    return {
+        "process": {**process_memory(), "llm_clients": len(get_llm_pool()), "command_cache_entries": len(get_command_cache())},
+        "session_count": len(footprints),
+        "sessions": [{**asdict(footprint), "total_bytes": footprint.total_bytes} for footprint in footprints[:limit]],
+    }
+
+@app.get("/admin/memory/allocations")
+async def get_allocations(request: Request, limit: int = 20):
+    """Take a tracemalloc snapshot: the lines holding the most memory and the growth since the last snapshot.
+    
+    The first snapshot starts tracing, which slows allocations down until it
+    is stopped again.
+    """
+    if not is_admin(request):
+        return JSONResponse(status_code=403, content={"error": "Admin token required"})
+    if limit < 1:
+        return JSONResponse(status_code=400, content={"error": "limit must be positive"})
+    return await asyncio.to_thread(allocation_tracker.snapshot, limit)
+
+@app.delete("/admin/memory/allocations")
+async def stop_allocation_tracing(request: Request):
+    """Stop tracing allocations."""
+    if not is_admin(request):
+        return JSONResponse(status_code=403, content={"error": "Admin token required"})
+    return {"stopped": allocation_tracker.stop()}
+
+@app.delete("/admin/memory/sessions/{session_id}")
+async def evict_session(request: Request, session_id: str):
+    """Drop a session's histories and retrieval index from memory.
+    
+    The session's model and dev_container stay assigned; its next run starts
+    without the earlier turns, apart from what a persisted retrieval index
+    recalls.
+    """
+    if not is_admin(request):
+        return JSONResponse(status_code=403, content={"error": "Admin token required"})
+    if active_runs.has_runs(session_id):
+        return JSONResponse(status_code=409, content={"error": f"Session {session_id} has active runs"})
+    evicted = await asyncio.to_thread(agent.evict_session, session_id)
+    evicted = chat_histories.pop(session_id, None) is not None or evicted
+    if not evicted:
+        return JSONResponse(status_code=404, content={"error": f"Nothing held for session {session_id}"})
+    logger.info("Evicted session %s on admin request", session_id)
+    return {"status": "evicted", "session_id": session_id}
+
+@app.get("/metrics")
+async def get_metrics():
+    """Expose metrics in the Prometheus text format."""
+    payload, content_type = metrics.render()
+    return Response(content=payload, media_type=content_type)
+
 @app.get("/health")
 async def health():
-    return {"status": "ok"}
+    return {"status": "ok", "scheduler": scheduler.stats(), "dev_containers": dev_container.health()}
 
 @app.get("/api/llm/available")
 async def get_available_llms():
@@ -251,9 +802,11 @@ async def get_llm_config():
 
 @app.post("/api/llm/config")
 async def update_llm_config(config: LLMConfigInput):
-    """Update LLM configuration."""
+    """Update the default LLM configuration.
+    
+    Runs already in progress and sessions that chose their own model are not affected.
+    """
     global current_llm_config
-    global agent
     
     try:
         # Create new config
@@ -261,19 +814,18 @@ async def update_llm_config(config: LLMConfigInput):
             llm_type=config.llm_type,
             model_name=config.model_name,
             temperature=config.temperature,
-            additional_params=config.additional_params
+            additional_params=config.additional_params,
+            budget=ExecutionBudget.from_dict(config.budget),
+            fast_model=config.fast_model
         )
         
-        # Try to create LLM with new config to validate it
-        LLMFactory.create_llm(new_config)
-        
-        # If successful, update current config and recreate agent
+        # Creating the model validates the config; the graph and session state are kept
+        await asyncio.to_thread(agent.configure_llm, new_config)
         current_llm_config = new_config
-        agent = agent.__class__(llm_config=current_llm_config)
         
         return {"status": "success", "config": current_llm_config.to_dict()}
     except Exception as e:
-        logger.error(f"Error updating LLM config: {str(e)}\n{traceback.format_exc()}")
+        logger.error("Error updating LLM config: %s\n%s", e, traceback.format_exc())
         raise HTTPException(status_code=400, detail=str(e))
 
 if __name__ == "__main__":
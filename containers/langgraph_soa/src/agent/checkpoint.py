@@ -0,0 +1,102 @@
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from uuid import UUID
+import logging
+import os
+import sqlite3
+
+from langgraph.checkpoint.base import BaseCheckpointSaver
+from langgraph.checkpoint.memory import MemorySaver
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHECKPOINT_URL = "sqlite:///checkpoints.sqlite"
+DEFAULT_RETENTION_HOURS = 72.0
+
+def create_checkpointer(url: Optional[str] = None) -> BaseCheckpointSaver:
+    """Create the checkpoint saver for the agent graph.
+
+    Args:
+        url: ``memory``, ``sqlite:///<path>`` or a ``postgresql://`` connection
+            string. Defaults to the CHECKPOINT_URL environment variable and
+            falls back to a local SQLite file.
+
+    Returns:
+        A ready-to-use checkpoint saver
+    """
+    url = url or os.getenv("CHECKPOINT_URL", DEFAULT_CHECKPOINT_URL)
+
+    if url == "memory":
+        return MemorySaver()
+
+    if url.startswith("sqlite:///"):
+        from langgraph.checkpoint.sqlite import SqliteSaver
+
+        path = url[len("sqlite:///"):]
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        # SqliteSaver serializes access with its own lock
+        saver = SqliteSaver(sqlite3.connect(path, check_same_thread=False))
+        saver.setup()
+        logger.info("Using SQLite checkpoints at %s", path)
+        return saver
+
+    if url.startswith(("postgres://", "postgresql://")):
+        from langgraph.checkpoint.postgres import PostgresSaver
+        from psycopg.rows import dict_row
+        from psycopg_pool import ConnectionPool
+
+        pool = ConnectionPool(
+            conninfo=url,
+            max_size=int(os.getenv("CHECKPOINT_POOL_SIZE", "10")),
+            kwargs={"autocommit": True, "prepare_threshold": 0, "row_factory": dict_row},
+        )
+        saver = PostgresSaver(pool)
+        saver.setup()
+        logger.info("Using Postgres checkpoints")
+        return saver
+
+    raise ValueError(f"Unsupported checkpoint URL: {url}")
+
+def checkpoint_id_at(when: datetime) -> str:
+    """Smallest checkpoint id a saver could assign at a point in time.
+
+    Checkpoint ids are version 6 UUIDs, which start with their timestamp, so
+    they sort by creation time and ``before`` this id means before that time.
+    """
+    # 100ns intervals since the UUID epoch, 1582-10-15
+    timestamp = int(when.timestamp() * 10**7) + 0x01B21DD213814000
+    uuid_int = ((timestamp >> 12) & 0xFFFFFFFFFFFF) << 80 | (timestamp & 0x0FFF) << 64
+    # Version 6 and the RFC 4122 variant, with the clock sequence and node zeroed
+    return str(UUID(int=uuid_int | 6 << 76 | 1 << 63))
+
+def prune_checkpoints(checkpointer: BaseCheckpointSaver, max_age_hours: Optional[float] = None, now: Optional[datetime] = None) -> int:
+    """Delete every thread whose newest checkpoint is older than the retention period.
+
+    Args:
+        checkpointer: Saver to prune
+        max_age_hours: Retention period, defaults to CHECKPOINT_RETENTION_HOURS
+        now: Time the age is measured at, defaults to the current time
+
+    Returns:
+        Number of deleted threads
+    """
+    if max_age_hours is None:
+        max_age_hours = float(os.getenv("CHECKPOINT_RETENTION_HOURS", DEFAULT_RETENTION_HOURS))
+    cutoff = checkpoint_id_at((now or datetime.now(timezone.utc)) - timedelta(hours=max_age_hours))
+
+    # Only the input checkpoints of runs started before the cutoff are loaded,
+    # one per run; the saver filters them by metadata and checkpoint id
+    started = checkpointer.list(None, filter={"source": "input"}, before={"configurable": {"checkpoint_id": cutoff}})
+    expired = []
+    for thread_id in {checkpoint_tuple.config["configurable"]["thread_id"] for checkpoint_tuple in started}:
+        # Runs resumed since then are kept
+        newest = checkpointer.get_tuple({"configurable": {"thread_id": thread_id, "checkpoint_ns": ""}})
+        if newest is None or newest.config["configurable"]["checkpoint_id"] < cutoff:
+            expired.append(thread_id)
+    for thread_id in expired:
+        checkpointer.delete_thread(thread_id)
+
+    if expired:
+        logger.info("Pruned checkpoints of %s threads older than %sh", len(expired), max_age_hours)
+    return len(expired)
@@ -0,0 +1,91 @@
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Sequence, Tuple
+import json
+import logging
+import re
+
+from langchain_core.messages import AIMessage, BaseMessage
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class Subtask:
+    """An independent part of a request, worked on by its own sub-agent."""
+    title: str
+    instructions: str
+    files: List[str] = field(default_factory=list)
+
+def parse_plan(text: str, max_subtasks: int) -> List[Subtask]:
+    """Read the subtasks from the planner's reply.
+
+    Returns:
+        The subtasks, or an empty list if the reply is not a usable plan or
+        has fewer than two subtasks, in which case the request runs as usual
+    """
+    match = re.search(r"\{.*\}", text or "", re.DOTALL)
+    if not match:
+        return []
+    try:
+        plan = json.loads(match.group(0))
+        subtasks = [
+            Subtask(
+                title=str(item["title"]),
+                instructions=str(item.get("instructions") or item["title"]),
+                files=[str(path) for path in item.get("files") or []],
+            )
+            for item in plan.get("subtasks") or []
+        ]
+    except (ValueError, KeyError, TypeError, AttributeError) as e:
+        logger.warning("Ignoring malformed plan: %s", e)
+        return []
+    if len(subtasks) < 2:
+        return []
+    if len(subtasks) > max_subtasks:
+        logger.info("Plan has %s subtasks, keeping the first %s", len(subtasks), max_subtasks)
+    return subtasks[:max_subtasks]
+
+def files_written(messages: Sequence[BaseMessage]) -> List[str]:
+    """Paths created, changed, deleted or moved by the tool calls of a run, in order."""
+    paths: List[str] = []
+    for message in messages:
+        if not isinstance(message, AIMessage):
+            continue
+        for tool_call in message.additional_kwargs.get("tool_calls", []):
+            function = tool_call.get("function", {})
+            try:
+                args = json.loads(function.get("arguments") or "{}")
+            except json.JSONDecodeError:
+                continue
+            if function.get("name") == "file_system" and (args.get("content") is not None or args.get("is_directory")):
+                changed = [args.get("path")]
+            elif function.get("name") == "move_file":
+                changed = [args.get("source"), args.get("destination")]
+            else:
+                continue
+            for path in changed:
+                path = (path or "").strip("/")
+                if path and path not in paths:
+                    paths.append(path)
+    return paths
+
+def join_results(results: List[Dict[str, Any]]) -> Tuple[str, Dict[str, List[str]]]:
+    """Merge the results of the sub-agents into one report.
+
+    Returns:
+        The report and the conflicts: paths changed by more than one
+        subtask, with the titles of those subtasks
+    """
+    changed_by: Dict[str, List[str]] = {}
+    for result in results:
+        for path in result["files"]:
+            changed_by.setdefault(path, []).append(result["title"])
+    conflicts = {path: titles for path, titles in changed_by.items() if len(titles) > 1}
+
+    lines = [f"Worked on {len(results)} subtasks in parallel:"]
+    for result in results:
+        status = "" if result["stop_reason"] == "completed" else f" (stopped: {result['stop_reason']})"
+        lines.append(f"\n## {result['title']}{status}\n{result['summary']}")
+    if conflicts:
+        lines.append("\nConflicts: these files were changed by more than one subtask and need review:")
+        lines.extend(f"- {path}: {', '.join(titles)}" for path, titles in sorted(conflicts.items()))
+    return "\n".join(lines), conflicts
@@ -1,36 +1,86 @@
 from langgraph.graph import StateGraph, END
+from langgraph.checkpoint.base import BaseCheckpointSaver
 from langgraph.prebuilt import ToolNode
-from langchain_core.messages import HumanMessage, AIMessage, SystemMessage, ToolMessage
+from langgraph.types import Send
+from langchain_core.messages import BaseMessage, HumanMessage, AIMessage, SystemMessage, ToolMessage
 from langchain_core.chat_history import BaseChatMessageHistory
 from langchain_community.chat_message_histories import ChatMessageHistory
-from typing import TypedDict, Annotated, Sequence, Union, List, Dict, Any, Callable, Literal, Optional
+from typing import TypedDict, Annotated, Sequence, Union, List, Dict, Any, Callable, Literal, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from dataclasses import asdict
+from datetime import datetime
+from functools import wraps
+import contextvars
 import operator
 import logging
 import json
+import os
+import time
+import uuid
 
 from tools.agent_tools import get_agent_tools
-from src.prompts.system import get_system_prompt
+from tools.rendering import result_format_for
+from tools.workspace_router import default_dev_container_url
+from src.prompts.system import get_planner_prompt, get_subtask_message, get_system_prompt
+from src.agent.fan_out import Subtask, files_written, join_results, parse_plan
+from src.agent.memory import MemoryStore, format_recalled, window_start
+from src.llm.base import BaseLLM
 from src.llm.factory import LLMFactory
-from src.config.llm_config import DEFAULT_CONFIG
+from src.llm.pool import get_llm_pool
+from src.llm.router import RoutedLLM
+from src.config.llm_config import DEFAULT_CONFIG, LLMConfig
+from src.agent.checkpoint import create_checkpointer, prune_checkpoints
+from src.observability import metrics
+from src.observability.memory_usage import SessionFootprint
+from src.runtime.budget import BudgetTracker, DeadlineExceeded, ExecutionBudget, StopReason
+from src.runtime.cancellation import RunCancelled
+from src.runtime.context import RunContext, get_run_context, use_run_context
 
-# Set up logging
-logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
+class WorkspaceUnknown(LookupError):
+    """A run cannot be resumed because the dev_container it used is not known."""
+
 class AgentState(TypedDict, total=False):
     messages: Annotated[Sequence[Union[HumanMessage, AIMessage, SystemMessage, ToolMessage]], operator.add]
     chat_history: Annotated[List[Dict[str, str]], operator.add]
     pending_response: Optional[AIMessage]
     session_id: str
+    run_id: str
+    stop_reason: Optional[str]
+    usage: Dict[str, Any]
+    # Fan-out: the planned subtasks, the subtask of a sub-agent, the merged results and conflicting paths
+    subtasks: List[Dict[str, Any]]
+    subtask: Optional[Dict[str, Any]]
+    subtask_results: Annotated[List[Dict[str, Any]], operator.add]
+    conflicts: Dict[str, List[str]]
 
 class AgentGraph:
     """Main agent graph implementation."""
     
-    def __init__(self, llm_config=DEFAULT_CONFIG):
+    def __init__(self, llm_config=DEFAULT_CONFIG, checkpointer: Optional[BaseCheckpointSaver] = None):
         """Initialize the agent graph with specified LLM configuration."""
+        self.llm_config = llm_config
+        self.checkpointer = checkpointer or create_checkpointer()
         self.llm = LLMFactory.create_llm(llm_config)
         self.tools = get_agent_tools()
+        # Read-only tool calls are started while the model is still streaming its response
+        self.speculative_tool_calls = os.getenv("SPECULATIVE_TOOL_CALLS", "true").lower() != "false"
+        self.tool_executor = ThreadPoolExecutor(
+            max_workers=int(os.getenv("SPECULATIVE_TOOL_WORKERS", "4")),
+            thread_name_prefix="speculative-tool"
+        )
+        # Requests may be split into subtasks run by parallel sub-agents; runs can override this
+        self.fan_out = os.getenv("FAN_OUT_ENABLED", "false").lower() == "true"
+        self.max_subtasks = int(os.getenv("FAN_OUT_MAX_SUBTASKS", "6"))
         self.chat_histories: Dict[str, ChatMessageHistory] = {}
+        # Unix time each session's history was last used
+        self.session_access: Dict[str, float] = {}
+        # Run most recently started for each session by this process
+        self.latest_runs: Dict[str, str] = {}
+        # Long sessions can be recalled from a per-session index instead of being sent whole
+        self.memory = MemoryStore.from_env()
         
         # Create system message with tool descriptions
         tool_descriptions = "\n".join(f"- {tool.name}: {tool.description}" for tool in self.tools)
@@ -39,12 +89,53 @@ class AgentGraph:
         # Initialize the graph
         self._create_graph()
         
+    def configure_llm(self, llm_config: LLMConfig) -> None:
+        """Change the default model of runs that do not choose their own.
+        
+        The compiled graph, tools and session state are kept.
+        """
+        self.llm = get_llm_pool().get(llm_config)
+        self.llm_config = llm_config
+        
+    def _model(self) -> Tuple[LLMConfig, BaseLLM]:
+        """Configuration and client of the model serving the active run."""
+        llm_config = get_run_context().llm_config
+        if llm_config is None:
+            return self.llm_config, self.llm
+        return llm_config, get_llm_pool().get(llm_config)
+        
     def get_chat_history(self, session_id: str) -> ChatMessageHistory:
         """Get or create a chat history for the given session ID."""
         if session_id not in self.chat_histories:
             self.chat_histories[session_id] = ChatMessageHistory()
+        self.session_access[session_id] = time.time()
         return self.chat_histories[session_id]
         
+    def session_footprints(self) -> Dict[str, SessionFootprint]:
+        """Approximate memory held for each session: its history and its retrieval index."""
+        footprints: Dict[str, SessionFootprint] = {}
+        for session_id, history in list(self.chat_histories.items()):
+            footprint = footprints[session_id] = SessionFootprint(session_id, last_access=self.session_access.get(session_id))
+            footprint.add_messages(list(history.messages))
+        if self.memory is not None:
+            for session_id, memory in self.memory.loaded().items():
+                footprint = footprints.setdefault(session_id, SessionFootprint(session_id))
+                footprint.memory_snippets, footprint.memory_bytes = len(memory), memory.text_bytes()
+        return footprints
+        
+    def evict_session(self, session_id: str) -> bool:
+        """Drop a session's history from memory; a persisted retrieval index stays on disk.
+        
+        Returns:
+            Whether anything was held for the session
+        """
+        evicted = self.chat_histories.pop(session_id, None) is not None
+        self.session_access.pop(session_id, None)
+        self.latest_runs.pop(session_id, None)
+        if self.memory is not None:
+            evicted = self.memory.evict(session_id) or evicted
+        return evicted
+        
     def _should_continue(self, state: AgentState) -> Literal["tool", END]:
         """Route to the next step based on the last message."""
         try:
@@ -53,21 +144,25 @@ class AgentGraph:
                 logger.debug("No messages in state")
                 return END
                 
+            if state.get("stop_reason"):
+                logger.debug("Run stopped: %s", state['stop_reason'])
+                return END
+                
             last_message = messages[-1]
-            logger.debug(f"Last message type: {type(last_message)}")
-            logger.debug(f"Last message content: {last_message}")
+            logger.debug("Last message type: %s", type(last_message))
+            logger.debug("Last message content: %s", last_message)
             
             # Check pending response first
             pending_response = state.get("pending_response")
             if pending_response and pending_response.additional_kwargs.get('tool_calls'):
-                logger.debug(f"Found pending response with tool calls")
+                logger.debug("Found pending response with tool calls")
                 return "tool"
             
             # Only continue if the last message is an AI message with tool calls
             if isinstance(last_message, AIMessage):
                 tool_calls = last_message.additional_kwargs.get('tool_calls', [])
                 if tool_calls and not any(isinstance(m, ToolMessage) for m in messages):
-                    logger.debug(f"Found tool calls in last message")
+                    logger.debug("Found tool calls in last message")
                     return "tool"
                 logger.debug("AI message with no new tool calls, ending")
                 return END
@@ -75,7 +170,7 @@ class AgentGraph:
             logger.debug("Non-AI message or all tools executed, ending")
             return END
         except Exception as e:
-            logger.error(f"Error in should_continue: {str(e)}", exc_info=True)
+            logger.error("Error in should_continue: %s", e, exc_info=True)
             raise
             
     def _call_llm(self, state: AgentState) -> AgentState:
@@ -84,37 +179,63 @@ class AgentGraph:
             messages = state["messages"]
             session_id = state.get("session_id", "default")
             chat_history = self.get_chat_history(session_id)
+            context = get_run_context()
+            budget = context.budget
             
-            # Add system message to start of conversation if needed
-            if len(messages) == 1 and isinstance(messages[0], HumanMessage):
-                messages = [SystemMessage(content=self.system_msg)] + messages
-                state["messages"] = messages
+            stop_reason = StopReason.CANCELLED if context.cancellation.cancelled else budget.exceeded()
+            if stop_reason:
+                return self._stop(stop_reason, budget)
                 
-            # Get full conversation history
-            all_messages = list(chat_history.messages) + messages
-            logger.debug(f"Full conversation history: {all_messages}")
+            with context.tracer.span("format_messages"):
+                # Get full conversation history: the system prompt, earlier turns of
+                # the session and the messages of this run. Sub-agents only see their subtask
+                history = [] if state.get("subtask") else list(chat_history.messages)
+                conversation = history + list(messages)
+                system_msg = self.system_msg
+                if self.memory is not None and not state.get("subtask"):
+                    conversation, recalled = self._recall(session_id, conversation)
+                    system_msg += recalled
+                all_messages = [SystemMessage(content=system_msg)] + conversation
+                logger.debug("Full conversation history: %s", all_messages)
+                    
+                # Create a list of tool configurations for the model
+                tools_for_model = [{
+                    "function": {
+                        "name": tool.name,
+                        "description": tool.description,
+                        "parameters": tool.args_schema.schema()
+                    }
+                } for tool in self.tools]
                 
-            # Create a list of tool configurations for the model
-            tools_for_model = [{
-                "function": {
-                    "name": tool.name,
-                    "description": tool.description,
-                    "parameters": tool.args_schema.schema()
-                }
-            } for tool in self.tools]
-            
-            logger.debug(f"Using tools: {json.dumps(tools_for_model, indent=2)}")
+                logger.debug("Using tools: %s", tools_for_model)
             
-            # Call the model with tool configurations and chat history
-            response = self.llm.invoke(
-                all_messages,
-                tools=tools_for_model
-            )
+            # Call the model with tool configurations and chat history. The
+            # response is always streamed so a cancelled run stops generating
+            try:
+                llm_config, llm = self._model()
+                with context.slots.acquire("llm"), _provider_slot(context, llm_config, llm), context.tracer.span("llm_call", category="llm", provider=llm_config.llm_type, model=llm.get_model_name()) as span:
+                    started_at = time.perf_counter()
+                    response = llm.invoke(
+                        all_messages,
+                        tools=tools_for_model,
+                        on_tool_call=self._speculator()
+                    )
+                    # With model routing, the step may have been answered by another model
+                    model_name = response.response_metadata.get("routed_model") or llm.get_model_name()
+                    provider = response.response_metadata.get("routed_provider") or llm_config.llm_type
+                    metrics.record_llm_call(provider, model_name, time.perf_counter() - started_at, response)
+                    span["provider"], span["model"] = provider, model_name
+                    span["usage"] = getattr(response, "usage_metadata", None)
+            except RunCancelled:
+                return self._stop(StopReason.CANCELLED, budget)
+            except DeadlineExceeded:
+                return self._stop(StopReason.DEADLINE, budget)
+            budget.record_llm_call(model_name, getattr(response, "usage_metadata", None))
             response_info = {
                 'content': response.content,
                 'kwargs': response.additional_kwargs
             }
-            logger.debug(f"LLM response: {json.dumps(response_info, indent=2)}")
+            logger.debug("LLM response: %s", response_info)
             
             # Check for duplicate response
             if any(
@@ -125,9 +246,7 @@ class AgentGraph:
             ):
                 logger.debug("Duplicate response detected, not adding to messages")
                 return {
-                    "messages": messages,
                     "pending_response": None,
-                    "chat_history": state["chat_history"],
                     "session_id": session_id
                 }
             
@@ -135,24 +254,20 @@ class AgentGraph:
             if response.additional_kwargs.get('tool_calls'):
                 logger.debug("Found tool calls, storing in pending_response")
                 return {
-                    "messages": messages,
                     "pending_response": response,
-                    "chat_history": state["chat_history"],
                     "session_id": session_id
                 }
             
-            # Add response to chat history
-            chat_history.add_message(response)
-            
             logger.debug("No tool calls, adding response to messages")
+            self._remember(state, [response])
+            # Nodes return only new messages; the operator.add reducer appends them
             return {
-                "messages": messages + [response],
+                "messages": [response],
                 "pending_response": None,
-                "chat_history": state["chat_history"],
                 "session_id": session_id
             }
         except Exception as e:
-            logger.error(f"Error in call_llm: {str(e)}", exc_info=True)
+            logger.error("Error in call_llm: %s", e, exc_info=True)
             raise
             
     def _call_tool(self, state: AgentState) -> AgentState:
@@ -160,7 +275,8 @@ class AgentGraph:
         try:
             messages = state["messages"]
             session_id = state.get("session_id", "default")
-            chat_history = self.get_chat_history(session_id)
+            context = get_run_context()
+            budget = context.budget
             
             # Get the pending response if it exists
             pending_response = state.get("pending_response")
@@ -173,14 +289,12 @@ class AgentGraph:
             
             # Get tool calls from the message
             tool_calls = last_message.additional_kwargs.get('tool_calls', [])
-            logger.debug(f"Found tool calls: {json.dumps(tool_calls, indent=2)}")
+            logger.debug("Found tool calls: %s", tool_calls)
             
             if not tool_calls:
                 logger.warning("No tool calls found in message")
                 return {
-                    "messages": messages,
                     "pending_response": None,
-                    "chat_history": state["chat_history"],
                     "session_id": session_id
                 }
                 
@@ -193,13 +307,23 @@ class AgentGraph:
                 for msg in messages
             ):
                 new_messages.append(pending_response)
-                chat_history.add_message(pending_response)
             
             for tool_call in tool_calls:
                 try:
+                    # Once the run is cancelled or out of budget, answer the remaining calls without running them
+                    stop_reason = StopReason.CANCELLED if context.cancellation.cancelled else budget.exceeded(before_llm_call=False)
+                    if stop_reason:
+                        tool_msg = ToolMessage(
+                            content=f"<tool_result>Skipped: {_describe_stop(stop_reason)}</tool_result>",
+                            tool_call_id=tool_call.get('id', 'unknown'),
+                            name=tool_call.get('function', {}).get('name', 'unknown')
+                        )
+                        new_messages.append(tool_msg)
+                        continue
+                    
                     # Skip if we've already processed this tool call
                     if any(msg for msg in messages if isinstance(msg, ToolMessage) and getattr(msg, 'tool_call_id', None) == tool_call.get('id')):
-                        logger.debug(f"Skipping already processed tool call: {tool_call.get('id')}")
+                        logger.debug("Skipping already processed tool call: %s", tool_call.get('id'))
                         continue
                     
                     # Extract tool call info
@@ -208,35 +332,33 @@ class AgentGraph:
                     action = function_info.get('name')
                     args_str = function_info.get('arguments', '{}')
                     
-                    logger.debug(f"Processing tool call: {tool_call_id} - {action}")
+                    logger.debug("Processing tool call: %s - %s", tool_call_id, action)
                     
                     if not action or not tool_call_id:
-                        logger.warning(f"Invalid tool call format: {tool_call}")
+                        logger.warning("Invalid tool call format: %s", tool_call)
                         tool_msg = ToolMessage(
                             content="<tool_result>Invalid tool call format</tool_result>",
                             tool_call_id=tool_call_id or "unknown",
                             name=action or "unknown"
                         )
                         new_messages.append(tool_msg)
-                        chat_history.add_message(tool_msg)
                         continue
                     
                     # Parse arguments
                     try:
                         args = json.loads(args_str)
-                        logger.debug(f"Parsed arguments: {json.dumps(args, indent=2)}")
+                        logger.debug("Parsed arguments: %s", args)
                     except json.JSONDecodeError:
-                        logger.error(f"Failed to parse tool arguments: {args_str}")
+                        logger.error("Failed to parse tool arguments: %s", args_str)
                         tool_msg = ToolMessage(
                             content=f"<tool_result>Failed to parse tool arguments: {args_str}</tool_result>",
                             tool_call_id=tool_call_id,
                             name=action
                         )
                         new_messages.append(tool_msg)
-                        chat_history.add_message(tool_msg)
                         continue
                     
-                    logger.debug(f"Executing tool: {action} with args: {args}")
+                    logger.debug("Executing tool: %s with args: %s", action, args)
                     
                     # Execute the tool
                     tool_to_use = next((t for t in self.tools if t.name == action), None)
@@ -249,12 +371,16 @@ class AgentGraph:
                             name=action
                         )
                         new_messages.append(tool_msg)
-                        chat_history.add_message(tool_msg)
                         continue
                         
                     try:
-                        # Execute tool and format result
-                        tool_result = tool_to_use.invoke(args)
+                        # Execute tool, reusing the result of a read started while the model was streaming
+                        speculative_result = context.speculative_tool_results.pop(tool_call_id, None)
+                        if speculative_result is not None:
+                            logger.debug("Using speculative result for tool call %s", tool_call_id)
+                            tool_result = speculative_result.result()
+                        else:
+                            tool_result = self._invoke_tool(tool_to_use, args)
                         
                         # Format tool result for Claude
                         tool_msg = ToolMessage(
@@ -269,8 +395,7 @@ class AgentGraph:
                         )
                         
                         new_messages.append(tool_msg)
-                        chat_history.add_message(tool_msg)
-                        logger.debug(f"Tool execution successful: {tool_result}")
+                        logger.debug("Tool execution successful: %s", tool_result)
                         
                     except Exception as e:
                         error_msg = f"Error executing tool {action}: {str(e)}"
@@ -287,7 +412,6 @@ class AgentGraph:
                             }
                         )
                         new_messages.append(tool_msg)
-                        chat_history.add_message(tool_msg)
                         
                 except Exception as e:
                     error_msg = f"Error processing tool call: {str(e)}"
@@ -298,7 +422,6 @@ class AgentGraph:
                         name=tool_call.get('function', {}).get('name', 'unknown')
                     )
                     new_messages.append(tool_msg)
-                    chat_history.add_message(tool_msg)
             
             # Ensure we have a response for each new tool call
             tool_call_ids = {tc.get('id') for tc in tool_calls if tc.get('id')}
@@ -306,7 +429,7 @@ class AgentGraph:
             
             missing_ids = tool_call_ids - response_ids
             if missing_ids:
-                logger.warning(f"Missing responses for tool calls: {missing_ids}")
+                logger.warning("Missing responses for tool calls: %s", missing_ids)
                 for missing_id in missing_ids:
                     tool_call = next(tc for tc in tool_calls if tc.get('id') == missing_id)
                     action = tool_call.get('function', {}).get('name', 'unknown')
@@ -316,27 +439,210 @@ class AgentGraph:
                         name=action
                     )
                     new_messages.append(tool_msg)
-                    chat_history.add_message(tool_msg)
             
-            logger.debug(f"Final message count: {len(messages + new_messages)}")
-            # Return all messages including the original messages and new tool responses
+            logger.debug("Final message count: %s", len(messages + new_messages))
+            self._remember(state, new_messages)
+            # Return only the new messages; the reducer appends them to the state
             return {
-                "messages": messages + new_messages,
+                "messages": new_messages,
                 "pending_response": None,
-                "chat_history": state["chat_history"],
                 "session_id": session_id
             }
         except Exception as e:
-            logger.error(f"Error in call_tool: {str(e)}", exc_info=True)
+            logger.error("Error in call_tool: %s", e, exc_info=True)
             raise
             
-    def _create_graph(self) -> None:
-        """Create and compile the workflow graph."""
-        workflow = StateGraph(AgentState)
+    def _recall(self, session_id: str, conversation: List[BaseMessage]) -> Tuple[List[BaseMessage], str]:
+        """Cut a conversation to the memory window and recall earlier snippets relevant to it.
+        
+        Returns:
+            The messages to send and the recalled snippets as a system prompt section
+        """
+        self._remember({"session_id": session_id}, [msg for msg in conversation if isinstance(msg, HumanMessage)])
+        start = window_start(conversation, self.memory.window)
+        window = conversation[start:]
+        # Keep the request being worked on, even once its run outgrew the window
+        if not any(isinstance(msg, HumanMessage) for msg in window):
+            request = next((msg for msg in reversed(conversation[:start]) if isinstance(msg, HumanMessage)), None)
+            window = [request] + window if request else window
+        snippets = self.memory.recall(session_id, window)
+        metrics.record_memory_recall(len(conversation) - len(window), len(snippets))
+        return window, format_recalled(snippets)
+        
+    def _remember(self, state: AgentState, messages: List[BaseMessage]) -> None:
+        """Index messages of the session for later recall; sub-agents keep no memory."""
+        if self.memory is not None and not state.get("subtask"):
+            self.memory.get(state.get("session_id", "default")).add(messages)
+            
+    def _speculator(self) -> Callable[[Dict[str, Any]], None]:
+        """Callback starting the read-only tool calls of one response early.
+        
+        Calls are reported in the order of the response. Once a call may change
+        something, the calls after it have to see its effect, so none of them
+        is started before _call_tool runs them in order.
+        """
+        blocked = False
+        
+        def start(tool_call: Dict[str, Any]) -> None:
+            nonlocal blocked
+            if not blocked and not self._start_read_only_tool(tool_call):
+                blocked = True
+                
+        return start
+        
+    def _start_read_only_tool(self, tool_call: Dict[str, Any]) -> bool:
+        """Start a streamed tool call early if it only reads.
+        
+        Called by the LLM adapter as soon as the call's arguments are complete.
+        The result is picked up in order by _call_tool once the full response
+        has arrived.
+        
+        Returns:
+            Whether the call was started
+        """
+        if not self.speculative_tool_calls:
+            return False
+            
+        function_info = tool_call.get('function', {})
+        tool_to_use = next((t for t in self.tools if t.name == function_info.get('name')), None)
+        if tool_to_use is None or not hasattr(tool_to_use, "is_read_only"):
+            return False
+            
+        try:
+            args = json.loads(function_info.get('arguments') or '{}')
+        except json.JSONDecodeError:
+            return False
+            
+        if not tool_to_use.is_read_only(args):
+            return False
+            
+        logger.debug("Speculatively starting read-only tool call %s: %s", tool_call['id'], tool_to_use.name)
+        get_run_context().tracer.instant("speculative_tool_start", category="tool", tool=tool_to_use.name)
+        get_run_context().speculative_tool_results[tool_call['id']] = self.tool_executor.submit(
+            contextvars.copy_context().run, self._invoke_tool, tool_to_use, args
+        )
+        return True
+        
+    def _invoke_tool(self, tool: Any, args: Dict[str, Any]) -> Any:
+        """Run a tool while holding one of the process-wide tool slots."""
+        context = get_run_context()
+        with context.slots.acquire("tool"), context.tracer.span(f"tool:{tool.name}", category="tool"), _profiled(context):
+            started_at = time.perf_counter()
+            try:
+                result = tool.invoke(args)
+            except Exception:
+                metrics.record_tool_call(tool.name, time.perf_counter() - started_at, error=True)
+                raise
+            metrics.record_tool_call(tool.name, time.perf_counter() - started_at)
+            return result
+        
+    def _route_start(self, state: AgentState) -> Literal["planner", "agent"]:
+        """Plan first if fan-out is enabled for the run."""
+        fan_out = get_run_context().fan_out
+        return "planner" if (self.fan_out if fan_out is None else fan_out) else "agent"
+        
+    def _plan(self, state: AgentState) -> AgentState:
+        """Ask the model whether the request splits into independent subtasks."""
+        context = get_run_context()
+        budget = context.budget
+        stop_reason = StopReason.CANCELLED if context.cancellation.cancelled else budget.exceeded()
+        if stop_reason:
+            return self._stop(stop_reason, budget)
+            
+        request = state["messages"][-1].content
+        planning_messages = [SystemMessage(content=get_planner_prompt(self.max_subtasks)), HumanMessage(content=request)]
+        llm_config, llm = self._model()
+        try:
+            with context.slots.acquire("llm"), _provider_slot(context, llm_config, llm), context.tracer.span("plan", category="llm", provider=llm_config.llm_type, model=llm.get_model_name()):
+                started_at = time.perf_counter()
+                response = llm.invoke(planning_messages)
+                provider = response.response_metadata.get("routed_provider") or llm_config.llm_type
+                metrics.record_llm_call(provider, llm.get_model_name(), time.perf_counter() - started_at, response)
+        except RunCancelled:
+            return self._stop(StopReason.CANCELLED, budget)
+        except DeadlineExceeded:
+            return self._stop(StopReason.DEADLINE, budget)
+        budget.record_llm_call(llm.get_model_name(), getattr(response, "usage_metadata", None))
+        
+        subtasks = parse_plan(response.content, self.max_subtasks)
+        logger.info("Planned %s subtasks", len(subtasks) or "no")
+        return {"subtasks": [asdict(subtask) for subtask in subtasks]}
+        
+    def _route_plan(self, state: AgentState) -> Union[List[Send], Literal["agent"], Literal[END]]:
+        """Start one sub-agent per subtask, or run the request as a whole."""
+        if state.get("stop_reason"):
+            return END
+        subtasks = state.get("subtasks") or []
+        if not subtasks:
+            return "agent"
+        request = state["messages"][-1].content
+        return [
+            Send("subagent", {"subtask": subtask, "messages": [HumanMessage(content=request)], "session_id": state.get("session_id", "default")})
+            for subtask in subtasks
+        ]
+        
+    def _run_subtask(self, state: AgentState) -> AgentState:
+        """Work on one subtask with a context of its own, in parallel with the others."""
+        subtask = Subtask(**state["subtask"])
+        request = state["messages"][-1].content
+        sub_state = {
+            "messages": [HumanMessage(content=get_subtask_message(request, subtask.title, subtask.instructions, subtask.files))],
+            "session_id": state.get("session_id", "default"),
+            "subtask": state["subtask"],
+        }
+        budget = get_run_context().budget.budget
+        try:
+            result = self.loop_graph.invoke(sub_state, config={"recursion_limit": 2 * budget.max_steps + 3 if budget.max_steps else 10_000})
+        except RunCancelled:
+            result = {"messages": sub_state["messages"], "stop_reason": StopReason.CANCELLED}
+        except Exception as e:
+            # One failed subtask should not lose the work of the others
+            logger.error("Subtask %r failed: %s", subtask.title, e, exc_info=True)
+            result = {"messages": sub_state["messages"] + [AIMessage(content=f"Failed: {e}")], "stop_reason": "error"}
+        
+        last_message = next((msg for msg in reversed(result["messages"]) if isinstance(msg, AIMessage)), None)
+        return {"subtask_results": [{
+            "title": subtask.title,
+            "summary": last_message.content if last_message else "No response generated",
+            "files": files_written(result["messages"]),
+            "stop_reason": result.get("stop_reason") or StopReason.COMPLETED,
+        }]}
+        
+    def _join(self, state: AgentState) -> AgentState:
+        """Merge the sub-agents' results and report files changed by more than one of them."""
+        results = state.get("subtask_results") or []
+        report, conflicts = join_results(results)
+        if conflicts:
+            logger.warning("Subtasks changed the same files: %s", conflicts)
+        stop_reason = next((result["stop_reason"] for result in results if result["stop_reason"] not in (StopReason.COMPLETED, "error")), None)
+        update = {"messages": [AIMessage(content=report)], "conflicts": conflicts, "pending_response": None}
+        if stop_reason:
+            update["stop_reason"] = stop_reason
+        return update
+        
+    def _stop(self, stop_reason: str, budget: BudgetTracker) -> AgentState:
+        """End the run gracefully, keeping the progress made so far."""
+        logger.info("Stopping run: %s after %s steps", _describe_stop(stop_reason), budget.steps)
+        return {
+            "messages": [AIMessage(content=f"Stopped before completing the task: {_describe_stop(stop_reason)}.")],
+            "pending_response": None,
+            "stop_reason": stop_reason
+        }
+            
+    def _instrument_node(self, name: str, node: Callable[[AgentState], AgentState]) -> Callable[[AgentState], AgentState]:
+        """Record each execution of a graph node in the run's trace and, if enabled, its profile."""
+        @wraps(node)
+        def wrapper(state: AgentState) -> AgentState:
+            context = get_run_context()
+            with context.tracer.span(f"node:{name}", category="graph"), _profiled(context):
+                return node(state)
+        return wrapper
         
+    def _add_loop(self, workflow: StateGraph) -> None:
+        """Add the agent/tool loop to a workflow."""
         # Define the nodes
-        workflow.add_node("agent", self._call_llm)
-        workflow.add_node("tool", self._call_tool)
+        workflow.add_node("agent", metrics.timed_node("agent", self._instrument_node("agent", self._call_llm)))
+        workflow.add_node("tool", metrics.timed_node("tool", self._instrument_node("tool", self._call_tool)))
         
         # Add conditional edges
         workflow.add_conditional_edges(
@@ -351,15 +657,171 @@ class AgentGraph:
         # Add edge from tool back to agent
         workflow.add_edge("tool", "agent")
         
+    def _create_graph(self) -> None:
+        """Create and compile the workflow graph."""
+        workflow = StateGraph(AgentState)
+        self._add_loop(workflow)
+        
+        # Optional fan-out: a planner splits the request, sub-agents work in parallel and a join merges their results
+        workflow.add_node("planner", metrics.timed_node("planner", self._instrument_node("planner", self._plan)))
+        workflow.add_node("subagent", metrics.timed_node("subagent", self._instrument_node("subagent", self._run_subtask)))
+        workflow.add_node("join", metrics.timed_node("join", self._instrument_node("join", self._join)))
+        workflow.add_conditional_edges("planner", self._route_plan, ["subagent", "agent", END])
+        workflow.add_edge("subagent", "join")
+        workflow.add_edge("join", END)
+        
         # Set entry point
-        workflow.set_entry_point("agent")
+        workflow.set_conditional_entry_point(self._route_start, {"planner": "planner", "agent": "agent"})
+        
+        # Compile with a checkpointer so interrupted runs can be resumed
+        self.graph = workflow.compile(checkpointer=self.checkpointer)
+        
+        # Sub-agents run the loop on their own; their progress is not checkpointed
+        loop = StateGraph(AgentState)
+        self._add_loop(loop)
+        loop.set_entry_point("agent")
+        self.loop_graph = loop.compile(checkpointer=False)
+        
+    def run(self, state: AgentState, budget: Optional[ExecutionBudget] = None, run_id: Optional[str] = None, context: Optional[RunContext] = None) -> AgentState:
+        """Run the agent graph with the given state.
+        
+        Args:
+            state: Initial state of the run
+            budget: Limits for this run, defaults to the budget of the LLM configuration
+            run_id: Identifier of the run, used to resume it if it is interrupted
+            context: Run context prepared by the caller (e.g. with the scheduler's
+                concurrency slots); its budget tracker is replaced
+            
+        Returns:
+            Final state, including ``run_id``, ``stop_reason`` and ``usage``
+        """
+        session_id = state.get("session_id", "default")
+        return self._execute(state, session_id, run_id or uuid.uuid4().hex, budget, context)
         
-        # Compile with validation
-        self.graph = workflow.compile()
+    def resume(self, session_id: str, run_id: Optional[str] = None, budget: Optional[ExecutionBudget] = None, context: Optional[RunContext] = None) -> AgentState:
+        """Continue an interrupted run from its last completed node.
         
-    def run(self, state: AgentState) -> AgentState:
-        """Run the agent graph with the given state."""
-        return self.graph.invoke(state)
+        Completed LLM calls and tool executions are restored from the
+        checkpoint instead of being repeated.
+        
+        Args:
+            session_id: Session the run belongs to
+            run_id: Run to resume, defaults to the latest run of the session
+            budget: Limits for the resumed part of the run
+            context: Run context prepared by the caller
+            
+        The run continues on the dev_container recorded with its checkpoints,
+        whatever the session is routed to now.
+        
+        Raises:
+            LookupError: If there is no unfinished run to resume
+            WorkspaceUnknown: If no dev_container was recorded for the run
+        """
+        run_id = run_id or self.latest_run_id(session_id)
+        if run_id is None:
+            raise LookupError(f"No runs found for session {session_id}")
+            
+        snapshot = self.graph.get_state(self._thread_config(session_id, run_id))
+        if not snapshot.next:
+            raise LookupError(f"Run {run_id} of session {session_id} has no unfinished steps")
+        workspace = self._run_workspace(session_id, run_id)
+        if not workspace:
+            raise WorkspaceUnknown(f"Run {run_id} of session {session_id} has no recorded dev_container; not resuming it on another one")
+        context = context or RunContext()
+        context.dev_container_url = workspace
+            
+        logger.info("Resuming run %s of session %s at %s", run_id, session_id, snapshot.next)
+        return self._execute(None, session_id, run_id, budget, context)
+        
+    def latest_run_id(self, session_id: str) -> Optional[str]:
+        """Get the id of the most recently started run of a session that still has checkpoints."""
+        run_id = self.latest_runs.get(session_id)
+        if run_id and self.has_run(session_id, run_id):
+            return run_id
+        # Runs from before a restart: savers do not order checkpoints across threads, so sort by time
+        latest = max(
+            self.checkpointer.list(None, filter={"session_id": session_id}),
+            key=lambda checkpoint: datetime.fromisoformat(checkpoint.checkpoint["ts"]),
+            default=None,
+        )
+        if latest is None:
+            return None
+        return latest.config["configurable"]["thread_id"].rsplit(":", 1)[1]
+        
+    def has_run(self, session_id: str, run_id: str) -> bool:
+        """Whether a run of a session has checkpoints."""
+        return self.checkpointer.get_tuple(self._thread_config(session_id, run_id)) is not None
+        
+    def recorded_workspace(self, session_id: str) -> Optional[str]:
+        """Get the dev_container recorded with the latest run of a session."""
+        run_id = self.latest_run_id(session_id)
+        return self._run_workspace(session_id, run_id) if run_id else None
+        
+    def _run_workspace(self, session_id: str, run_id: str) -> Optional[str]:
+        """Dev_container recorded with the checkpoints of a run; state updates do not carry it."""
+        for checkpoint in self.checkpointer.list(self._thread_config(session_id, run_id)):
+            workspace = (checkpoint.metadata or {}).get("dev_container_url")
+            if workspace:
+                return workspace
+        return None
+        
+    def prune_checkpoints(self, max_age_hours: Optional[float] = None) -> int:
+        """Delete checkpoints of runs older than the retention period."""
+        return prune_checkpoints(self.checkpointer, max_age_hours)
+        
+    def _thread_config(self, session_id: str, run_id: str) -> Dict[str, Any]:
+        """Build the LangGraph config addressing the checkpoint thread of a run."""
+        # session_id is copied into the checkpoint metadata, which makes runs searchable by session
+        return {"configurable": {"thread_id": f"{session_id}:{run_id}", "session_id": session_id}}
+        
+    def _execute(self, graph_input: Optional[AgentState], session_id: str, run_id: str, budget: Optional[ExecutionBudget], context: Optional[RunContext] = None) -> AgentState:
+        """Invoke or resume the graph on the checkpoint thread of a run."""
+        budget = budget or self.llm_config.budget
+        context = context or RunContext()
+        context.budget = BudgetTracker(budget)
+        context.tool_result_format = result_format_for((context.llm_config or self.llm_config).llm_type)
+        config = self._thread_config(session_id, run_id)
+        self.latest_runs[session_id] = run_id
+        # Recorded in the checkpoint metadata, so resumes and later runs stay on the run's dev_container
+        config["configurable"]["dev_container_url"] = context.dev_container_url or default_dev_container_url()
+        # Every step is an agent and a tool superstep; leave room for the final agent step and the fan-out nodes
+        config["recursion_limit"] = 2 * budget.max_steps + 6 if budget.max_steps else 10_000
+        
+        with use_run_context(context), _profiled(context):
+            try:
+                result = self.graph.invoke(graph_input, config=config)
+            except Exception:
+                metrics.record_run("error", context.budget.steps)
+                raise
+                
+            finally:
+                if self.memory is not None:
+                    self.memory.save(session_id)
+                
+            # Commit the run to the session history so later turns see it
+            self.get_chat_history(session_id).add_messages(
+                [msg for msg in result["messages"] if not isinstance(msg, SystemMessage)]
+            )
+        
+        result["run_id"] = run_id
+        result["stop_reason"] = result.get("stop_reason") or StopReason.COMPLETED
+        result["usage"] = context.budget.to_dict()
+        metrics.record_run(result["stop_reason"], context.budget.steps)
+        return result
+
+def _profiled(context: RunContext):
+    """Sample the current thread if the run is being profiled."""
+    return context.profiler.attach() if context.profiler else nullcontext()
+
+def _provider_slot(context: RunContext, llm_config: LLMConfig, llm: BaseLLM):
+    """Slot of the model's provider; routed models take the slot of the model each step goes to."""
+    return nullcontext() if isinstance(llm, RoutedLLM) else context.slots.acquire(f"llm:{llm_config.llm_type}")
+
+def _describe_stop(stop_reason: str) -> str:
+    """Human-readable reason for ending a run early."""
+    if stop_reason == StopReason.CANCELLED:
+        return "run cancelled"
+    return f"run budget exhausted ({stop_reason})"
 
 # Create default instance
 agent = AgentGraph()
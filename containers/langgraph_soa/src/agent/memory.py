@@ -0,0 +1,265 @@
+from collections import Counter, OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set
+import hashlib
+import json
+import logging
+import math
+import os
+import re
+import threading
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, ToolMessage
+
+logger = logging.getLogger(__name__)
+
+# Long messages are indexed in chunks, so a match recalls the part that matters
+SNIPPET_LINES = 30
+SNIPPET_CHARS = 2000
+# BM25 parameters: term frequency saturation and length normalization
+K1 = 1.5
+B = 0.75
+
+_TERM = re.compile(r"[a-z0-9_]+")
+
+@dataclass
+class Snippet:
+    """A chunk of a session message, as indexed and recalled."""
+    key: str
+    role: str
+    text: str
+    length: int
+
+def terms(text: str) -> List[str]:
+    """Lowercased words of a text; identifiers such as parse_config stay whole."""
+    return _TERM.findall(text.lower())
+
+def message_snippets(message: BaseMessage) -> List[Snippet]:
+    """Split a message into the snippets it is indexed as."""
+    if isinstance(message, HumanMessage):
+        role = "user"
+    elif isinstance(message, ToolMessage):
+        role = f"tool {message.name}" if message.name else "tool"
+    elif isinstance(message, AIMessage):
+        role = "assistant"
+    else:
+        return []
+    text = message.content if isinstance(message.content, str) else json.dumps(message.content)
+    if isinstance(message, AIMessage):
+        # Tool calls carry what was written and run, e.g. earlier versions of files
+        calls = [
+            f"{call.get('function', {}).get('name')}({call.get('function', {}).get('arguments', '')})"
+            for call in message.additional_kwargs.get("tool_calls") or []
+        ]
+        text = "\n".join([text] + calls) if text else "\n".join(calls)
+    lines = text.strip().split("\n")
+    snippets = []
+    for start in range(0, len(lines), SNIPPET_LINES):
+        chunk = "\n".join(lines[start:start + SNIPPET_LINES])[:SNIPPET_CHARS].strip()
+        if chunk:
+            key = hashlib.sha1(f"{role}\0{chunk}".encode()).hexdigest()[:20]
+            snippets.append(Snippet(key=key, role=role, text=chunk, length=len(terms(chunk))))
+    return snippets
+
+class SessionMemory:
+    """Incremental BM25 index over the messages of one session.
+
+    Identical snippets are indexed once, so adding a message again is
+    harmless. Beyond ``max_snippets`` the least recently added snippets are
+    dropped.
+    """
+
+    def __init__(self, max_snippets: int = 5000):
+        self.max_snippets = max_snippets
+        self.dirty = False
+        self._snippets: 'OrderedDict[str, Snippet]' = OrderedDict()
+        # Term -> snippet key -> term frequency
+        self._postings: Dict[str, Dict[str, int]] = {}
+        self._total_length = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._snippets)
+
+    def text_bytes(self) -> int:
+        """Size of the indexed text, a rough measure of the index's memory."""
+        with self._lock:
+            return sum(len(snippet.text.encode("utf-8", "replace")) for snippet in self._snippets.values())
+
+    def add(self, messages: Iterable[BaseMessage]) -> int:
+        """Index messages.
+
+        Returns:
+            Number of snippets not indexed before
+        """
+        added = 0
+        with self._lock:
+            for message in messages:
+                for snippet in message_snippets(message):
+                    if snippet.key in self._snippets:
+                        self._snippets.move_to_end(snippet.key)
+                        continue
+                    self._insert(snippet)
+                    added += 1
+            while len(self._snippets) > self.max_snippets:
+                self._remove(next(iter(self._snippets)))
+            self.dirty = self.dirty or added > 0
+        return added
+
+    def search(self, query: str, k: int, exclude: Set[str] = frozenset()) -> List[Snippet]:
+        """The k snippets most relevant to a query, best first.
+
+        Args:
+            query: Text to match, e.g. the latest messages
+            k: Number of snippets to return
+            exclude: Keys of snippets not to return, e.g. those already in the prompt
+        """
+        with self._lock:
+            count = len(self._snippets)
+            if not count or k <= 0:
+                return []
+            average = self._total_length / count or 1.0
+            scores: Dict[str, float] = {}
+            for term in set(terms(query)):
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+                for key, frequency in postings.items():
+                    if key in exclude:
+                        continue
+                    norm = K1 * (1 - B + B * self._snippets[key].length / average)
+                    scores[key] = scores.get(key, 0.0) + idf * frequency * (K1 + 1) / (frequency + norm)
+            best = sorted(scores, key=scores.get, reverse=True)[:k]
+            return [self._snippets[key] for key in best]
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"snippets": [[s.key, s.role, s.text] for s in self._snippets.values()]}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any], max_snippets: int = 5000) -> 'SessionMemory':
+        memory = cls(max_snippets)
+        for key, role, text in data.get("snippets") or []:
+            memory._insert(Snippet(key=key, role=role, text=text, length=len(terms(text))))
+        return memory
+
+    def _insert(self, snippet: Snippet) -> None:
+        self._snippets[snippet.key] = snippet
+        self._total_length += snippet.length
+        for term, frequency in Counter(terms(snippet.text)).items():
+            self._postings.setdefault(term, {})[snippet.key] = frequency
+
+    def _remove(self, key: str) -> None:
+        snippet = self._snippets.pop(key)
+        self._total_length -= snippet.length
+        for term in set(terms(snippet.text)):
+            postings = self._postings[term]
+            del postings[key]
+            if not postings:
+                del self._postings[term]
+
+class MemoryStore:
+    """Per-session retrieval memory, persisted as one JSON file per session.
+
+    Prompts then carry the last ``window`` messages of a session and the
+    ``top_k`` earlier snippets most relevant to them, instead of the whole
+    history. Without a ``directory`` the indexes live in memory only.
+    """
+
+    def __init__(self, directory: Optional[str] = None, window: int = 20, top_k: int = 6, max_snippets: int = 5000):
+        self.directory = directory
+        self.window = window
+        self.top_k = top_k
+        self.max_snippets = max_snippets
+        self._sessions: Dict[str, SessionMemory] = {}
+        self._lock = threading.Lock()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    @classmethod
+    def from_env(cls) -> Optional['MemoryStore']:
+        """Create the store configured by SESSION_MEMORY_* environment variables, or None if disabled."""
+        if os.getenv("SESSION_MEMORY_ENABLED", "false").lower() != "true":
+            return None
+        return cls(
+            directory=os.getenv("SESSION_MEMORY_DIR", "session_memory") or None,
+            window=int(os.getenv("SESSION_MEMORY_WINDOW", "20")),
+            top_k=int(os.getenv("SESSION_MEMORY_TOP_K", "6")),
+            max_snippets=int(os.getenv("SESSION_MEMORY_MAX_SNIPPETS", "5000")),
+        )
+
+    def get(self, session_id: str) -> SessionMemory:
+        """Get the session's index, loading it from disk the first time."""
+        with self._lock:
+            memory = self._sessions.get(session_id)
+            if memory is None:
+                memory = self._sessions[session_id] = self._load(session_id)
+            return memory
+
+    def save(self, session_id: str) -> None:
+        """Persist the session's index if it changed."""
+        with self._lock:
+            memory = self._sessions.get(session_id)
+        if not self.directory or memory is None or not memory.dirty:
+            return
+        path = self._path(session_id)
+        temporary = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(temporary, "w", encoding="utf-8") as f:
+                json.dump({"session_id": session_id, **memory.to_dict()}, f, separators=(",", ":"))
+            os.replace(temporary, path)
+            memory.dirty = False
+        except OSError as e:
+            logger.warning("Failed to save the memory of session %s: %s", session_id, e)
+
+    def loaded(self) -> Dict[str, SessionMemory]:
+        """Indexes of the sessions currently in memory."""
+        with self._lock:
+            return dict(self._sessions)
+
+    def evict(self, session_id: str) -> bool:
+        """Save the session's index and drop it from memory; it is loaded again when the session returns.
+
+        Returns:
+            Whether the index was in memory
+        """
+        self.save(session_id)
+        with self._lock:
+            return self._sessions.pop(session_id, None) is not None
+
+    def recall(self, session_id: str, window: Sequence[BaseMessage]) -> List[Snippet]:
+        """Earlier snippets relevant to the latest messages and not already among them."""
+        shown = {snippet.key for message in window for snippet in message_snippets(message)}
+        latest = [message for message in window if isinstance(message, HumanMessage)][-1:] + list(window[-2:])
+        query = "\n".join(snippet.text for message in latest for snippet in message_snippets(message))
+        return self.get(session_id).search(query, self.top_k, exclude=shown)
+
+    def _path(self, session_id: str) -> str:
+        return os.path.join(self.directory, f"{hashlib.sha256(session_id.encode()).hexdigest()[:32]}.json")
+
+    def _load(self, session_id: str) -> SessionMemory:
+        if not self.directory:
+            return SessionMemory(self.max_snippets)
+        try:
+            with open(self._path(session_id), encoding="utf-8") as f:
+                return SessionMemory.from_dict(json.load(f), self.max_snippets)
+        except FileNotFoundError:
+            return SessionMemory(self.max_snippets)
+        except (OSError, ValueError) as e:
+            logger.warning("Ignoring the unreadable memory of session %s: %s", session_id, e)
+            return SessionMemory(self.max_snippets)
+
+def window_start(messages: Sequence[BaseMessage], window: int) -> int:
+    """Index of the first of the last ``window`` messages, not splitting tool calls from their results."""
+    start = max(len(messages) - window, 0)
+    while start < len(messages) and isinstance(messages[start], ToolMessage):
+        start += 1
+    return start
+
+def format_recalled(snippets: Sequence[Snippet]) -> str:
+    """Recalled snippets as a section of the system prompt."""
+    if not snippets:
+        return ""
+    body = "\n\n".join(f"[{snippet.role}]\n{snippet.text}" for snippet in snippets)
+    return f"\n\nEarlier in this session (recalled by relevance; not the latest state):\n{body}"
@@ -1,6 +1,7 @@
 from typing import Dict, Any, Optional
 from dataclasses import dataclass, field
 from ..llm.base import BaseLLM
+from ..runtime.budget import ExecutionBudget
 
 @dataclass
 class LLMConfig:
@@ -9,6 +10,10 @@ class LLMConfig:
     model_name: str
     temperature: float
     additional_params: Dict[str, Any] = None
+    budget: ExecutionBudget = field(default_factory=ExecutionBudget)
+    # Model for simple steps, e.g. {"llm_type": "anthropic", "model_name": "claude-3-5-haiku-20241022"};
+    # steps are routed between it and the model above when set
+    fast_model: Optional[Dict[str, Any]] = None
     _llm: Optional[BaseLLM] = field(default=None, init=False)
     
     @property
@@ -21,18 +26,49 @@ class LLMConfig:
         """Set the LLM instance."""
         self._llm = value
     
+    def selected(self, selection: Optional[Dict[str, Any]]) -> 'LLMConfig':
+        """Return a copy of this config with the model chosen by a session or request.
+        
+        The selection may set llm_type, model_name, temperature and fast_model;
+        the budget is kept.
+        
+        Raises:
+            ValueError: If the selection is malformed
+        """
+        if not selection:
+            return self
+            
+        unknown = set(selection) - {'llm_type', 'model_name', 'temperature', 'fast_model'}
+        if unknown:
+            raise ValueError(f"Unknown model selection keys: {', '.join(sorted(unknown))}")
+        if selection.get('llm_type', self.llm_type) != self.llm_type and not selection.get('model_name'):
+            raise ValueError("model_name is required when selecting another llm_type")
+        temperature = selection.get('temperature', self.temperature)
+        if isinstance(temperature, bool) or not isinstance(temperature, (int, float)):
+            raise ValueError("temperature must be a number")
+            
+        return LLMConfig(
+            llm_type=selection.get('llm_type') or self.llm_type,
+            model_name=selection.get('model_name') or self.model_name,
+            temperature=float(temperature),
+            budget=self.budget,
+            fast_model=selection.get('fast_model', self.fast_model)
+        )
+        
     @classmethod
     def from_dict(cls, config: Dict[str, Any]) -> 'LLMConfig':
         """Create LLMConfig from a dictionary."""
         additional_params = config.copy()
-        for key in ['llm_type', 'model_name', 'temperature']:
+        for key in ['llm_type', 'model_name', 'temperature', 'budget', 'fast_model']:
             additional_params.pop(key, None)
             
         return cls(
             llm_type=config['llm_type'],
             model_name=config['model_name'],
             temperature=config['temperature'],
-            additional_params=additional_params
+            additional_params=additional_params,
+            budget=ExecutionBudget.from_dict(config.get('budget')),
+            fast_model=config.get('fast_model')
         )
         
     def to_dict(self) -> Dict[str, Any]:
@@ -41,7 +77,10 @@ class LLMConfig:
             'llm_type': self.llm_type,
             'model_name': self.model_name,
             'temperature': self.temperature,
+            'budget': self.budget.to_dict(),
         }
+        if self.fast_model:
+            config['fast_model'] = self.fast_model
         if self.additional_params:
             config.update(self.additional_params)
         return config
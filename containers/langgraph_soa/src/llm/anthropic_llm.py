@@ -1,11 +1,12 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 import os
 import logging
 import json
 from langchain_anthropic import ChatAnthropic
 from langchain_core.messages import BaseMessage, AIMessage, ToolMessage
 
-from .base import BaseLLM
+from .base import BaseLLM, ToolCallCallback
+from src.runtime.context import get_run_context
 
 # Set up logging with consistent format
 logger = logging.getLogger(__name__)
@@ -18,11 +19,6 @@ class AnthropicLLM(BaseLLM):
         self.temperature = temperature
         self.max_tokens = max_tokens
         self.llm = None
-        self.request_id = None
-        
-    def set_request_id(self, request_id: str):
-        """Set the request ID for logging."""
-        self.request_id = request_id
         
     def _format_tools_for_anthropic(self, tools: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """Format tools to match Anthropic's expected schema."""
@@ -46,7 +42,7 @@ class AnthropicLLM(BaseLLM):
             }
             formatted_tools.append(formatted_tool)
             
-        logger.debug(f"Formatted tools for Anthropic: {formatted_tools}")
+        logger.debug("Formatted tools for Anthropic: %s", formatted_tools)
         return formatted_tools
         
     def _format_messages_for_anthropic(self, messages: List[BaseMessage]) -> List[Dict[str, Any]]:
@@ -106,7 +102,7 @@ class AnthropicLLM(BaseLLM):
                 }
             formatted_messages.append(formatted_msg)
             
-        logger.debug(f"Formatted messages for Anthropic: {formatted_messages}")
+        logger.debug("Formatted messages for Anthropic: %s", formatted_messages)
         return formatted_messages
         
     def initialize(self) -> None:
@@ -122,22 +118,20 @@ class AnthropicLLM(BaseLLM):
             anthropic_api_key=api_key,
         )
         
-        log_prefix = f"[Request: {self.request_id}]" if self.request_id else ""
-        logger.info(f"{log_prefix} Initialized Anthropic client with model {self.model_name}")
+        logger.info("Initialized Anthropic client with model %s", self.model_name)
         
-    def invoke(self, messages: List[BaseMessage], tools: List[Dict[str, Any]] = None) -> BaseMessage:
+    def invoke(self, messages: List[BaseMessage], tools: List[Dict[str, Any]] = None, on_tool_call: Optional[ToolCallCallback] = None) -> BaseMessage:
         """Invoke the Anthropic LLM with messages and optional tools."""
         if not self.llm:
             self.initialize()
             
-        log_prefix = f"[Request: {self.request_id}]" if self.request_id else ""
-        logger.info(f"{log_prefix} Making API call to Anthropic with model {self.model_name}")
+        logger.info("Making API call to Anthropic with model %s", self.model_name)
         
         # Format tools if present
         formatted_tools = None
         if tools:
             formatted_tools = self._format_tools_for_anthropic(tools)
-            logger.debug(f"{log_prefix} Using tools: {formatted_tools}")
+            logger.debug("Using tools: %s", formatted_tools)
             
         # Pre-process messages to handle system messages
         processed_messages = []
@@ -156,10 +150,18 @@ class AnthropicLLM(BaseLLM):
             processed_messages.insert(0, system_message)
             
         # Format messages for Anthropic
-        formatted_messages = self._format_messages_for_anthropic(processed_messages)
-        logger.debug(f"{log_prefix} Formatted messages: {formatted_messages}")
+        with get_run_context().tracer.span("anthropic.format_messages", category="llm", messages=len(processed_messages)):
+            formatted_messages = self._format_messages_for_anthropic(processed_messages)
+        logger.debug("Formatted messages: %s", formatted_messages)
             
         try:
+            if on_tool_call:
+                # Stream so each tool_use block is dispatched as soon as its input is complete
+                return self._collect_stream(
+                    self.llm.stream(formatted_messages, tools=formatted_tools),
+                    on_tool_call
+                )
+                
             response = self.llm.invoke(
                 formatted_messages,
                 tools=formatted_tools
@@ -187,13 +189,16 @@ class AnthropicLLM(BaseLLM):
                 # Create AIMessage with proper content
                 response = AIMessage(
                     content=text_content,
-                    additional_kwargs={"tool_calls": tool_calls} if tool_calls else {}
+                    additional_kwargs={"tool_calls": tool_calls} if tool_calls else {},
+                    # Keep token usage for budget accounting
+                    usage_metadata=response.usage_metadata,
+                    response_metadata=response.response_metadata
                 )
             
             return response
             
         except Exception as e:
-            logger.error(f"{log_prefix} Error in Anthropic API call: {str(e)}")
+            logger.error("Error in Anthropic API call: %s", e)
             raise
         
     def get_model_name(self) -> str:
@@ -1,6 +1,14 @@
 from abc import ABC, abstractmethod
-from typing import List, Dict, Any
-from langchain_core.messages import BaseMessage
+from typing import List, Dict, Any, Callable, Iterable, Optional
+import json
+import time
+from langchain_core.messages import BaseMessage, AIMessage, BaseMessageChunk
+from langchain_core.messages.ai import add_usage
+from src.runtime.context import get_run_context
+
+# Called with a tool call dict ({"id", "name", "type", "function": {"name", "arguments"}})
+# as soon as the call's arguments have been streamed completely
+ToolCallCallback = Callable[[Dict[str, Any]], None]
 
 class BaseLLM(ABC):
     """Base class for LLM implementations."""
@@ -11,12 +19,15 @@ class BaseLLM(ABC):
         pass
     
     @abstractmethod
-    def invoke(self, messages: List[BaseMessage], tools: List[Dict[str, Any]] = None) -> BaseMessage:
+    def invoke(self, messages: List[BaseMessage], tools: List[Dict[str, Any]] = None, on_tool_call: Optional[ToolCallCallback] = None) -> BaseMessage:
         """Invoke the LLM with messages and optional tools.
         
         Args:
             messages: List of messages in the conversation
             tools: Optional list of tool configurations
+            on_tool_call: Optional callback; when given the response is streamed
+                and each tool call is reported as soon as it is complete, before
+                the rest of the message has been generated
             
         Returns:
             Response message from the LLM
@@ -27,3 +38,164 @@ class BaseLLM(ABC):
     def get_model_name(self) -> str:
         """Get the name of the model being used."""
         pass
+    
+    def _collect_stream(self, chunks: Iterable[BaseMessageChunk], on_tool_call: Optional[ToolCallCallback] = None) -> AIMessage:
+        """Assemble a streamed response into a single AIMessage.
+        
+        Tool calls are reported through ``on_tool_call`` in the order of the
+        response, each as soon as its JSON arguments parse and the calls before
+        it have been reported; a JSON object prefix only parses once the object
+        is complete.
+        
+        Raises:
+            RunCancelled: If the run is cancelled mid-stream; closing the stream
+                aborts the provider request so no further tokens are billed
+            DeadlineExceeded: If the run runs out of time mid-stream
+        """
+        cancellation = get_run_context().cancellation
+        budget = get_run_context().budget
+        started_at = time.perf_counter()
+        time_to_first_token = None
+        text = ""
+        usage = None
+        response_metadata: Dict[str, Any] = {}
+        calls: Dict[int, Dict[str, Any]] = {}
+        
+        for chunk in chunks:
+            cancellation.raise_if_cancelled()
+            budget.raise_if_past_deadline()
+            if time_to_first_token is None:
+                time_to_first_token = time.perf_counter() - started_at
+                get_run_context().tracer.instant("first_token", category="llm")
+            text += _chunk_text(chunk)
+            if getattr(chunk, "usage_metadata", None):
+                usage = add_usage(usage, chunk.usage_metadata)
+            response_metadata.update(chunk.response_metadata or {})
+            
+            for tool_call_chunk in getattr(chunk, "tool_call_chunks", None) or []:
+                index = tool_call_chunk.get("index") or 0
+                call = calls.setdefault(index, {"id": None, "name": None, "arguments": "", "complete": False, "dispatched": False, "scan": _JsonScan()})
+                call["id"] = call["id"] or tool_call_chunk.get("id")
+                call["name"] = call["name"] or tool_call_chunk.get("name")
+                args = tool_call_chunk.get("args") or ""
+                call["arguments"] += args
+                # Parsing only once the object may have closed keeps long arguments linear
+                closed = call["scan"].feed(args)
+                if on_tool_call and not call["complete"] and call["id"] and call["name"] and closed and _parses(call["arguments"]):
+                    call["complete"] = True
+                    # Calls interleaved by the provider are still reported in order
+                    for pending in (calls[i] for i in sorted(calls)):
+                        if not pending["complete"]:
+                            break
+                        if not pending["dispatched"]:
+                            pending["dispatched"] = True
+                            on_tool_call(_tool_call_dict(pending))
+        
+        raw_tool_calls = []
+        tool_calls = []
+        invalid_tool_calls = []
+        for index in sorted(calls):
+            call = calls[index]
+            call["arguments"] = call["arguments"] or "{}"
+            raw_tool_calls.append(_tool_call_dict(call))
+            if on_tool_call and not call["dispatched"]:
+                call["dispatched"] = True
+                on_tool_call(raw_tool_calls[-1])
+            try:
+                tool_calls.append({"id": call["id"], "name": call["name"], "args": json.loads(call["arguments"])})
+            except json.JSONDecodeError as e:
+                invalid_tool_calls.append({"id": call["id"], "name": call["name"], "args": call["arguments"], "error": str(e)})
+        
+        if time_to_first_token is not None:
+            response_metadata["time_to_first_token"] = time_to_first_token
+            
+        return AIMessage(
+            content=text,
+            additional_kwargs={"tool_calls": raw_tool_calls} if raw_tool_calls else {},
+            tool_calls=tool_calls,
+            invalid_tool_calls=invalid_tool_calls,
+            usage_metadata=usage,
+            response_metadata=response_metadata
+        )
+
+def canonical_request(model_name: str, messages: List[BaseMessage], tools: Optional[List[Dict[str, Any]]], **params: Any) -> Dict[str, Any]:
+    """Canonical form of an LLM request, for hashing.
+    
+    Message ids and provider metadata differ between otherwise identical
+    requests, so only roles, contents and tool calls are part of it.
+    """
+    return {
+        "model": model_name,
+        "params": params,
+        "messages": [
+            {
+                "type": msg.type,
+                "content": msg.content,
+                "tool_calls": msg.additional_kwargs.get("tool_calls"),
+                "tool_call_id": getattr(msg, "tool_call_id", None),
+            }
+            for msg in messages
+        ],
+        "tools": tools,
+    }
+
+def _chunk_text(chunk: BaseMessageChunk) -> str:
+    """Extract the text of a chunk whose content is a string or a list of blocks."""
+    if isinstance(chunk.content, str):
+        return chunk.content
+    return "".join(
+        block.get("text", "") for block in chunk.content
+        if isinstance(block, dict) and block.get("type") == "text"
+    )
+
+class _JsonScan:
+    """Tracks the nesting depth of streamed JSON outside of strings."""
+
+    def __init__(self):
+        self.depth = 0
+        self.opened = False
+        self.in_string = False
+        self.escaped = False
+
+    def feed(self, text: str) -> bool:
+        """Scan more text; True if the top-level object closed within it."""
+        closed = False
+        for char in text:
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif char == "\\":
+                    self.escaped = True
+                elif char == '"':
+                    self.in_string = False
+            elif char == '"':
+                self.in_string = True
+            elif char in "{[":
+                self.depth += 1
+                self.opened = True
+            elif char in "}]":
+                self.depth -= 1
+                closed = closed or (self.opened and self.depth == 0)
+        return closed
+
+def _parses(arguments: str) -> bool:
+    """Check whether streamed tool arguments form a complete JSON document."""
+    if not arguments:
+        return False
+    try:
+        json.loads(arguments)
+        return True
+    except json.JSONDecodeError:
+        return False
+
+def _tool_call_dict(call: Dict[str, Any]) -> Dict[str, Any]:
+    """Build a tool call in the format stored in AIMessage.additional_kwargs."""
+    return {
+        "id": call["id"],
+        "name": call["name"],
+        "type": "function",
+        "function": {
+            "name": call["name"],
+            "arguments": call["arguments"] or "{}"
+        }
+    }
@@ -0,0 +1,210 @@
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+import json
+import logging
+import os
+import threading
+import time
+
+from langchain_core.messages import AIMessage, BaseMessage, message_to_dict, messages_from_dict
+
+from .base import BaseLLM, ToolCallCallback, canonical_request
+from src.observability import metrics
+from src.runtime.cassette import request_key
+from src.runtime.context import get_run_context
+
+logger = logging.getLogger(__name__)
+
+class ResponseCache:
+    """Content-addressed cache of LLM responses with a memory and a disk tier.
+
+    Entries expire ``ttl_seconds`` after they were stored. The memory tier
+    holds the ``max_entries`` most recently used responses; the disk tier,
+    enabled by ``directory``, holds up to ``max_disk_bytes`` and evicts the
+    least recently used files first.
+    """
+
+    def __init__(self, directory: Optional[str] = None, ttl_seconds: float = 86400.0, max_entries: int = 1000, max_disk_bytes: int = 512 * 2**20):
+        self.directory = directory
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_disk_bytes = max_disk_bytes
+        # Key -> (time stored, response)
+        self._memory: 'OrderedDict[str, Tuple[float, AIMessage]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._disk_bytes = 0
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            self._disk_bytes = sum(os.path.getsize(path) for path, _ in self._disk_files())
+
+    @classmethod
+    def from_env(cls) -> Optional['ResponseCache']:
+        """Create the cache configured by LLM_CACHE_* environment variables, or None if disabled."""
+        if os.getenv("LLM_CACHE_ENABLED", "false").lower() != "true":
+            return None
+        return cls(
+            directory=os.getenv("LLM_CACHE_DIR") or None,
+            ttl_seconds=float(os.getenv("LLM_CACHE_TTL_SECONDS", "86400")),
+            max_entries=int(os.getenv("LLM_CACHE_MAX_ENTRIES", "1000")),
+            max_disk_bytes=int(float(os.getenv("LLM_CACHE_MAX_DISK_MB", "512")) * 2**20),
+        )
+
+    def get(self, key: str) -> Tuple[Optional[AIMessage], Optional[str]]:
+        """Look up a response.
+
+        Returns:
+            The cached response and the tier it was found in ("memory" or
+            "disk"), or (None, None)
+        """
+        oldest = time.time() - self.ttl_seconds
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if entry[0] > oldest:
+                    self._memory.move_to_end(key)
+                    return entry[1], "memory"
+                del self._memory[key]
+
+        response, stored_at = self._read_disk(key, oldest)
+        if response is None:
+            return None, None
+        with self._lock:
+            self._remember(key, stored_at, response)
+        return response, "disk"
+
+    def put(self, key: str, response: AIMessage) -> None:
+        """Store a response in both tiers."""
+        stored_at = time.time()
+        with self._lock:
+            self._remember(key, stored_at, response)
+        if self.directory:
+            self._write_disk(key, stored_at, response)
+
+    def _remember(self, key: str, stored_at: float, response: AIMessage) -> None:
+        self._memory[key] = (stored_at, response)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def _read_disk(self, key: str, oldest: float) -> Tuple[Optional[AIMessage], float]:
+        if not self.directory:
+            return None, 0.0
+        path = self._path(key)
+        try:
+            with open(path, encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None, 0.0
+        if entry["stored_at"] <= oldest:
+            self._remove_disk(path)
+            return None, 0.0
+        # The modification time orders files for LRU eviction
+        os.utime(path)
+        return messages_from_dict([entry["response"]])[0], entry["stored_at"]
+
+    def _write_disk(self, key: str, stored_at: float, response: AIMessage) -> None:
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        payload = json.dumps({"stored_at": stored_at, "response": message_to_dict(response)}, separators=(",", ":"), default=str)
+        temporary = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(temporary, "w", encoding="utf-8") as f:
+                f.write(payload)
+            previous = os.path.getsize(path) if os.path.exists(path) else 0
+            os.replace(temporary, path)
+        except OSError as e:
+            logger.warning("Failed to write LLM cache entry %s: %s", key, e)
+            return
+        with self._lock:
+            self._disk_bytes += len(payload.encode("utf-8")) - previous
+            over_budget = self._disk_bytes > self.max_disk_bytes
+        if over_budget:
+            self._evict_disk()
+
+    def _evict_disk(self) -> None:
+        """Delete the least recently used files, down to 90% of the size limit."""
+        files = sorted(self._disk_files(), key=lambda item: item[1])
+        total = sum(os.path.getsize(path) for path, _ in files)
+        for path, _ in files:
+            if total <= self.max_disk_bytes * 0.9:
+                break
+            total -= os.path.getsize(path)
+            self._remove_disk(path)
+        with self._lock:
+            self._disk_bytes = total
+
+    def _remove_disk(self, path: str) -> None:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def _disk_files(self) -> List[Tuple[str, float]]:
+        files = []
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                if name.endswith(".json"):
+                    path = os.path.join(root, name)
+                    files.append((path, os.path.getmtime(path)))
+        return files
+
+class CachingLLM(BaseLLM):
+    """Serves repeated deterministic requests from a ResponseCache.
+
+    Only requests at temperature 0 are cached, since other responses are
+    expected to vary. Runs opt out with ``RunContext.llm_cache``. A hit
+    reports no token usage, as nothing was billed, and is marked with
+    ``response_metadata["cache"]``.
+    """
+
+    def __init__(self, llm: BaseLLM, cache: ResponseCache, provider: str, temperature: float):
+        self.llm = llm
+        self.cache = cache
+        self.provider = provider
+        self.temperature = temperature
+
+    def initialize(self) -> None:
+        pass
+
+    def invoke(self, messages: List[BaseMessage], tools: List[Dict[str, Any]] = None, on_tool_call: Optional[ToolCallCallback] = None) -> BaseMessage:
+        context = get_run_context()
+        if self.temperature != 0 or not context.llm_cache:
+            metrics.record_llm_cache("bypass")
+            return self.llm.invoke(messages, tools=tools, on_tool_call=on_tool_call)
+
+        key = request_key("llm", canonical_request(self.get_model_name(), messages, tools, provider=self.provider, temperature=self.temperature))
+        cached, tier = self.cache.get(key)
+        if cached is not None:
+            metrics.record_llm_cache(f"{tier}_hit")
+            context.tracer.instant("llm_cache_hit", category="llm", tier=tier)
+            response_metadata = {k: v for k, v in cached.response_metadata.items() if k != "time_to_first_token"}
+            response = cached.model_copy(update={"usage_metadata": None, "response_metadata": {**response_metadata, "cache": tier}}, deep=True)
+            if on_tool_call:
+                for tool_call in response.additional_kwargs.get("tool_calls", []):
+                    on_tool_call(tool_call)
+            return response
+
+        metrics.record_llm_cache("miss")
+        response = self.llm.invoke(messages, tools=tools, on_tool_call=on_tool_call)
+        if isinstance(response, AIMessage) and not response.invalid_tool_calls and (response.content or response.additional_kwargs.get("tool_calls")):
+            self.cache.put(key, response)
+        return response
+
+    def get_model_name(self) -> str:
+        return self.llm.get_model_name()
+
+_cache: Optional[ResponseCache] = None
+_cache_loaded = False
+_cache_lock = threading.Lock()
+
+def get_response_cache() -> Optional[ResponseCache]:
+    """Get the process-wide response cache configured in the environment, if any."""
+    global _cache, _cache_loaded
+    with _cache_lock:
+        if not _cache_loaded:
+            _cache = ResponseCache.from_env()
+            _cache_loaded = True
+        return _cache
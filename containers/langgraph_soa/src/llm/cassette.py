@@ -0,0 +1,66 @@
+from typing import Any, Dict, List, Optional
+import time
+
+from langchain_core.messages import BaseMessage, message_to_dict, messages_from_dict
+
+from .base import BaseLLM, ToolCallCallback, canonical_request
+from src.runtime.cassette import Cassette
+from src.runtime.context import get_run_context
+
+class RecordingLLM(BaseLLM):
+    """Records the requests and responses of another LLM on a cassette."""
+
+    def __init__(self, llm: BaseLLM, cassette: Cassette):
+        self.llm = llm
+        self.cassette = cassette
+
+    def initialize(self) -> None:
+        pass
+
+    def invoke(self, messages: List[BaseMessage], tools: List[Dict[str, Any]] = None, on_tool_call: Optional[ToolCallCallback] = None) -> BaseMessage:
+        started_at = time.perf_counter()
+        response = self.llm.invoke(messages, tools=tools, on_tool_call=on_tool_call)
+        self.cassette.record(
+            "llm",
+            canonical_request(self.get_model_name(), messages, tools),
+            message_to_dict(response),
+            time.perf_counter() - started_at,
+            summary=f"{self.get_model_name()} ({len(messages)} messages)",
+            first_token=response.response_metadata.get("time_to_first_token"),
+        )
+        return response
+
+    def get_model_name(self) -> str:
+        return self.llm.get_model_name()
+
+class ReplayLLM(BaseLLM):
+    """Serves recorded responses instead of calling a provider.
+
+    Tool calls are reported to ``on_tool_call`` at the recorded time of the
+    first token, so speculative tool execution behaves as in the recording.
+    """
+
+    def __init__(self, model_name: str, cassette: Cassette):
+        self.model_name = model_name
+        self.cassette = cassette
+
+    def initialize(self) -> None:
+        pass
+
+    def invoke(self, messages: List[BaseMessage], tools: List[Dict[str, Any]] = None, on_tool_call: Optional[ToolCallCallback] = None) -> BaseMessage:
+        cancellation = get_run_context().cancellation
+        cancellation.raise_if_cancelled()
+        entry = self.cassette.play("llm", canonical_request(self.model_name, messages, tools))
+        response = messages_from_dict([entry["response"]])[0]
+
+        first_token = entry.get("first_token") or 0.0
+        self.cassette.wait(first_token)
+        if on_tool_call:
+            for tool_call in response.additional_kwargs.get("tool_calls", []):
+                on_tool_call(tool_call)
+        self.cassette.wait(entry["duration"] - first_token)
+        cancellation.raise_if_cancelled()
+        return response
+
+    def get_model_name(self) -> str:
+        return self.model_name
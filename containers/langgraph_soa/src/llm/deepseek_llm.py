@@ -4,7 +4,7 @@ import logging
 from langchain_openai import ChatOpenAI
 from langchain_core.messages import BaseMessage
 
-from .base import BaseLLM
+from .base import BaseLLM, ToolCallCallback
 
 logger = logging.getLogger(__name__)
 
@@ -49,9 +49,9 @@ class DeepSeekLLM(BaseLLM):
             openai_api_base="https://api.deepseek.com/v1",
         )
         
-        logger.info(f"Initialized DeepSeek client with model {self.model_name}")
+        logger.info("Initialized DeepSeek client with model %s", self.model_name)
         
-    def invoke(self, messages: List[BaseMessage], tools: List[Dict[str, Any]] = None) -> BaseMessage:
+    def invoke(self, messages: List[BaseMessage], tools: List[Dict[str, Any]] = None, on_tool_call: Optional[ToolCallCallback] = None) -> BaseMessage:
         """Invoke the DeepSeek LLM with messages and optional tools."""
         if not self.llm:
             self.initialize()
@@ -61,14 +61,21 @@ class DeepSeekLLM(BaseLLM):
             tools = self._format_tools_for_deepseek(tools)
             
         try:
-            logger.info(f"Making API call to DeepSeek with model {self.model_name}")
+            logger.info("Making API call to DeepSeek with model %s", self.model_name)
+            if on_tool_call:
+                # Stream so each tool call is dispatched as soon as its arguments are complete
+                return self._collect_stream(
+                    self.llm.stream(messages, tools=tools, stream_usage=True),
+                    on_tool_call
+                )
+                
             response = self.llm.invoke(
                 messages,
                 tools=tools
             )
             return response
         except Exception as e:
-            logger.error(f"Error in DeepSeek API call: {str(e)}")
+            logger.error("Error in DeepSeek API call: %s", e)
             raise
         
     def get_model_name(self) -> str:
@@ -1,10 +1,15 @@
 from typing import Dict, Type, Optional
+import os
 
 from .base import BaseLLM
 from .openai_llm import OpenAILLM
 from .anthropic_llm import AnthropicLLM
 from .deepseek_llm import DeepSeekLLM
+from .cache import CachingLLM, get_response_cache
+from .cassette import RecordingLLM, ReplayLLM
+from .router import RoutedLLM
 from ..config.llm_config import LLMConfig
+from ..runtime.cassette import get_cassette
 
 class LLMFactory:
     """Factory for creating LLM instances."""
@@ -22,25 +27,68 @@ class LLMFactory:
         
     @classmethod
     def create_llm(cls, config: LLMConfig) -> BaseLLM:
-        """Create an LLM instance based on configuration."""
-        llm_class = cls._llm_registry.get(config.llm_type)
-        if not llm_class:
-            raise ValueError(f"Unknown LLM type: {config.llm_type}")
-            
-        llm = llm_class(
-            model_name=config.model_name,
-            temperature=config.temperature
-        )
+        """Create an LLM instance based on configuration.
         
-        # Initialize the LLM
-        llm.initialize()
+        With a fast model, configured in the config or as LLM_FAST_MODEL
+        ("llm_type:model_name"), steps are routed between the two models.
+        """
+        llm = cls._create(config.llm_type, config.model_name, config.temperature)
+        
+        fast_model = config.fast_model or _fast_model_from_env()
+        if fast_model:
+            fast_type = fast_model.get("llm_type", config.llm_type)
+            fast = cls._create(
+                fast_type,
+                fast_model["model_name"],
+                fast_model.get("temperature", config.temperature)
+            )
+            llm = RoutedLLM(llm, fast, flagship_provider=config.llm_type, fast_provider=fast_type)
         
         # Store the LLM instance in the config
         config.llm = llm
         
         return llm
+        
+    @classmethod
+    def _create(cls, llm_type: str, model_name: str, temperature: float) -> BaseLLM:
+        """Create one model, recorded or replayed and cached as configured."""
+        llm_class = cls._llm_registry.get(llm_type)
+        if not llm_class:
+            raise ValueError(f"Unknown LLM type: {llm_type}")
+            
+        cassette = get_cassette()
+        if cassette is not None and cassette.replaying:
+            # Serve recorded responses; no provider client or API key is needed
+            llm = ReplayLLM(model_name, cassette)
+        else:
+            llm = llm_class(
+                model_name=model_name,
+                temperature=temperature
+            )
+            
+            # Initialize the LLM
+            llm.initialize()
+            
+            if cassette is not None:
+                llm = RecordingLLM(llm, cassette)
+        
+        cache = get_response_cache()
+        if cache is not None:
+            llm = CachingLLM(llm, cache, llm_type, temperature)
+        
+        return llm
 
     @classmethod
     def get_available_llms(cls) -> Dict[str, Type[BaseLLM]]:
         """Get all registered LLM types."""
         return cls._llm_registry.copy()
+
+def _fast_model_from_env() -> Optional[Dict[str, str]]:
+    """Fast model configured as LLM_FAST_MODEL="llm_type:model_name", if any."""
+    value = os.getenv("LLM_FAST_MODEL")
+    if not value:
+        return None
+    llm_type, _, model_name = value.partition(":")
+    if not model_name:
+        raise ValueError(f"LLM_FAST_MODEL must be llm_type:model_name, got {value!r}")
+    return {"llm_type": llm_type, "model_name": model_name}
@@ -1,10 +1,10 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 import os
 import logging
 from langchain_openai import ChatOpenAI
 from langchain_core.messages import BaseMessage
 
-from .base import BaseLLM
+from .base import BaseLLM, ToolCallCallback
 
 logger = logging.getLogger(__name__)
 
@@ -29,7 +29,7 @@ class OpenAILLM(BaseLLM):
             }
             formatted_tools.append(formatted_tool)
             
-        logger.debug(f"Formatted tools for OpenAI: {formatted_tools}")
+        logger.debug("Formatted tools for OpenAI: %s", formatted_tools)
         return formatted_tools
         
     def initialize(self) -> None:
@@ -44,7 +44,7 @@ class OpenAILLM(BaseLLM):
             openai_api_key=api_key,
         )
         
-    def invoke(self, messages: List[BaseMessage], tools: List[Dict[str, Any]] = None) -> BaseMessage:
+    def invoke(self, messages: List[BaseMessage], tools: List[Dict[str, Any]] = None, on_tool_call: Optional[ToolCallCallback] = None) -> BaseMessage:
         """Invoke the OpenAI LLM with messages and optional tools."""
         if not self.llm:
             self.initialize()
@@ -53,16 +53,23 @@ class OpenAILLM(BaseLLM):
         formatted_tools = None
         if tools:
             formatted_tools = self._format_tools_for_openai(tools)
-            logger.debug(f"Using tools: {formatted_tools}")
+            logger.debug("Using tools: %s", formatted_tools)
             
         try:
+            if on_tool_call:
+                # Stream so each tool call is dispatched as soon as its arguments are complete
+                return self._collect_stream(
+                    self.llm.stream(messages, tools=formatted_tools, stream_usage=True),
+                    on_tool_call
+                )
+                
             response = self.llm.invoke(
                 messages,
                 tools=formatted_tools
             )
             return response
         except Exception as e:
-            logger.error(f"Error in OpenAI API call: {str(e)}")
+            logger.error("Error in OpenAI API call: %s", e)
             raise
         
     def get_model_name(self) -> str:
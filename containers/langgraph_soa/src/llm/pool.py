@@ -0,0 +1,67 @@
+from collections import OrderedDict
+from typing import Optional, Tuple
+import json
+import logging
+import os
+import threading
+
+from .base import BaseLLM
+from .factory import LLMFactory
+from ..config.llm_config import LLMConfig
+
+logger = logging.getLogger(__name__)
+
+class LLMPool:
+    """Shares LLM clients between runs that use the same model.
+
+    Runs may choose their own provider, model and temperature; the client
+    for each combination is created once and reused, keeping the
+    ``max_entries`` most recently used.
+    """
+
+    def __init__(self, max_entries: int = 16):
+        self.max_entries = max_entries
+        self._llms: 'OrderedDict[Tuple, BaseLLM]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> 'LLMPool':
+        """Create a pool sized by LLM_POOL_SIZE."""
+        return cls(max_entries=int(os.getenv("LLM_POOL_SIZE", "16")))
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._llms)
+
+    def get(self, config: LLMConfig) -> BaseLLM:
+        """Get the client for a configuration, creating it on first use.
+
+        Raises:
+            ValueError: If the provider is unknown
+        """
+        key = (config.llm_type, config.model_name, config.temperature, json.dumps(config.fast_model, sort_keys=True))
+        with self._lock:
+            llm = self._llms.get(key)
+            if llm is not None:
+                self._llms.move_to_end(key)
+                return llm
+        # Created outside the lock; a concurrent creation of the same client just loses the race
+        llm = LLMFactory.create_llm(config)
+        with self._lock:
+            llm = self._llms.setdefault(key, llm)
+            self._llms.move_to_end(key)
+            while len(self._llms) > self.max_entries:
+                evicted, _ = self._llms.popitem(last=False)
+                logger.info("Dropping pooled LLM client %s:%s", evicted[0], evicted[1])
+        return llm
+
+_pool: Optional[LLMPool] = None
+_pool_lock = threading.Lock()
+
+def get_llm_pool() -> LLMPool:
+    """Get the process-wide LLM pool."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = LLMPool.from_env()
+        return _pool
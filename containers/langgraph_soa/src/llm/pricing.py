@@ -0,0 +1,28 @@
+from typing import Dict, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+# USD per million (input, output) tokens for the models offered by /api/llm/available
+MODEL_PRICING: Dict[str, Tuple[float, float]] = {
+    'gpt-3.5-turbo': (0.50, 1.50),
+    'gpt-4o': (2.50, 10.00),
+    'gpt-4o-mini': (0.15, 0.60),
+    'gpt-4-turbo': (10.00, 30.00),
+    'claude-3-7-sonnet-20250219': (3.00, 15.00),
+    'claude-3-5-sonnet-20241022': (3.00, 15.00),
+    'claude-3-5-haiku-20241022': (0.80, 4.00),
+    'claude-3-opus-20240229': (15.00, 75.00),
+    'deepseek-chat': (0.27, 1.10),
+    'deepseek-coder': (0.27, 1.10),
+    'deepseek-reasoner': (0.55, 2.19),
+}
+
+def estimate_cost(model_name: str, input_tokens: int, output_tokens: int) -> float:
+    """Estimate the USD cost of a call. Unknown models are treated as free."""
+    pricing = MODEL_PRICING.get(model_name)
+    if pricing is None:
+        logger.debug("No pricing known for model %s", model_name)
+        return 0.0
+    input_price, output_price = pricing
+    return (input_tokens * input_price + output_tokens * output_price) / 1_000_000
@@ -0,0 +1,148 @@
+from contextlib import nullcontext
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+import json
+import logging
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, ToolMessage
+
+from .base import BaseLLM, ToolCallCallback
+from src.observability import metrics
+from src.runtime.context import get_run_context
+
+logger = logging.getLogger(__name__)
+
+class Tier:
+    """Model tiers a step can be routed to."""
+    FAST = "fast"
+    FLAGSHIP = "flagship"
+
+# How the tools start the results of failed calls, verbose and compact
+_FAILURE_PREFIXES = ("Error ", "Error:", "<tool_result>Error", "Command exited with code ", "failed: ")
+
+def tool_failed(message: ToolMessage) -> bool:
+    """Whether a tool call failed, judged by the status of its result rather than its wording.
+
+    A file that merely contains "Error" is not a failure; an error flagged by
+    the tool node, an error or non-zero exit code in a JSON result, or the
+    tools' error and exit code lines are.
+    """
+    if message.additional_kwargs.get("is_error"):
+        return True
+    content = str(message.content)
+    if content.startswith(_FAILURE_PREFIXES):
+        return True
+    try:
+        result = json.loads(content)
+    except ValueError:
+        return False
+    return isinstance(result, dict) and (bool(result.get("error")) or result.get("code") not in (None, 0) or result.get("status") == "failed")
+
+def classify_step(messages: Sequence[BaseMessage]) -> Tuple[str, str]:
+    """Decide which tier the next step needs, from the messages so far.
+
+    The first step of a turn plans the work and goes to the flagship model, as
+    does a step after a failed tool call. A step that follows up on
+    successful tool results (reading the next file, running the next command,
+    summarizing) goes to the fast model.
+
+    Returns:
+        The tier and the reason for it
+    """
+    prompt_index = max((i for i, msg in enumerate(messages) if isinstance(msg, HumanMessage)), default=-1)
+    if not any(isinstance(msg, AIMessage) for msg in messages[prompt_index + 1:]):
+        return Tier.FLAGSHIP, "plan"
+
+    results = []
+    for message in reversed(messages):
+        if not isinstance(message, ToolMessage):
+            break
+        results.append(message)
+    if not results:
+        return Tier.FLAGSHIP, "reasoning"
+    if any(tool_failed(message) for message in results):
+        return Tier.FLAGSHIP, "tool_error"
+    return Tier.FAST, "follow_up"
+
+def validate_fast_response(response: BaseMessage, tools: Optional[List[Dict[str, Any]]]) -> Optional[str]:
+    """Check that a fast-model response can be used as is.
+
+    Returns:
+        Why the step must be escalated to the flagship model, or None
+    """
+    if not isinstance(response, AIMessage) or getattr(response, "invalid_tool_calls", None):
+        return "invalid_tool_call"
+    tool_calls = response.additional_kwargs.get("tool_calls", [])
+    if not tool_calls and not str(response.content).strip():
+        return "empty"
+    names = {tool["function"]["name"] for tool in tools or []}
+    for tool_call in tool_calls:
+        function = tool_call.get("function", {})
+        if function.get("name") not in names:
+            return "unknown_tool"
+        try:
+            args = json.loads(function.get("arguments") or "{}")
+        except json.JSONDecodeError:
+            return "invalid_arguments"
+        # Writing code is the flagship model's job
+        if function.get("name") == "file_system" and args.get("content"):
+            return "code_generation"
+    return None
+
+class RoutedLLM(BaseLLM):
+    """Routes each step to a fast model or the flagship model.
+
+    Steps that only follow up on successful tool results go to the fast
+    model; planning, error recovery and code generation go to the flagship.
+    A fast response that fails validation is discarded and the step is
+    escalated. ``response_metadata["routed_model"]`` and
+    ``["routed_provider"]`` name the model that produced the response and its
+    provider. Each call holds the ``llm:<provider>`` slot of the model it goes
+    to, so the caller must not take a provider slot of its own.
+    """
+
+    def __init__(self, flagship: BaseLLM, fast: BaseLLM, flagship_provider: Optional[str] = None, fast_provider: Optional[str] = None):
+        self.flagship = flagship
+        self.fast = fast
+        self.flagship_provider = flagship_provider
+        self.fast_provider = fast_provider or flagship_provider
+
+    def initialize(self) -> None:
+        pass
+
+    def invoke(self, messages: List[BaseMessage], tools: List[Dict[str, Any]] = None, on_tool_call: Optional[ToolCallCallback] = None) -> BaseMessage:
+        context = get_run_context()
+        tier, reason = classify_step(messages) if tools else (Tier.FLAGSHIP, "no_tools")
+        if tier == Tier.FAST:
+            response = self._invoke(self.fast, self.fast_provider, messages, tools, on_tool_call)
+            problem = validate_fast_response(response, tools)
+            if problem is None:
+                return self._routed(response, self.fast, self.fast_provider, Tier.FAST, reason)
+
+            logger.debug("Escalating step from %s: %s", self.fast.get_model_name(), problem)
+            # Reads started for the discarded response are not needed
+            for tool_call in response.additional_kwargs.get("tool_calls", []):
+                future = context.speculative_tool_results.pop(tool_call.get("id"), None)
+                if future is not None:
+                    future.cancel()
+            # The discarded response was billed all the same
+            context.budget.record_llm_call(self.fast.get_model_name(), getattr(response, "usage_metadata", None), step=False)
+            tier, reason = "escalated", problem
+
+        response = self._invoke(self.flagship, self.flagship_provider, messages, tools, on_tool_call)
+        return self._routed(response, self.flagship, self.flagship_provider, tier, reason)
+
+    def get_model_name(self) -> str:
+        return self.flagship.get_model_name()
+
+    def _invoke(self, llm: BaseLLM, provider: Optional[str], messages: List[BaseMessage], tools: Optional[List[Dict[str, Any]]], on_tool_call: Optional[ToolCallCallback]) -> BaseMessage:
+        """Call one of the models within its provider's slot."""
+        with get_run_context().slots.acquire(f"llm:{provider}") if provider else nullcontext():
+            return llm.invoke(messages, tools=tools, on_tool_call=on_tool_call)
+
+    def _routed(self, response: BaseMessage, llm: BaseLLM, provider: Optional[str], tier: str, reason: str) -> BaseMessage:
+        metrics.record_llm_route(tier, reason)
+        get_run_context().tracer.instant("llm_route", category="llm", tier=tier, reason=reason, model=llm.get_model_name(), provider=provider)
+        response.response_metadata["routed_model"] = llm.get_model_name()
+        if provider:
+            response.response_metadata["routed_provider"] = provider
+        return response
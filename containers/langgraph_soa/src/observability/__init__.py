@@ -0,0 +1,3 @@
+"""
+Observability for the agent service (metrics, tracing, profiling, logging)
+"""
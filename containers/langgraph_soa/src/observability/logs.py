@@ -0,0 +1,146 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, Iterator, Optional
+import atexit
+import json
+import logging
+import os
+import queue
+import re
+import sys
+
+_correlation_id: ContextVar[Optional[str]] = ContextVar("rose_correlation_id", default=None)
+
+# Values that must never reach the logs, whatever the level
+SECRET_PATTERNS = [
+    re.compile(r"sk-(?:ant-)?[A-Za-z0-9_\-]{16,}"),
+    re.compile(r"(?i)(bearer\s+)[A-Za-z0-9._\-]{8,}"),
+    re.compile(r"(?i)((?:api[_-]?key|authorization|x-api-key|x-rose-admin-token|password)['\"]?\s*[:=]\s*['\"]?)[^\s'\",}]+"),
+]
+
+# Attributes of every LogRecord; anything else was passed through ``extra``
+_RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "correlation_id"}
+
+_listener: Optional[QueueListener] = None
+
+def get_correlation_id() -> Optional[str]:
+    """Get the correlation id of the current request, if any."""
+    return _correlation_id.get()
+
+@contextmanager
+def use_correlation_id(correlation_id: str) -> Iterator[str]:
+    """Tag every log record emitted in the enclosed block, including from
+    worker threads started with a copy of the context, with the given id."""
+    token = _correlation_id.set(correlation_id)
+    try:
+        yield correlation_id
+    finally:
+        _correlation_id.reset(token)
+
+def redact(text: str) -> str:
+    """Mask secrets such as API keys and bearer tokens."""
+    for pattern in SECRET_PATTERNS:
+        text = pattern.sub(lambda m: (m.group(1) if m.groups() else "") + "[REDACTED]", text)
+    return text
+
+def truncate(text: str, max_chars: int) -> str:
+    """Shorten a payload, keeping its head and noting how much was dropped."""
+    if max_chars <= 0 or len(text) <= max_chars:
+        return text
+    return f"{text[:max_chars]}... [truncated {len(text) - max_chars} chars]"
+
+class _PayloadLimitingQueueHandler(QueueHandler):
+    """Queues records for the listener thread after bounding their size.
+
+    The message is rendered here, in the logging thread, because its
+    arguments may change once the call returns. Only records that pass the
+    level checks get this far, so disabled debug calls cost nothing.
+    """
+
+    def __init__(self, log_queue: queue.Queue, max_chars: int):
+        super().__init__(log_queue)
+        self.max_chars = max_chars
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.correlation_id = _correlation_id.get()
+        record = super().prepare(record)
+        # Redact before truncating so a cut can't leave part of a secret unmatched
+        record.msg = truncate(redact(record.msg), self.max_chars)
+        return record
+
+class JsonFormatter(logging.Formatter):
+    """Renders a record as one JSON object per line."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "ts": datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            "thread": record.threadName,
+        }
+        if getattr(record, "correlation_id", None):
+            entry["correlation_id"] = record.correlation_id
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES:
+                entry[key] = value
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+class TextFormatter(logging.Formatter):
+    """Human-readable format for local development."""
+
+    def __init__(self):
+        super().__init__('%(asctime)s [%(levelname)s] %(name)s [%(correlation_id)s] %(message)s', datefmt='%Y-%m-%d %H:%M:%S')
+
+    def format(self, record: logging.LogRecord) -> str:
+        if not getattr(record, "correlation_id", None):
+            record.correlation_id = "-"
+        return super().format(record)
+
+def parse_levels(spec: str) -> Dict[str, str]:
+    """Parse per-logger levels such as ``"src.agent.graph=DEBUG,httpx=WARNING"``."""
+    levels = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, level = item.partition("=")
+        if not level:
+            raise ValueError(f"Invalid log level setting: {item}")
+        levels[name.strip()] = level.strip().upper()
+    return levels
+
+def configure_logging() -> None:
+    """Route all logging through a queue to a background writer thread.
+
+    Configured from the environment:
+        LOG_LEVEL: Root level (default INFO)
+        LOG_LEVELS: Per-logger levels, e.g. "src.agent.graph=DEBUG,httpx=WARNING"
+        LOG_FORMAT: "json" (default) or "text"
+        LOG_MAX_MESSAGE_CHARS: Longer messages are truncated (default 2000, 0 disables)
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    stream_handler = logging.StreamHandler(sys.stdout)
+    stream_handler.setFormatter(TextFormatter() if os.getenv("LOG_FORMAT", "json") == "text" else JsonFormatter())
+
+    log_queue: queue.Queue = queue.Queue(-1)
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(_PayloadLimitingQueueHandler(log_queue, int(os.getenv("LOG_MAX_MESSAGE_CHARS", "2000"))))
+    root.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+    for name, level in parse_levels(os.getenv("LOG_LEVELS", "")).items():
+        logging.getLogger(name).setLevel(level)
+
+    _listener = QueueListener(log_queue, stream_handler, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+def shutdown_logging() -> None:
+    """Flush queued records and stop the writer thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
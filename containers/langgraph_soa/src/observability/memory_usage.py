@@ -0,0 +1,126 @@
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Sequence, Tuple
+import json
+import logging
+import os
+import threading
+import tracemalloc
+
+from tools.rendering import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+@dataclass
+class SessionFootprint:
+    """Approximate memory held for one session."""
+    session_id: str
+    messages: int = 0
+    bytes: int = 0
+    tokens: int = 0
+    # Unix time the session's history was last used
+    last_access: Optional[float] = None
+    # Retrieval index of the session, if session memory is enabled
+    memory_snippets: int = 0
+    memory_bytes: int = 0
+
+    def add_messages(self, messages: Sequence[Any]) -> None:
+        """Count messages held for the session, as LangChain messages or plain dicts."""
+        size, tokens = message_footprint(messages)
+        self.messages += len(messages)
+        self.bytes += size
+        self.tokens += tokens
+
+    @property
+    def total_bytes(self) -> int:
+        return self.bytes + self.memory_bytes
+
+def message_footprint(messages: Sequence[Any]) -> Tuple[int, int]:
+    """Approximate size of messages in bytes and tokens: their content and extra fields."""
+    size = tokens = 0
+    for message in messages:
+        if isinstance(message, dict):
+            text = json.dumps(message, default=str)
+        else:
+            content = message.content if isinstance(message.content, str) else json.dumps(message.content, default=str)
+            extra = json.dumps(message.additional_kwargs, default=str) if message.additional_kwargs else ""
+            text = content + extra
+        size += len(text.encode("utf-8", "replace"))
+        tokens += estimate_tokens(text)
+    return size, tokens
+
+def process_memory() -> Dict[str, Optional[int]]:
+    """Resident set size of the process and its peak, in bytes, where the platform reports them."""
+    rss = peak = None
+    try:
+        with open("/proc/self/statm") as f:
+            rss = int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        pass
+    try:
+        import resource
+        # Kilobytes on Linux
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    except ImportError:
+        pass
+    return {"rss_bytes": rss, "peak_rss_bytes": peak}
+
+class AllocationTracker:
+    """tracemalloc snapshots taken on demand.
+
+    Tracing starts with the first snapshot, unless the process was started
+    with PYTHONTRACEMALLOC, and only sees allocations made from then on.
+    Each snapshot is compared with the previous one, so the growth between
+    two snapshots points at the code that keeps allocating.
+    """
+
+    def __init__(self, frames: int = 1):
+        self.frames = frames
+        self._previous: Optional[tracemalloc.Snapshot] = None
+        self._lock = threading.Lock()
+
+    def snapshot(self, limit: int = 20) -> Dict[str, Any]:
+        """Take a snapshot.
+
+        Returns:
+            Traced and peak bytes, the ``limit`` source lines holding the most
+            memory and those that grew the most since the previous snapshot
+        """
+        with self._lock:
+            started = not tracemalloc.is_tracing()
+            if started:
+                logger.info("Starting tracemalloc with %s frame(s)", self.frames)
+                tracemalloc.start(self.frames)
+                self._previous = None
+            snapshot = tracemalloc.take_snapshot().filter_traces([
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+            ])
+            traced, peak = tracemalloc.get_traced_memory()
+            top = [
+                {"location": _location(stat.traceback), "bytes": stat.size, "count": stat.count}
+                for stat in snapshot.statistics("lineno")[:limit]
+            ]
+            growth = [
+                {"location": _location(stat.traceback), "bytes": stat.size, "bytes_diff": stat.size_diff, "count_diff": stat.count_diff}
+                for stat in (snapshot.compare_to(self._previous, "lineno") if self._previous else [])
+                if stat.size_diff > 0
+            ][:limit]
+            self._previous = snapshot
+        return {"tracing_started": started, "traced_bytes": traced, "peak_traced_bytes": peak, "top": top, "growth": growth}
+
+    def stop(self) -> bool:
+        """Stop tracing, which frees its memory and overhead.
+
+        Returns:
+            Whether tracing was on
+        """
+        with self._lock:
+            self._previous = None
+            if not tracemalloc.is_tracing():
+                return False
+            tracemalloc.stop()
+            return True
+
+def _location(traceback: tracemalloc.Traceback) -> str:
+    frame = traceback[0]
+    return f"{frame.filename}:{frame.lineno}"
@@ -0,0 +1,188 @@
+from functools import wraps
+from typing import Any, Callable, Dict, Optional, Tuple
+import time
+
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+
+# Latencies range from sub-millisecond reads to multi-minute commands and LLM turns
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+NODE_DURATION = Histogram(
+    "rose_graph_node_duration_seconds",
+    "Duration of agent graph node executions",
+    ["node"],
+    buckets=LATENCY_BUCKETS,
+)
+LLM_CALL_DURATION = Histogram(
+    "rose_llm_call_duration_seconds",
+    "Duration of LLM calls, until the full response has been received",
+    ["provider", "model"],
+    buckets=LATENCY_BUCKETS,
+)
+LLM_TIME_TO_FIRST_TOKEN = Histogram(
+    "rose_llm_time_to_first_token_seconds",
+    "Time until the first streamed chunk of an LLM response",
+    ["provider", "model"],
+    buckets=LATENCY_BUCKETS,
+)
+LLM_TOKENS = Counter(
+    "rose_llm_tokens_total",
+    "Tokens processed by LLM calls",
+    ["provider", "model", "kind"],
+)
+LLM_CACHE_REQUESTS = Counter(
+    "rose_llm_cache_requests_total",
+    "LLM requests by response cache outcome (memory_hit, disk_hit, miss, bypass)",
+    ["result"],
+)
+COMMAND_CACHE_REQUESTS = Counter(
+    "rose_command_cache_requests_total",
+    "Cacheable command executions by command result cache outcome (hit, miss)",
+    ["result"],
+)
+LLM_ROUTES = Counter(
+    "rose_llm_routes_total",
+    "LLM steps by the model tier that answered them (fast, flagship or escalated from fast)",
+    ["tier", "reason"],
+)
+TOOL_CALL_DURATION = Histogram(
+    "rose_tool_call_duration_seconds",
+    "Duration of tool executions",
+    ["tool", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+TOOL_RESULT_TOKENS = Counter(
+    "rose_tool_result_tokens_total",
+    "Estimated tokens of compactly rendered tool results, and of the same results as returned by the dev_container",
+    ["tool", "encoding"],
+)
+TOOL_RESULT_TOKENS_SAVED = Counter(
+    "rose_tool_result_tokens_saved_total",
+    "Estimated tokens saved by rendering tool results compactly",
+    ["tool"],
+)
+SESSION_MEMORY_MESSAGES = Counter(
+    "rose_session_memory_messages_total",
+    "Session messages left out of prompts (dropped) and earlier snippets recalled into them (recalled)",
+    ["kind"],
+)
+DEV_CONTAINER_CIRCUIT_STATE = Gauge(
+    "rose_dev_container_circuit_state",
+    "Circuit breaker state per dev_container (0 closed, 1 half-open, 2 open)",
+    ["target"],
+)
+DEV_CONTAINER_CIRCUIT_REJECTIONS = Counter(
+    "rose_dev_container_circuit_rejections_total",
+    "dev_container requests failed fast because the circuit was open",
+    ["target"],
+)
+CIRCUIT_STATE_VALUES = {"closed": 0, "half_open": 1, "open": 2}
+RUN_STEPS = Histogram(
+    "rose_run_steps",
+    "LLM steps taken per agent run",
+    buckets=(1, 2, 3, 5, 8, 13, 21, 34, 55, 89),
+)
+RUNS = Counter(
+    "rose_runs_total",
+    "Finished agent runs",
+    ["stop_reason"],
+)
+ACTIVE_SESSIONS = Gauge(
+    "rose_active_sessions",
+    "Sessions with queued or running agent runs",
+)
+QUEUE_DEPTH = Gauge(
+    "rose_run_queue_depth",
+    "Agent runs waiting for admission",
+)
+
+def timed_node(name: str, node: Callable[[Any], Any]) -> Callable[[Any], Any]:
+    """Wrap a graph node so its duration is recorded."""
+    histogram = NODE_DURATION.labels(node=name)
+
+    @wraps(node)
+    def wrapper(state: Any) -> Any:
+        started_at = time.perf_counter()
+        try:
+            return node(state)
+        finally:
+            histogram.observe(time.perf_counter() - started_at)
+    return wrapper
+
+def record_llm_call(provider: str, model: str, duration: float, response: Any) -> None:
+    """Record latency and token usage of a finished LLM call."""
+    LLM_CALL_DURATION.labels(provider=provider, model=model).observe(duration)
+
+    time_to_first_token = (getattr(response, "response_metadata", None) or {}).get("time_to_first_token")
+    if time_to_first_token is not None:
+        LLM_TIME_TO_FIRST_TOKEN.labels(provider=provider, model=model).observe(time_to_first_token)
+
+    usage: Optional[Dict[str, Any]] = getattr(response, "usage_metadata", None)
+    if not usage:
+        return
+    cached = (usage.get("input_token_details") or {}).get("cache_read") or 0
+    LLM_TOKENS.labels(provider=provider, model=model, kind="input").inc(usage.get("input_tokens") or 0)
+    LLM_TOKENS.labels(provider=provider, model=model, kind="output").inc(usage.get("output_tokens") or 0)
+    if cached:
+        LLM_TOKENS.labels(provider=provider, model=model, kind="cached").inc(cached)
+
+def record_llm_cache(result: str) -> None:
+    """Record the outcome of a response cache lookup."""
+    LLM_CACHE_REQUESTS.labels(result=result).inc()
+
+def record_command_cache(result: str) -> None:
+    """Record the outcome of a command result cache lookup."""
+    COMMAND_CACHE_REQUESTS.labels(result=result).inc()
+
+def record_llm_route(tier: str, reason: str) -> None:
+    """Record which model tier answered a routed step, and why."""
+    LLM_ROUTES.labels(tier=tier, reason=reason).inc()
+
+def record_tool_call(tool: str, duration: float, error: bool = False) -> None:
+    """Record the latency of a tool execution."""
+    TOOL_CALL_DURATION.labels(tool=tool, status="error" if error else "ok").observe(duration)
+
+def record_tool_result_tokens(tool: str, verbose: int, compact: int) -> None:
+    """Record the estimated size of a compactly rendered tool result and of its verbose form."""
+    TOOL_RESULT_TOKENS.labels(tool=tool, encoding="verbose").inc(verbose)
+    TOOL_RESULT_TOKENS.labels(tool=tool, encoding="compact").inc(compact)
+    TOOL_RESULT_TOKENS_SAVED.labels(tool=tool).inc(max(verbose - compact, 0))
+
+def record_memory_recall(dropped: int, recalled: int) -> None:
+    """Record the messages a prompt left out for the session memory window and the snippets recalled instead."""
+    SESSION_MEMORY_MESSAGES.labels(kind="dropped").inc(dropped)
+    SESSION_MEMORY_MESSAGES.labels(kind="recalled").inc(recalled)
+
+def record_circuit_state(target: str, state: str) -> None:
+    """Record the circuit breaker state of a dependency."""
+    DEV_CONTAINER_CIRCUIT_STATE.labels(target=target).set(CIRCUIT_STATE_VALUES[state])
+
+def record_circuit_rejection(target: str) -> None:
+    """Record a call rejected because the circuit of its dependency is open."""
+    DEV_CONTAINER_CIRCUIT_REJECTIONS.labels(target=target).inc()
+
+def forget_circuit(target: str) -> None:
+    """Stop reporting the circuit of a dependency that is no longer used."""
+    for metric in (DEV_CONTAINER_CIRCUIT_STATE, DEV_CONTAINER_CIRCUIT_REJECTIONS):
+        try:
+            metric.remove(target)
+        except KeyError:
+            pass
+
+def record_run(stop_reason: str, steps: int) -> None:
+    """Record a finished agent run."""
+    RUNS.labels(stop_reason=stop_reason).inc()
+    RUN_STEPS.observe(steps)
+
+def track_scheduler(scheduler: Any) -> None:
+    """Report queue gauges from the run scheduler when metrics are scraped."""
+    ACTIVE_SESSIONS.set_function(lambda: scheduler.stats()["active_sessions"])
+    QUEUE_DEPTH.set_function(scheduler.queue_depth)
+
+def render() -> Tuple[bytes, str]:
+    """Render all metrics in the Prometheus text format.
+
+    Returns:
+        The payload and its content type
+    """
+    return generate_latest(), CONTENT_TYPE_LATEST
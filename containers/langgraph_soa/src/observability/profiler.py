@@ -0,0 +1,130 @@
+from collections import Counter, OrderedDict
+from contextlib import contextmanager
+from types import FrameType
+from typing import Dict, Iterator, Optional
+import os
+import sys
+import threading
+
+class SamplingProfiler:
+    """Statistical profiler for the threads working on one run.
+
+    A background thread samples the stacks of the attached threads every
+    ``interval`` seconds via ``sys._current_frames``. Threads attach only
+    while they execute work of the profiled run (graph nodes, tools, response
+    serialization), so pooled threads serving other runs are not sampled.
+    The result is in the collapsed-stack format read by flamegraph.pl,
+    speedscope and inferno.
+    """
+
+    def __init__(self, interval: float = 0.005):
+        self.interval = interval
+        self.samples = 0
+        self._attached: Counter = Counter()
+        self._stacks: Counter = Counter()
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        """Start sampling in a background thread."""
+        self._thread = threading.Thread(target=self._sample_loop, name="rose-profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop sampling and wait for the sampler thread to exit."""
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    @contextmanager
+    def attach(self) -> Iterator[None]:
+        """Sample the current thread while the enclosed block runs."""
+        ident = threading.get_ident()
+        with self._lock:
+            self._attached[ident] += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._attached[ident] -= 1
+                if self._attached[ident] <= 0:
+                    del self._attached[ident]
+
+    def to_collapsed(self) -> str:
+        """Render the samples as collapsed stacks, one ``frame;frame;frame count`` line per stack."""
+        with self._lock:
+            stacks = sorted(self._stacks.items())
+        return "".join(f"{stack} {count}\n" for stack, count in stacks)
+
+    def _sample_loop(self) -> None:
+        while not self._stopped.wait(self.interval):
+            with self._lock:
+                idents = list(self._attached)
+            if not idents:
+                continue
+            frames = sys._current_frames()
+            collapsed = [_collapse(frames[ident]) for ident in idents if ident in frames]
+            with self._lock:
+                self._stacks.update(collapsed)
+                self.samples += len(collapsed)
+
+def _collapse(frame: Optional[FrameType]) -> str:
+    """Render a stack root first, with frames as ``function (dir/file.py:line)``."""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        filename = "/".join(code.co_filename.split(os.sep)[-2:])
+        names.append(f"{code.co_name} ({filename}:{code.co_firstlineno})".replace(";", ":"))
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+class ProfileStore:
+    """Keeps the collapsed-stack profiles of recently profiled runs.
+
+    Profiling is off by default. It is enabled per request with an admin
+    header, or armed for the next runs through the admin endpoint.
+    """
+
+    def __init__(self, interval: float = 0.005, max_profiles: int = 20):
+        self.interval = interval
+        self.max_profiles = max_profiles
+        self._profiles: 'OrderedDict[str, str]' = OrderedDict()
+        self._armed: Dict[Optional[str], int] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> 'ProfileStore':
+        """Create a store configured from PROFILER_* environment variables."""
+        return cls(
+            interval=float(os.getenv("PROFILER_INTERVAL_SECONDS", "0.005")),
+            max_profiles=int(os.getenv("PROFILER_STORE_SIZE", "20")),
+        )
+
+    def arm(self, runs: int = 1, session_id: Optional[str] = None) -> None:
+        """Profile the next ``runs`` runs, of one session or of any session."""
+        with self._lock:
+            self._armed[session_id] = self._armed.get(session_id, 0) + runs
+
+    def take_armed(self, session_id: str) -> bool:
+        """Check whether a run of the session should be profiled, consuming one armed run."""
+        with self._lock:
+            for key in (session_id, None):
+                if self._armed.get(key):
+                    self._armed[key] -= 1
+                    if not self._armed[key]:
+                        del self._armed[key]
+                    return True
+        return False
+
+    def save(self, request_id: str, profiler: SamplingProfiler) -> None:
+        """Store the profile of a finished run, evicting the oldest ones."""
+        with self._lock:
+            self._profiles[request_id] = profiler.to_collapsed()
+            while len(self._profiles) > self.max_profiles:
+                self._profiles.popitem(last=False)
+
+    def get(self, request_id: str) -> Optional[str]:
+        """Get a stored profile by request id."""
+        with self._lock:
+            return self._profiles.get(request_id)
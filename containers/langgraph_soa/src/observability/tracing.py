@@ -0,0 +1,115 @@
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+import os
+import threading
+import time
+
+class Tracer:
+    """Records a span timeline for one request in the Chrome trace event format.
+
+    Spans are kept in memory as complete ("X") events and can be loaded in
+    chrome://tracing or https://ui.perfetto.dev. Recording is cheap, so every
+    request is traced and the decision to keep a trace is made at the end.
+    """
+
+    def __init__(self):
+        self._origin_ns = time.perf_counter_ns()
+        self._pid = os.getpid()
+        self._events: List[Dict[str, Any]] = []
+        self._threads: Dict[int, str] = {}
+        self._lock = threading.Lock()
+
+    def _now_us(self) -> float:
+        return (time.perf_counter_ns() - self._origin_ns) / 1000
+
+    def _record(self, event: Dict[str, Any]) -> None:
+        thread = threading.current_thread()
+        event["pid"] = self._pid
+        event["tid"] = thread.ident
+        with self._lock:
+            self._threads.setdefault(thread.ident, thread.name)
+            self._events.append(event)
+
+    @contextmanager
+    def span(self, name: str, category: str = "agent", **args: Any) -> Iterator[Dict[str, Any]]:
+        """Record the enclosed block as a span.
+
+        Yields:
+            The span arguments, which can be extended while the span is open
+        """
+        start = self._now_us()
+        try:
+            yield args
+        except BaseException as e:
+            args["error"] = type(e).__name__
+            raise
+        finally:
+            self._record({"name": name, "cat": category, "ph": "X", "ts": start, "dur": self._now_us() - start, "args": args})
+
+    def instant(self, name: str, category: str = "agent", **args: Any) -> None:
+        """Record a point in time, e.g. the first token of a response."""
+        self._record({"name": name, "cat": category, "ph": "i", "s": "t", "ts": self._now_us(), "args": args})
+
+    def duration(self) -> float:
+        """Seconds since the tracer was created."""
+        return self._now_us() / 1_000_000
+
+    def to_chrome_trace(self, **metadata: Any) -> Dict[str, Any]:
+        """Export the recorded spans as a Chrome trace / Perfetto JSON document."""
+        with self._lock:
+            events = list(self._events)
+            threads = dict(self._threads)
+        thread_names = [
+            {"name": "thread_name", "ph": "M", "pid": self._pid, "tid": tid, "args": {"name": name}}
+            for tid, name in threads.items()
+        ]
+        return {
+            "traceEvents": thread_names + sorted(events, key=lambda e: e["ts"]),
+            "displayTimeUnit": "ms",
+            "otherData": metadata,
+        }
+
+class TraceStore:
+    """Keeps the traces of the most recent interesting requests.
+
+    Tail-based sampling: a trace is kept if its request was slower than
+    ``slow_threshold_seconds``, failed, or was explicitly requested.
+    """
+
+    def __init__(self, slow_threshold_seconds: float = 10.0, max_traces: int = 100):
+        self.slow_threshold_seconds = slow_threshold_seconds
+        self.max_traces = max_traces
+        self._traces: 'OrderedDict[str, Dict[str, Any]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> 'TraceStore':
+        """Create a store configured from TRACE_* environment variables."""
+        return cls(
+            slow_threshold_seconds=float(os.getenv("TRACE_SLOW_THRESHOLD_SECONDS", "10")),
+            max_traces=int(os.getenv("TRACE_STORE_SIZE", "100")),
+        )
+
+    def offer(self, request_id: str, tracer: Tracer, forced: bool = False, failed: bool = False, **metadata: Any) -> bool:
+        """Keep the trace of a finished request if it is sampled.
+
+        Returns:
+            Whether the trace was kept
+        """
+        duration = tracer.duration()
+        if not (forced or failed or duration >= self.slow_threshold_seconds):
+            return False
+
+        trace = tracer.to_chrome_trace(request_id=request_id, duration_seconds=round(duration, 6), **metadata)
+        with self._lock:
+            self._traces[request_id] = trace
+            self._traces.move_to_end(request_id)
+            while len(self._traces) > self.max_traces:
+                self._traces.popitem(last=False)
+        return True
+
+    def get(self, request_id: str) -> Optional[Dict[str, Any]]:
+        """Get a kept trace by request id."""
+        with self._lock:
+            return self._traces.get(request_id)
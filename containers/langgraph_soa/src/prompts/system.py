@@ -12,8 +12,35 @@ Before you take action or ask for clarification, you will look at the current fi
 If you need to you will look at the contents of the files and their metadata.
 Always be clear about what actions you're taking and provide helpful feedback.
 If you encounter errors, explain them clearly and suggest possible solutions.
+To check your changes, use run_tests instead of running whole test suites with execute_command.
+If a tool returns the error "dev_container_unavailable", the workspace is down: do not call tools again in this turn, tell the user and stop.
 
 You have access to these tools:
 {tool_descriptions}
 
 When you need to use a tool, use the tool's function call format."""
+
+def get_planner_prompt(max_subtasks: int) -> str:
+    """Get the prompt that asks the model to split a request into independent subtasks."""
+    return f"""
+You plan work for a team of software engineers who work in parallel on the same app directory.
+Decide whether the user's request can be split into independent subtasks that touch different files,
+such as adding tests for several unrelated modules. Do not split tasks whose steps depend on each other,
+and do not split small tasks.
+
+Reply with JSON only, in this format:
+{{"subtasks": [{{"title": "short title", "instructions": "everything the engineer needs to know", "files": ["paths the subtask will change"]}}]}}
+
+Use at most {max_subtasks} subtasks. Reply with {{"subtasks": []}} if the request should not be split."""
+
+def get_subtask_message(request: str, title: str, instructions: str, files: list) -> str:
+    """Get the request given to the sub-agent working on one subtask."""
+    scope = f"\nOnly change these files unless the subtask cannot be done otherwise: {', '.join(files)}" if files else ""
+    return f"""You are working on one part of a larger request, while other engineers work on the other parts in parallel.
+
+Overall request: {request}
+
+Your part: {title}
+{instructions}{scope}
+
+When you are done, reply with a short summary of what you changed."""
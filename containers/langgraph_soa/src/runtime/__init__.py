@@ -0,0 +1,3 @@
+"""
+Per-run runtime support for the agent (budgets, run context, scheduling, cancellation, record and replay)
+"""
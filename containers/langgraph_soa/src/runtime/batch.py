@@ -0,0 +1,258 @@
+from dataclasses import asdict, dataclass, field
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+import asyncio
+import json
+import logging
+import os
+import re
+import time
+import uuid
+
+from .cancellation import CancellationToken
+
+logger = logging.getLogger(__name__)
+
+_BATCH_ID = re.compile(r"^[a-f0-9]{16}$")
+
+@dataclass
+class BatchTask:
+    """One independent agent task of a batch."""
+    task_id: str
+    input: str
+    session_id: str
+    # Dev_container to run the task's tools against, defaults to the tools' own
+    workspace: Optional[str] = None
+    budget: Optional[Dict[str, Any]] = None
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any], index: int, batch_id: str) -> 'BatchTask':
+        """Create a task from one line of a batch, filling in default ids.
+
+        Raises:
+            ValueError: If the task is malformed
+        """
+        if not isinstance(data, dict):
+            raise ValueError("task must be a JSON object")
+        unknown = set(data) - {"task_id", "input", "session_id", "workspace", "budget"}
+        if unknown:
+            raise ValueError(f"unknown fields {', '.join(sorted(unknown))}")
+        if not isinstance(data.get("input"), str) or not data["input"]:
+            raise ValueError("input is required")
+        workspace = data.get("workspace")
+        if workspace is not None and not (isinstance(workspace, str) and workspace.startswith(("http://", "https://"))):
+            raise ValueError("workspace must be an http(s) URL of a dev_container")
+        task_id = str(data.get("task_id") or f"task-{index}")
+        return cls(
+            task_id=task_id,
+            input=data["input"],
+            session_id=str(data.get("session_id") or f"batch-{batch_id}-{task_id}"),
+            workspace=workspace.rstrip("/") if workspace else None,
+            budget=data.get("budget"),
+        )
+
+def parse_tasks(payload: str, batch_id: str) -> List[BatchTask]:
+    """Parse a JSONL list of tasks, one JSON object per line.
+
+    Raises:
+        ValueError: If a line is malformed or task ids repeat
+    """
+    tasks = []
+    for number, line in enumerate(payload.splitlines(), start=1):
+        if not line.strip():
+            continue
+        try:
+            tasks.append(BatchTask.from_dict(json.loads(line), len(tasks) + 1, batch_id))
+        except ValueError as e:
+            raise ValueError(f"Invalid task on line {number}: {e}") from None
+    if not tasks:
+        raise ValueError("No tasks provided")
+    task_ids = [task.task_id for task in tasks]
+    if len(set(task_ids)) != len(task_ids):
+        raise ValueError("Task ids must be unique within a batch")
+    return tasks
+
+# Runs one task and returns the fields of its result line
+TaskExecutor = Callable[['Batch', BatchTask, CancellationToken], Awaitable[Dict[str, Any]]]
+
+@dataclass
+class Batch:
+    """A batch of tasks and its files: tasks.jsonl, meta.json and the results.jsonl output."""
+    batch_id: str
+    directory: str
+    tasks: List[BatchTask]
+    tenant: str = "default"
+    max_workers: int = 4
+    status: str = "pending"
+    # Latest result status by task id, as in results.jsonl
+    results: Dict[str, str] = field(default_factory=dict)
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    _tokens: Dict[str, CancellationToken] = field(default_factory=dict, repr=False)
+    _cancelled: bool = field(default=False, repr=False)
+    _runner: Optional[asyncio.Task] = field(default=None, repr=False)
+
+    @property
+    def results_path(self) -> str:
+        return os.path.join(self.directory, "results.jsonl")
+
+    def pending_tasks(self) -> List[BatchTask]:
+        """Tasks that have not completed yet, including failed and cancelled ones."""
+        return [task for task in self.tasks if self.results.get(task.task_id) != "completed"]
+
+    def summary(self) -> Dict[str, Any]:
+        """Progress of the batch."""
+        counts: Dict[str, int] = {}
+        for status in self.results.values():
+            counts[status] = counts.get(status, 0) + 1
+        return {
+            "batch_id": self.batch_id,
+            "status": self.status,
+            "tenant": self.tenant,
+            "max_workers": self.max_workers,
+            "tasks": len(self.tasks),
+            "pending": len(self.pending_tasks()),
+            "results": counts,
+            "running": len(self._tokens),
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+class BatchManager:
+    """Runs batches of independent agent tasks with bounded parallelism.
+
+    Each batch lives in its own directory. Results are appended to
+    ``results.jsonl`` as tasks finish, so a batch interrupted by a restart or
+    cancelled can be resumed: only tasks without a completed result run
+    again, and the last line of a task is its final result.
+    """
+
+    def __init__(self, directory: str = "batches", max_workers: int = 4):
+        self.directory = directory
+        self.max_workers = max_workers
+        self._batches: Dict[str, Batch] = {}
+
+    @classmethod
+    def from_env(cls) -> 'BatchManager':
+        """Create a manager configured from BATCH_* environment variables."""
+        return cls(
+            directory=os.getenv("BATCH_DIR", "batches"),
+            max_workers=int(os.getenv("BATCH_MAX_WORKERS", "4")),
+        )
+
+    def create(self, payload: str, tenant: str = "default", max_workers: Optional[int] = None) -> Batch:
+        """Store a new batch from a JSONL list of tasks.
+
+        Raises:
+            ValueError: If the tasks are malformed
+        """
+        batch_id = uuid.uuid4().hex[:16]
+        tasks = parse_tasks(payload, batch_id)
+        workers = min(max_workers or self.max_workers, self.max_workers)
+        if workers < 1:
+            raise ValueError("max_workers must be at least 1")
+
+        batch = Batch(batch_id, os.path.join(self.directory, batch_id), tasks, tenant=tenant, max_workers=workers)
+        os.makedirs(batch.directory)
+        with open(os.path.join(batch.directory, "tasks.jsonl"), "w", encoding="utf-8") as f:
+            for task in tasks:
+                f.write(json.dumps(asdict(task)) + "\n")
+        with open(os.path.join(batch.directory, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump({"tenant": tenant, "max_workers": workers, "created_at": time.time()}, f)
+        self._batches[batch_id] = batch
+        return batch
+
+    def get(self, batch_id: str) -> Optional[Batch]:
+        """Get a batch, loading it from disk if it was created before a restart."""
+        if batch_id in self._batches:
+            return self._batches[batch_id]
+        directory = os.path.join(self.directory, batch_id)
+        if not _BATCH_ID.match(batch_id) or not os.path.isdir(directory):
+            return None
+
+        with open(os.path.join(directory, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        with open(os.path.join(directory, "tasks.jsonl"), encoding="utf-8") as f:
+            tasks = [BatchTask(**json.loads(line)) for line in f if line.strip()]
+        batch = Batch(batch_id, directory, tasks, tenant=meta["tenant"], max_workers=meta["max_workers"])
+        if os.path.exists(batch.results_path):
+            with open(batch.results_path, encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        result = json.loads(line)
+                        batch.results[result["task_id"]] = result["status"]
+        batch.status = "completed" if not batch.pending_tasks() else "interrupted"
+        self._batches[batch_id] = batch
+        return batch
+
+    def start(self, batch: Batch, execute: TaskExecutor) -> None:
+        """Run the pending tasks of a batch in the background.
+
+        Raises:
+            ValueError: If the batch is already running
+        """
+        if batch.status == "running":
+            raise ValueError(f"Batch {batch.batch_id} is already running")
+        batch.status = "running"
+        batch._cancelled = False
+        batch.started_at = time.time()
+        batch.finished_at = None
+        batch._runner = asyncio.create_task(self._run(batch, execute))
+
+    def cancel(self, batch: Batch) -> int:
+        """Stop starting tasks and cancel the running ones.
+
+        Returns:
+            Number of running tasks cancelled
+        """
+        batch._cancelled = True
+        tokens = list(batch._tokens.values())
+        for token in tokens:
+            token.cancel("batch cancelled")
+        return len(tokens)
+
+    async def _run(self, batch: Batch, execute: TaskExecutor) -> None:
+        pending = batch.pending_tasks()
+        logger.info("Starting batch %s: %s of %s tasks pending, %s workers", batch.batch_id, len(pending), len(batch.tasks), batch.max_workers)
+        queue: asyncio.Queue = asyncio.Queue()
+        for task in pending:
+            queue.put_nowait(task)
+
+        with open(batch.results_path, "a", encoding="utf-8") as results:
+            async def worker() -> None:
+                while not batch._cancelled:
+                    try:
+                        task = queue.get_nowait()
+                    except asyncio.QueueEmpty:
+                        return
+                    result = await self._run_task(batch, task, execute)
+                    batch.results[task.task_id] = result["status"]
+                    results.write(json.dumps(result, default=str) + "\n")
+                    results.flush()
+
+            await asyncio.gather(*(worker() for _ in range(min(batch.max_workers, len(pending)) or 1)))
+
+        batch.finished_at = time.time()
+        batch.status = "cancelled" if batch._cancelled else "completed"
+        logger.info("Batch %s %s: %s", batch.batch_id, batch.status, batch.summary()["results"])
+
+    async def _run_task(self, batch: Batch, task: BatchTask, execute: TaskExecutor) -> Dict[str, Any]:
+        """Run one task, turning errors into a failed result."""
+        token = CancellationToken()
+        batch._tokens[task.task_id] = token
+        started_at = time.monotonic()
+        try:
+            fields = await execute(batch, task, token)
+            status = "cancelled" if token.cancelled else "completed"
+        except Exception as e:
+            logger.error("Task %s of batch %s failed: %s", task.task_id, batch.batch_id, e)
+            fields = {"error": str(e)}
+            status = "failed"
+        finally:
+            del batch._tokens[task.task_id]
+        return {
+            "task_id": task.task_id,
+            "session_id": task.session_id,
+            "status": status,
+            "duration_seconds": round(time.monotonic() - started_at, 3),
+            **fields,
+        }
@@ -0,0 +1,131 @@
+from typing import Dict, Any, Optional
+from dataclasses import dataclass, asdict, fields, replace
+import threading
+import time
+import logging
+
+from ..llm.pricing import estimate_cost
+
+logger = logging.getLogger(__name__)
+
+class StopReason:
+    """Reason codes reported when a run terminates."""
+    COMPLETED = "completed"
+    MAX_STEPS = "max_steps"
+    MAX_TOKENS = "max_tokens"
+    MAX_COST = "max_cost"
+    DEADLINE = "deadline"
+    CANCELLED = "cancelled"
+
+class DeadlineExceeded(Exception):
+    """Raised inside a run whose time budget ran out during an LLM call."""
+
+@dataclass
+class ExecutionBudget:
+    """Limits applied to a single agent run. ``None`` disables a limit."""
+    max_steps: Optional[int] = 25
+    max_tokens: Optional[int] = None
+    max_seconds: Optional[float] = 300.0
+    max_cost_usd: Optional[float] = None
+
+    @classmethod
+    def unlimited(cls) -> 'ExecutionBudget':
+        """Create a budget with every limit disabled."""
+        return cls(max_steps=None, max_tokens=None, max_seconds=None, max_cost_usd=None)
+
+    @classmethod
+    def from_dict(cls, config: Optional[Dict[str, Any]]) -> 'ExecutionBudget':
+        """Create an ExecutionBudget from a dictionary, using defaults for missing keys."""
+        return cls().merged(config or {})
+
+    def merged(self, overrides: Optional[Dict[str, Any]]) -> 'ExecutionBudget':
+        """Return a copy of this budget with the given limits overridden."""
+        if not overrides:
+            return self
+
+        known = {f.name for f in fields(self)}
+        unknown = set(overrides) - known
+        if unknown:
+            raise ValueError(f"Unknown budget keys: {', '.join(sorted(unknown))}")
+
+        for key, value in overrides.items():
+            if value is None:
+                continue
+            if isinstance(value, bool) or not isinstance(value, (int, float)) or value <= 0:
+                raise ValueError(f"Budget value for {key} must be a positive number or null")
+
+        return replace(self, **overrides)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert budget to dictionary."""
+        return asdict(self)
+
+class BudgetTracker:
+    """Tracks consumption of an ExecutionBudget over the course of one run."""
+
+    def __init__(self, budget: Optional[ExecutionBudget] = None):
+        self.budget = budget or ExecutionBudget.unlimited()
+        self.started_at = time.monotonic()
+        self.steps = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.cost_usd = 0.0
+        # Sub-agents of a run record their calls concurrently
+        self._lock = threading.Lock()
+
+    def elapsed(self) -> float:
+        """Seconds since the run started."""
+        return time.monotonic() - self.started_at
+
+    def remaining_seconds(self) -> Optional[float]:
+        """Seconds left before the deadline, or None if there is no deadline."""
+        if self.budget.max_seconds is None:
+            return None
+        return max(0.0, self.budget.max_seconds - self.elapsed())
+
+    def raise_if_past_deadline(self) -> None:
+        """Raise DeadlineExceeded once the run is out of time."""
+        if self.remaining_seconds() == 0:
+            raise DeadlineExceeded(f"run exceeded its {self.budget.max_seconds}s budget")
+
+    def record_llm_call(self, model_name: str, usage: Optional[Dict[str, Any]], step: bool = True) -> None:
+        """Record one LLM call and the token usage it reported.
+        
+        Calls that did not produce a step (e.g. a discarded response) only count towards tokens and cost.
+        """
+        input_tokens = (usage or {}).get("input_tokens", 0) or 0
+        output_tokens = (usage or {}).get("output_tokens", 0) or 0
+        cost = estimate_cost(model_name, input_tokens, output_tokens) if usage else 0.0
+        with self._lock:
+            self.steps += 1 if step else 0
+            self.input_tokens += input_tokens
+            self.output_tokens += output_tokens
+            self.cost_usd += cost
+
+    def exceeded(self, before_llm_call: bool = True) -> Optional[str]:
+        """Return the reason code of the first exhausted limit, or None.
+
+        The step limit only applies before an LLM call; tool calls requested by
+        the last permitted step are still executed.
+        """
+        budget = self.budget
+        if before_llm_call and budget.max_steps is not None and self.steps >= budget.max_steps:
+            return StopReason.MAX_STEPS
+        if budget.max_tokens is not None and self.input_tokens + self.output_tokens >= budget.max_tokens:
+            return StopReason.MAX_TOKENS
+        if budget.max_cost_usd is not None and self.cost_usd >= budget.max_cost_usd:
+            return StopReason.MAX_COST
+        if budget.max_seconds is not None and self.elapsed() >= budget.max_seconds:
+            return StopReason.DEADLINE
+        return None
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Summarize consumption for API responses."""
+        return {
+            'steps': self.steps,
+            'input_tokens': self.input_tokens,
+            'output_tokens': self.output_tokens,
+            'cost_usd': round(self.cost_usd, 6),
+            'elapsed_seconds': round(self.elapsed(), 3),
+            'budget': self.budget.to_dict(),
+        }
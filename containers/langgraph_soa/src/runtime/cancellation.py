@@ -0,0 +1,105 @@
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+class RunCancelled(Exception):
+    """Raised inside a run once it has been cancelled."""
+
+class CancellationToken:
+    """Cooperative cancellation signal for one run.
+
+    Graph nodes, LLM streams and tool requests check the token at safe points.
+    Callbacks let blocking operations (e.g. a running command) be interrupted
+    as soon as the run is cancelled.
+    """
+
+    def __init__(self):
+        self.reason: Optional[str] = None
+        self._event = threading.Event()
+        self._callbacks: List[Callable[[str], None]] = []
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self, reason: str = "cancelled") -> None:
+        """Cancel the run and fire the registered callbacks once."""
+        with self._lock:
+            if self._event.is_set():
+                return
+            self.reason = reason
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+
+        logger.info("Run cancelled: %s", reason)
+        for callback in callbacks:
+            try:
+                callback(reason)
+            except Exception as e:
+                logger.error("Error in cancellation callback: %s", e)
+
+    def raise_if_cancelled(self) -> None:
+        """Raise RunCancelled if the run has been cancelled."""
+        if self._event.is_set():
+            raise RunCancelled(self.reason)
+
+    def add_callback(self, callback: Callable[[str], None]) -> Callable[[], None]:
+        """Call ``callback(reason)`` on cancellation, immediately if already cancelled.
+
+        Returns:
+            A function that unregisters the callback
+        """
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return lambda: self._remove_callback(callback)
+        callback(self.reason)
+        return lambda: None
+
+    def _remove_callback(self, callback: Callable[[str], None]) -> None:
+        with self._lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+
+class CancellationRegistry:
+    """Tokens of the queued and running runs, by session."""
+
+    def __init__(self):
+        self._tokens: Dict[str, List[CancellationToken]] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def register(self, session_id: str, token: CancellationToken) -> Iterator[CancellationToken]:
+        """Make the token cancellable through cancel_session for the enclosed block."""
+        with self._lock:
+            self._tokens.setdefault(session_id, []).append(token)
+        try:
+            yield token
+        finally:
+            with self._lock:
+                tokens = self._tokens.get(session_id, [])
+                if token in tokens:
+                    tokens.remove(token)
+                if not tokens:
+                    self._tokens.pop(session_id, None)
+
+    def has_runs(self, session_id: str) -> bool:
+        """Whether the session has queued or running runs."""
+        with self._lock:
+            return bool(self._tokens.get(session_id))
+
+    def cancel_session(self, session_id: str, reason: str = "cancelled") -> int:
+        """Cancel every queued and running run of a session.
+
+        Returns:
+            Number of runs cancelled
+        """
+        with self._lock:
+            tokens = [token for token in self._tokens.get(session_id, []) if not token.cancelled]
+        for token in tokens:
+            token.cancel(reason)
+        return len(tokens)
@@ -0,0 +1,144 @@
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+import gzip
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+class CassetteMode:
+    """Modes of a cassette."""
+    RECORD = "record"
+    REPLAY = "replay"
+
+class CassetteMiss(LookupError):
+    """Raised in replay mode for a request that is not on the cassette."""
+
+def request_key(kind: str, request: Dict[str, Any]) -> str:
+    """Hash a request in a canonical form, independent of key order and whitespace."""
+    canonical = json.dumps({"kind": kind, "request": request}, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode()).hexdigest()[:32]
+
+class Cassette:
+    """Recorded LLM and dev_container traffic of agent sessions.
+
+    In record mode every interaction is appended to the file as one JSON line
+    (gzip-compressed if the path ends in ``.gz``) holding the hash of the
+    request, the response and its timing. Only the hash of a request is
+    stored, which keeps cassettes of long sessions small.
+
+    In replay mode responses are served from the file. Identical requests get
+    their recorded responses in order, and the last one once they run out
+    (e.g. a file read repeatedly after its final write). With ``timing`` set
+    to "original" each response takes as long as it did when recorded,
+    otherwise it is returned immediately.
+    """
+
+    def __init__(self, path: str, mode: str, timing: str = "fast"):
+        if mode not in (CassetteMode.RECORD, CassetteMode.REPLAY):
+            raise ValueError(f"Unknown cassette mode: {mode}")
+        if timing not in ("fast", "original"):
+            raise ValueError(f"Unknown cassette timing: {timing}")
+        self.path = path
+        self.mode = mode
+        self.timing = timing
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Deque[Dict[str, Any]]] = {}
+        self._file = None
+        if mode == CassetteMode.REPLAY:
+            self._load()
+        else:
+            self._file = gzip.open(path, "wt", encoding="utf-8") if path.endswith(".gz") else open(path, "w", encoding="utf-8")
+
+    @classmethod
+    def from_env(cls) -> Optional['Cassette']:
+        """Create the cassette configured by CASSETTE_MODE, or None if it is not set.
+
+        Configured from the environment:
+            CASSETTE_MODE: "record" or "replay"
+            CASSETTE_PATH: Cassette file (default cassette.jsonl.gz)
+            CASSETTE_TIMING: "fast" (default) or "original", for replay
+        """
+        mode = os.getenv("CASSETTE_MODE")
+        if not mode:
+            return None
+        return cls(
+            os.getenv("CASSETTE_PATH", "cassette.jsonl.gz"),
+            mode,
+            timing=os.getenv("CASSETTE_TIMING", "fast"),
+        )
+
+    @property
+    def replaying(self) -> bool:
+        return self.mode == CassetteMode.REPLAY
+
+    def record(self, kind: str, request: Dict[str, Any], response: Any, duration: float, summary: str = "", **timing: Any) -> None:
+        """Append one interaction to the cassette.
+
+        Args:
+            kind: Kind of traffic, "llm" or "http"
+            request: Request in canonical form; only its hash is stored
+            response: JSON-serializable response
+            duration: Seconds the request took
+            summary: Short human-readable description, e.g. "GET /files/app.py"
+            **timing: Further timings to reproduce on replay, e.g. first_token
+        """
+        entry = {"kind": kind, "key": request_key(kind, request), "summary": summary, "duration": round(duration, 6), **timing, "response": response}
+        line = json.dumps(entry, separators=(",", ":"), default=str)
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+
+    def play(self, kind: str, request: Dict[str, Any]) -> Dict[str, Any]:
+        """Get the recorded interaction for a request.
+
+        Raises:
+            CassetteMiss: If the request was not recorded
+        """
+        key = request_key(kind, request)
+        with self._lock:
+            entries = self._entries.get(key)
+            if not entries:
+                raise CassetteMiss(f"No recorded {kind} response for request {key}")
+            return entries.popleft() if len(entries) > 1 else entries[0]
+
+    def wait(self, seconds: Optional[float]) -> None:
+        """Reproduce a recorded delay if replaying with the original timings."""
+        if self.timing == "original" and seconds and seconds > 0:
+            time.sleep(seconds)
+
+    def close(self) -> None:
+        """Flush and close the file of a recording."""
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def _load(self) -> None:
+        opener = gzip.open if self.path.endswith(".gz") else open
+        count = 0
+        with opener(self.path, "rt", encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                entry = json.loads(line)
+                self._entries.setdefault(entry["key"], deque()).append(entry)
+                count += 1
+        logger.info("Loaded %s recorded interactions from %s", count, self.path)
+
+_cassette: Optional[Cassette] = None
+_cassette_loaded = False
+_cassette_lock = threading.Lock()
+
+def get_cassette() -> Optional[Cassette]:
+    """Get the process-wide cassette configured in the environment, if any."""
+    global _cassette, _cassette_loaded
+    with _cassette_lock:
+        if not _cassette_loaded:
+            _cassette = Cassette.from_env()
+            _cassette_loaded = True
+        return _cassette
@@ -0,0 +1,121 @@
+from collections import deque
+from typing import Deque
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+class CircuitState:
+    """States of a circuit breaker."""
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+class CircuitOpen(Exception):
+    """Raised instead of calling a dependency whose circuit is open."""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class CircuitBreaker:
+    """Stops calling a failing dependency until it recovers.
+
+    The breaker opens when at least ``failure_rate`` of the last ``window``
+    calls (and at least ``min_calls``) failed or took longer than
+    ``slow_call_seconds``. While open, calls fail fast. After ``open_seconds``
+    a single caller is allowed to probe the dependency: success closes the
+    circuit, failure opens it again for twice as long, up to
+    ``max_open_seconds``.
+    """
+
+    def __init__(
+        self,
+        name: str = "dependency",
+        window: int = 20,
+        min_calls: int = 5,
+        failure_rate: float = 0.5,
+        slow_call_seconds: float = 30.0,
+        open_seconds: float = 5.0,
+        max_open_seconds: float = 60.0,
+    ):
+        self.name = name
+        self.window = window
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.open_seconds = open_seconds
+        self.max_open_seconds = max_open_seconds
+        self.state = CircuitState.CLOSED
+        self._outcomes: Deque[bool] = deque(maxlen=window)
+        self._opened_at = 0.0
+        self._open_for = open_seconds
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, prefix: str, name: str) -> 'CircuitBreaker':
+        """Create a breaker configured from ``{prefix}_*`` environment variables."""
+        return cls(
+            name=name,
+            window=int(os.getenv(f"{prefix}_WINDOW", "20")),
+            min_calls=int(os.getenv(f"{prefix}_MIN_CALLS", "5")),
+            failure_rate=float(os.getenv(f"{prefix}_FAILURE_RATE", "0.5")),
+            slow_call_seconds=float(os.getenv(f"{prefix}_SLOW_CALL_SECONDS", "30")),
+            open_seconds=float(os.getenv(f"{prefix}_OPEN_SECONDS", "5")),
+            max_open_seconds=float(os.getenv(f"{prefix}_MAX_OPEN_SECONDS", "60")),
+        )
+
+    def before_call(self) -> bool:
+        """Check whether a call may go ahead.
+
+        Returns:
+            True if the caller must probe the dependency and report the result
+            with ``probe_finished`` before calling it, False to call directly
+
+        Raises:
+            CircuitOpen: If the circuit is open or another caller is probing
+        """
+        with self._lock:
+            if self.state == CircuitState.CLOSED:
+                return False
+            remaining = self._opened_at + self._open_for - time.monotonic()
+            if self.state == CircuitState.OPEN and remaining <= 0:
+                self.state = CircuitState.HALF_OPEN
+                return True
+            raise CircuitOpen(f"circuit of {self.name} is open", max(remaining, 1.0))
+
+    def retry_after(self) -> float:
+        """Seconds until the circuit lets a probe through, 0 when closed."""
+        with self._lock:
+            if self.state == CircuitState.CLOSED:
+                return 0.0
+            return max(self._opened_at + self._open_for - time.monotonic(), 1.0)
+
+    def probe_finished(self, healthy: bool) -> None:
+        """Close the circuit after a successful probe, or open it again for longer."""
+        with self._lock:
+            if healthy:
+                logger.info("Circuit of %s closed", self.name)
+                self.state = CircuitState.CLOSED
+                self._outcomes.clear()
+                self._open_for = self.open_seconds
+            else:
+                self._open_for = min(self._open_for * 2, self.max_open_seconds)
+                self._open()
+
+    def record(self, failed: bool, duration: float) -> None:
+        """Record the outcome of a call, opening the circuit if too many failed."""
+        with self._lock:
+            self._outcomes.append(failed or duration > self.slow_call_seconds)
+            if self.state != CircuitState.CLOSED or len(self._outcomes) < self.min_calls:
+                return
+            if sum(self._outcomes) / len(self._outcomes) >= self.failure_rate:
+                self._open()
+
+    def _open(self) -> None:
+        logger.warning("Circuit of %s opened for %.0fs", self.name, self._open_for)
+        self.state = CircuitState.OPEN
+        self._opened_at = time.monotonic()
+        self._outcomes.clear()
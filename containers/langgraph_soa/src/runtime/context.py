@@ -0,0 +1,63 @@
+from concurrent.futures import Future
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Dict, Iterator, Optional
+
+from .budget import BudgetTracker
+from .cancellation import CancellationToken
+from .scheduler import ConcurrencySlots
+from src.observability.profiler import SamplingProfiler
+from src.observability.tracing import Tracer
+
+if TYPE_CHECKING:
+    from src.config.llm_config import LLMConfig
+
+@dataclass
+class RunContext:
+    """Per-run state shared by graph nodes, LLM adapters and tools.
+
+    Unlike AgentState it is never part of the graph state, so it can hold
+    live objects such as trackers and locks.
+    """
+    budget: BudgetTracker = field(default_factory=BudgetTracker)
+    # Process-wide LLM/tool concurrency limits; unlimited unless the scheduler provides them
+    slots: ConcurrencySlots = field(default_factory=ConcurrencySlots)
+    cancellation: CancellationToken = field(default_factory=CancellationToken)
+    tracer: Tracer = field(default_factory=Tracer)
+    # Only set for runs profiled on request
+    profiler: Optional[SamplingProfiler] = None
+    # Dev_container serving this run, instead of the tools' default address
+    dev_container_url: Optional[str] = None
+    # Model chosen by the run's session or request; None uses the agent's default
+    llm_config: Optional['LLMConfig'] = None
+    # How tools render their results, "json" or "compact"; runs use their provider's format
+    tool_result_format: str = "json"
+    # Whether LLM responses may be served from and stored in the response cache
+    llm_cache: bool = True
+    # Whether the request may be split into parallel subtasks; None uses the agent's default
+    fan_out: Optional[bool] = None
+    # Read-only tool calls started while the model was still streaming, by tool call id
+    speculative_tool_results: Dict[str, Future] = field(default_factory=dict)
+
+_current_run_context: ContextVar[Optional[RunContext]] = ContextVar("rose_run_context", default=None)
+
+def get_run_context() -> RunContext:
+    """Get the context of the active run.
+
+    Outside of AgentGraph.run (e.g. when LangGraph Studio invokes the graph
+    directly) an unrestricted context is returned.
+    """
+    context = _current_run_context.get()
+    if context is None:
+        return RunContext()
+    return context
+
+@contextmanager
+def use_run_context(context: RunContext) -> Iterator[RunContext]:
+    """Make the given context the active run context for the enclosed block."""
+    token = _current_run_context.set(context)
+    try:
+        yield context
+    finally:
+        _current_run_context.reset(token)
@@ -0,0 +1,301 @@
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import dataclass, field
+from typing import AsyncIterator, Callable, Deque, Dict, Iterator, List, Optional
+import asyncio
+import itertools
+import logging
+import math
+import os
+import threading
+import time
+
+from .cancellation import CancellationToken, RunCancelled
+
+logger = logging.getLogger(__name__)
+
+class Lane:
+    """Priority lanes for queued runs."""
+    INTERACTIVE = "interactive"
+    BATCH = "batch"
+
+    ALL = (INTERACTIVE, BATCH)
+
+class SchedulerOverloaded(Exception):
+    """Raised when a run is shed because the scheduler is saturated."""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class ConcurrencySlots:
+    """Process-wide limits on concurrent LLM and tool calls.
+
+    Acquired from the worker threads that execute graph nodes, so these are
+    thread semaphores rather than asyncio primitives.
+    """
+
+    def __init__(self, limits: Optional[Dict[str, Optional[int]]] = None):
+        self.limits = dict(limits or {})
+        self._semaphores = {
+            kind: threading.BoundedSemaphore(limit)
+            for kind, limit in self.limits.items() if limit
+        }
+        self._in_use = {kind: 0 for kind in self._semaphores}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def acquire(self, kind: str) -> Iterator[None]:
+        """Hold one slot of the given kind ("llm" or "tool") for the enclosed block."""
+        semaphore = self._semaphores.get(kind)
+        if semaphore is None:
+            yield
+            return
+
+        with semaphore:
+            with self._lock:
+                self._in_use[kind] += 1
+            try:
+                yield
+            finally:
+                with self._lock:
+                    self._in_use[kind] -= 1
+
+    def in_use(self) -> Dict[str, int]:
+        """Number of slots currently held, by kind."""
+        with self._lock:
+            return dict(self._in_use)
+
+@dataclass
+class _Ticket:
+    """A run waiting for admission."""
+    session_id: str
+    tenant: str
+    lane: str
+    seq: int
+    virtual_start: float
+    virtual_finish: float
+    enqueued_at: float = field(default_factory=time.monotonic)
+    granted: asyncio.Future = None
+
+class RunScheduler:
+    """Admission control and fair scheduling for agent runs.
+
+    - Runs of one session execute one at a time, in arrival order.
+    - At most ``max_concurrent_runs`` runs execute at once; batch runs may use
+      at most ``max_batch_runs`` of them so interactive work keeps headroom.
+    - Interactive runs are always dispatched before batch runs. Within a lane,
+      tenants share capacity by weighted fair queuing (start-time fair queuing
+      over virtual time).
+    - When the queue is full new runs are rejected with a Retry-After estimate
+      instead of piling up.
+    - LLM and tool calls are limited process-wide, and LLM calls optionally
+      per provider (``provider_slots``) to stay within each provider's quota.
+    """
+
+    def __init__(
+        self,
+        max_concurrent_runs: int = 8,
+        max_batch_runs: Optional[int] = None,
+        max_queue_depth: int = 64,
+        max_session_queue: int = 4,
+        llm_slots: Optional[int] = 8,
+        tool_slots: Optional[int] = 16,
+        tenant_weights: Optional[Dict[str, float]] = None,
+        provider_slots: Optional[Dict[str, int]] = None,
+    ):
+        self.max_concurrent_runs = max_concurrent_runs
+        self.max_batch_runs = max_batch_runs if max_batch_runs is not None else max(1, max_concurrent_runs // 2)
+        self.max_queue_depth = max_queue_depth
+        self.max_session_queue = max_session_queue
+        self.tenant_weights = tenant_weights or {}
+        self.slots = ConcurrencySlots({
+            "llm": llm_slots,
+            "tool": tool_slots,
+            **{f"llm:{provider}": limit for provider, limit in (provider_slots or {}).items()},
+        })
+
+        self._session_queues: Dict[str, Deque[_Ticket]] = {}
+        self._running_sessions: Dict[str, _Ticket] = {}
+        self._running_by_lane = {lane: 0 for lane in Lane.ALL}
+        self._tenant_finish: Dict[str, float] = {}
+        self._virtual_time = 0.0
+        self._seq = itertools.count()
+        self._avg_run_seconds = 10.0
+
+    @classmethod
+    def from_env(cls) -> 'RunScheduler':
+        """Create a scheduler configured from SCHEDULER_* environment variables."""
+        weights = {}
+        for item in filter(None, os.getenv("SCHEDULER_TENANT_WEIGHTS", "").split(",")):
+            tenant, weight = item.split("=", 1)
+            weights[tenant.strip()] = float(weight)
+        provider_slots = {}
+        for item in filter(None, os.getenv("SCHEDULER_PROVIDER_SLOTS", "").split(",")):
+            provider, limit = item.split("=", 1)
+            provider_slots[provider.strip()] = int(limit)
+
+        max_batch_runs = os.getenv("SCHEDULER_MAX_BATCH_RUNS")
+        return cls(
+            max_concurrent_runs=int(os.getenv("SCHEDULER_MAX_CONCURRENT_RUNS", "8")),
+            max_batch_runs=int(max_batch_runs) if max_batch_runs else None,
+            max_queue_depth=int(os.getenv("SCHEDULER_MAX_QUEUE_DEPTH", "64")),
+            max_session_queue=int(os.getenv("SCHEDULER_MAX_SESSION_QUEUE", "4")),
+            llm_slots=int(os.getenv("SCHEDULER_LLM_SLOTS", "8")) or None,
+            tool_slots=int(os.getenv("SCHEDULER_TOOL_SLOTS", "16")) or None,
+            tenant_weights=weights,
+            provider_slots=provider_slots,
+        )
+
+    @asynccontextmanager
+    async def admit(
+        self,
+        session_id: str,
+        tenant: str = "default",
+        lane: str = Lane.INTERACTIVE,
+        cancellation: Optional[CancellationToken] = None,
+    ) -> AsyncIterator[None]:
+        """Wait for permission to run, and hold it for the enclosed block.
+
+        Args:
+            session_id: Session of the run
+            tenant: Tenant whose share of capacity the run uses
+            lane: Priority lane of the run
+            cancellation: Token of the run; cancelling it while the run is
+                queued gives up its place in the queue
+
+        Raises:
+            ValueError: If the lane is unknown
+            SchedulerOverloaded: If the run is shed
+            RunCancelled: If the run is cancelled before it is admitted
+        """
+        if cancellation:
+            cancellation.raise_if_cancelled()
+        ticket = self._enqueue(session_id, tenant, lane)
+        unregister = cancellation.add_callback(self._canceller(ticket)) if cancellation else None
+        try:
+            await ticket.granted
+        except (asyncio.CancelledError, RunCancelled):
+            # The client went away or the run was cancelled while waiting
+            granted = ticket.granted
+            if granted.done() and not granted.cancelled() and granted.exception() is None:
+                self._finish(ticket, time.monotonic())
+            else:
+                self._remove_waiting(ticket)
+            raise
+        finally:
+            if unregister:
+                unregister()
+
+        started_at = time.monotonic()
+        logger.debug("Admitted run for session %s after %.3fs in queue", session_id, started_at - ticket.enqueued_at)
+        try:
+            yield
+        finally:
+            self._finish(ticket, started_at)
+
+    def queue_depth(self) -> int:
+        """Number of runs waiting for admission."""
+        return sum(len(queue) for queue in self._session_queues.values()) - len(self._running_sessions)
+
+    def stats(self) -> Dict[str, object]:
+        """Snapshot of the scheduler state."""
+        return {
+            'running': dict(self._running_by_lane),
+            'queued': self.queue_depth(),
+            'active_sessions': len(self._session_queues),
+            'slots_in_use': self.slots.in_use(),
+            'avg_run_seconds': round(self._avg_run_seconds, 3),
+        }
+
+    def _enqueue(self, session_id: str, tenant: str, lane: str) -> _Ticket:
+        """Queue a run or shed it if the scheduler is saturated."""
+        if lane not in Lane.ALL:
+            raise ValueError(f"Unknown priority lane: {lane}")
+
+        session_queue = self._session_queues.get(session_id)
+        if self.queue_depth() >= self.max_queue_depth:
+            raise SchedulerOverloaded("Too many queued runs", self._retry_after())
+        if session_queue and len(session_queue) >= self.max_session_queue:
+            raise SchedulerOverloaded(f"Too many queued runs for session {session_id}", self._retry_after())
+
+        weight = self.tenant_weights.get(tenant, 1.0)
+        virtual_start = max(self._virtual_time, self._tenant_finish.get(tenant, 0.0))
+        ticket = _Ticket(
+            session_id=session_id,
+            tenant=tenant,
+            lane=lane,
+            seq=next(self._seq),
+            virtual_start=virtual_start,
+            virtual_finish=virtual_start + 1.0 / weight,
+            granted=asyncio.get_running_loop().create_future(),
+        )
+        self._tenant_finish[tenant] = ticket.virtual_finish
+        self._session_queues.setdefault(session_id, deque()).append(ticket)
+        self._dispatch()
+        return ticket
+
+    def _canceller(self, ticket: _Ticket) -> Callable[[str], None]:
+        """Callback failing a ticket's wait when its run is cancelled, from any thread."""
+        loop = ticket.granted.get_loop()
+
+        def fail(reason: str) -> None:
+            if not ticket.granted.done():
+                ticket.granted.set_exception(RunCancelled(reason))
+                # Out of the queue at once, so it is never granted
+                self._remove_waiting(ticket)
+                self._dispatch()
+
+        return lambda reason: loop.call_soon_threadsafe(fail, reason)
+
+    def _dispatch(self) -> None:
+        """Grant admission to waiting runs while capacity allows."""
+        while sum(self._running_by_lane.values()) < self.max_concurrent_runs:
+            ticket = self._next_ticket()
+            if ticket is None:
+                return
+            self._running_sessions[ticket.session_id] = ticket
+            self._running_by_lane[ticket.lane] += 1
+            self._virtual_time = max(self._virtual_time, ticket.virtual_start)
+            ticket.granted.set_result(None)
+
+    def _next_ticket(self) -> Optional[_Ticket]:
+        """Pick the next run: interactive first, then by virtual finish time."""
+        candidates: List[_Ticket] = []
+        for session_id, queue in self._session_queues.items():
+            if session_id in self._running_sessions or not queue:
+                continue
+            head = queue[0]
+            if head.lane == Lane.BATCH and self._running_by_lane[Lane.BATCH] >= self.max_batch_runs:
+                continue
+            candidates.append(head)
+
+        if not candidates:
+            return None
+        return min(candidates, key=lambda t: (t.lane != Lane.INTERACTIVE, t.virtual_finish, t.seq))
+
+    def _finish(self, ticket: _Ticket, started_at: float) -> None:
+        """Release the capacity held by a run and admit the next ones."""
+        duration = time.monotonic() - started_at
+        self._avg_run_seconds = 0.8 * self._avg_run_seconds + 0.2 * duration
+        self._running_sessions.pop(ticket.session_id, None)
+        self._running_by_lane[ticket.lane] -= 1
+        self._remove_waiting(ticket)
+        self._dispatch()
+
+    def _remove_waiting(self, ticket: _Ticket) -> None:
+        """Drop a ticket from its session queue."""
+        queue = self._session_queues.get(ticket.session_id)
+        if queue is None:
+            return
+        try:
+            queue.remove(ticket)
+        except ValueError:
+            pass
+        if not queue:
+            del self._session_queues[ticket.session_id]
+
+    def _retry_after(self) -> int:
+        """Estimate in seconds when capacity is likely to be available again."""
+        backlog = self.queue_depth() + 1
+        return max(1, math.ceil(self._avg_run_seconds * backlog / self.max_concurrent_runs))
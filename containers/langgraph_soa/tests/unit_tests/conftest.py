@@ -0,0 +1,65 @@
+import functools
+import os
+
+# src.agent.graph builds a default agent at import time; keep it offline and in memory
+os.environ.setdefault("ANTHROPIC_API_KEY", "test-key")
+os.environ.setdefault("CHECKPOINT_URL", "memory")
+
+import pytest
+from langchain_core.messages import AIMessage, BaseMessage
+
+from src.agent.graph import AgentGraph
+from src.config.llm_config import LLMConfig
+from src.llm.base import BaseLLM
+from src.llm.factory import LLMFactory
+
+
+class FakeLLM(BaseLLM):
+    """Follows a script, one step per call; the last step repeats.
+
+    A step is the name of a tool to request, a message to return, an
+    exception to raise, or a callable taking the model and ``on_tool_call``
+    and returning the message, e.g. by streaming it through ``_collect_stream``.
+    """
+
+    def __init__(self, steps, model_name: str = "fake", temperature: float = 0.0):
+        self.steps = list(steps)
+        self.model_name = model_name
+        self.calls = 0
+
+    def initialize(self) -> None:
+        pass
+
+    def invoke(self, messages, tools=None, on_tool_call=None) -> BaseMessage:
+        self.calls += 1
+        step = self.steps[min(self.calls, len(self.steps)) - 1]
+        if isinstance(step, str):
+            return AIMessage(
+                content="",
+                additional_kwargs={"tool_calls": [{
+                    "id": f"call_{self.calls}",
+                    "name": step,
+                    "function": {"name": step, "arguments": "{}"},
+                }]},
+                usage_metadata={"input_tokens": 100, "output_tokens": 10, "total_tokens": 110},
+            )
+        if isinstance(step, BaseException):
+            raise step
+        if callable(step):
+            return step(self, on_tool_call)
+        return step
+
+    def get_model_name(self) -> str:
+        return self.model_name
+
+
+@pytest.fixture
+def fake_graph(monkeypatch):
+    """Build an AgentGraph whose model follows the given steps (see FakeLLM).
+
+    The model is registered as LLM type "fake" for the duration of the test.
+    """
+    def build(*steps, model_name: str = "fake", **kwargs) -> AgentGraph:
+        monkeypatch.setitem(LLMFactory._llm_registry, "fake", functools.partial(FakeLLM, steps))
+        return AgentGraph(LLMConfig(llm_type="fake", model_name=model_name, temperature=0.0), **kwargs)
+    return build
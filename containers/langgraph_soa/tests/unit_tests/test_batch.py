@@ -0,0 +1,62 @@
+import asyncio
+import json
+
+import pytest
+
+from src.runtime.batch import BatchManager, parse_tasks
+
+
+def test_parse_tasks_fills_defaults_and_rejects_bad_lines() -> None:
+    tasks = parse_tasks('{"input": "a"}\n\n{"input": "b", "task_id": "x", "workspace": "http://dev-2:8080/"}\n', "b1")
+    assert [(t.task_id, t.session_id, t.workspace) for t in tasks] == [
+        ("task-1", "batch-b1-task-1", None),
+        ("x", "batch-b1-x", "http://dev-2:8080"),
+    ]
+
+    with pytest.raises(ValueError, match="line 2"):
+        parse_tasks('{"input": "a"}\n{"prompt": "b"}', "b1")
+    with pytest.raises(ValueError, match="unique"):
+        parse_tasks('{"input": "a", "task_id": "t"}\n{"input": "b", "task_id": "t"}', "b1")
+
+
+def test_batches_run_with_bounded_parallelism_and_resume(tmp_path) -> None:
+    payload = "\n".join(json.dumps({"input": f"task {i}"}) for i in range(6))
+    running, peak, attempts = 0, 0, []
+
+    async def execute(batch, task, token):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        attempts.append(task.task_id)
+        await asyncio.sleep(0.01)
+        running -= 1
+        if task.task_id == "task-3" and attempts.count("task-3") == 1:
+            raise RuntimeError("flaky")
+        return {"response": task.input.upper()}
+
+    async def scenario():
+        manager = BatchManager(str(tmp_path), max_workers=2)
+        batch = manager.create(payload, max_workers=8)
+        assert batch.max_workers == 2
+        manager.start(batch, execute)
+        with pytest.raises(ValueError):
+            manager.start(batch, execute)
+        await batch._runner
+        assert batch.summary()["results"] == {"completed": 5, "failed": 1}
+
+        # A fresh manager, as after a restart, only reruns the failed task
+        restarted = BatchManager(str(tmp_path), max_workers=2)
+        reloaded = restarted.get(batch.batch_id)
+        assert reloaded.status == "interrupted"
+        restarted.start(reloaded, execute)
+        await reloaded._runner
+        return reloaded
+
+    batch = asyncio.run(scenario())
+    assert peak == 2
+    assert attempts.count("task-3") == 2 and len(attempts) == 7
+    assert batch.status == "completed" and batch.pending_tasks() == []
+    with open(batch.results_path) as f:
+        lines = [json.loads(line) for line in f]
+    assert len(lines) == 7
+    assert lines[-1]["task_id"] == "task-3" and lines[-1]["response"] == "TASK 2"
@@ -0,0 +1,36 @@
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+from benchmarks.agent_loop import compare, measure_loop
+from benchmarks.fakes import DevContainerStub, ScriptedLLM
+
+
+def test_scripted_session_runs_against_the_stub() -> None:
+    with DevContainerStub() as stub:
+        result = measure_loop(6, stub)
+
+    assert set(result["metrics"]) == {"us_per_step", "overhead_us_per_step"}
+    assert result["messages"][-1].content == "Done after 6 steps."
+    # Two write/read/execute cycles
+    assert set(stub.files) == {"src/module_0.py", "src/module_1.py"}
+
+
+def test_compare_reports_only_regressions_beyond_tolerance() -> None:
+    baseline = {"steps_100": {"late_early_ratio": 1.2, "kb_per_step": 8.0}}
+    assert compare({"steps_100": {"late_early_ratio": 1.6, "kb_per_step": 10.0}}, baseline) == []
+
+    regressions = compare({"steps_100": {"late_early_ratio": 1.9, "kb_per_step": 10.0}, "steps_10": {"kb_per_step": 1.0}}, baseline)
+    assert len(regressions) == 1 and regressions[0].startswith("steps_100.late_early_ratio")
+
+    # Growth beyond the absolute limits is a regression even if the baseline recorded it
+    baseline = {"steps_500": {"late_early_ratio": 2.8, "kb_per_step": 350.0}}
+    regressions = compare({"steps_500": {"late_early_ratio": 2.8, "kb_per_step": 350.0}}, baseline)
+    assert [regression.split(":")[0] for regression in regressions] == ["steps_500.late_early_ratio", "steps_500.kb_per_step"]
+
+
+def test_scripted_llm_takes_steps_from_the_prompt() -> None:
+    llm = ScriptedLLM()
+    messages = [AIMessage(content="Done after 3 steps."), HumanMessage(content="Next task [steps=1]")]
+    first = llm.invoke(messages)
+    assert first.additional_kwargs["tool_calls"][0]["id"] == "call_1"
+    tool_result = ToolMessage(content="ok", tool_call_id="call_1")
+    assert llm.invoke(messages + [first, tool_result]).content == "Done after 1 steps."
@@ -0,0 +1,87 @@
+import time
+
+import pytest
+import requests
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage, ToolMessage
+
+from benchmarks.fakes import DevContainerStub
+from src.runtime.budget import BudgetTracker, ExecutionBudget, StopReason
+from src.runtime.context import RunContext, use_run_context
+from tools.dev_container_client import DevContainerClient, Timeouts
+
+
+def _run(fake_graph, budget: ExecutionBudget, model_name: str = "fake"):
+    # Requests an unknown tool forever, like a confused model would
+    graph = fake_graph("missing_tool", model_name=model_name)
+    state = {"messages": [HumanMessage(content="hi")], "chat_history": [], "session_id": "s"}
+    return graph, graph.run(state, budget=budget)
+
+
+def test_budget_merged_validates_overrides() -> None:
+    budget = ExecutionBudget().merged({"max_steps": 3, "max_cost_usd": None})
+    assert budget.max_steps == 3
+    assert budget.max_cost_usd is None
+    with pytest.raises(ValueError):
+        ExecutionBudget().merged({"max_steps": 0})
+    with pytest.raises(ValueError):
+        ExecutionBudget().merged({"max_hops": 3})
+
+
+def test_tracker_reports_first_exhausted_limit() -> None:
+    tracker = BudgetTracker(ExecutionBudget(max_steps=2, max_tokens=150, max_seconds=None))
+    tracker.record_llm_call("unknown-model", {"input_tokens": 100, "output_tokens": 10})
+    assert tracker.exceeded() is None
+    tracker.record_llm_call("unknown-model", {"input_tokens": 30, "output_tokens": 10})
+    assert tracker.exceeded() == StopReason.MAX_STEPS
+    assert tracker.exceeded(before_llm_call=False) == StopReason.MAX_TOKENS
+
+
+def test_run_stops_at_step_limit_with_partial_progress(fake_graph) -> None:
+    graph, result = _run(fake_graph, ExecutionBudget(max_steps=3, max_seconds=None))
+    assert result["stop_reason"] == StopReason.MAX_STEPS
+    assert result["usage"]["steps"] == 3
+    assert graph.llm.calls == 3
+    # Nodes return deltas, so every tool round appears exactly once
+    assert sum(isinstance(m, ToolMessage) for m in result["messages"]) == 3
+    assert isinstance(result["messages"][-1], AIMessage)
+
+
+def test_run_stops_at_token_limit(fake_graph) -> None:
+    _, result = _run(fake_graph, ExecutionBudget(max_steps=None, max_tokens=200, max_seconds=None))
+    assert result["stop_reason"] == StopReason.MAX_TOKENS
+    assert result["usage"]["input_tokens"] + result["usage"]["output_tokens"] >= 200
+
+
+def test_run_stops_at_cost_limit(fake_graph) -> None:
+    # Each call costs $0.00012 at claude-3-5-haiku prices
+    graph, result = _run(fake_graph, ExecutionBudget(max_steps=None, max_cost_usd=0.0003, max_seconds=None), model_name="claude-3-5-haiku-20241022")
+    assert result["stop_reason"] == StopReason.MAX_COST
+    assert graph.llm.calls == 3 and result["usage"]["cost_usd"] >= 0.0003
+
+
+def test_deadline_stops_a_slow_stream(fake_graph) -> None:
+    streamed = []
+
+    def answer():
+        for i in range(100):
+            streamed.append(i)
+            time.sleep(0.05)
+            yield AIMessageChunk(content=f"token{i} ")
+
+    graph = fake_graph(lambda llm, on_tool_call: llm._collect_stream(answer(), on_tool_call))
+    state = {"messages": [HumanMessage(content="hi")], "chat_history": [], "session_id": "s"}
+    result = graph.run(state, budget=ExecutionBudget(max_seconds=0.2))
+    assert result["stop_reason"] == StopReason.DEADLINE
+    assert len(streamed) < 10
+
+
+def test_tool_requests_time_out_at_the_deadline() -> None:
+    client = DevContainerClient(timeouts_factory=lambda target: Timeouts(connect=1, read=5, execute=60))
+    context = RunContext(budget=BudgetTracker(ExecutionBudget(max_seconds=0.2)))
+    with DevContainerStub(command_latency=2) as stub, use_run_context(context):
+        started_at = time.monotonic()
+        with pytest.raises(requests.exceptions.Timeout):
+            client.post(f"{stub.url}/execute", json={"command": "sleep", "args": ["2"]})
+        assert time.monotonic() - started_at < 1
+        # The run ran out of time; the dev_container did not fail
+        assert client.health().get(stub.url, {"failures": 0})["failures"] == 0
@@ -0,0 +1,67 @@
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage, ToolMessage
+
+from src.runtime.budget import StopReason
+from src.runtime.cancellation import CancellationToken
+from src.runtime.context import RunContext, get_run_context
+
+
+def _graph(fake_graph):
+    """Requests a tool call, then streams a long answer during which the run is cancelled.
+
+    Returns:
+        The graph and the list of chunks streamed so far
+    """
+    streamed = []
+
+    def answer():
+        for i in range(100):
+            streamed.append(f"token{i} ")
+            if i == 2:
+                get_run_context().cancellation.cancel("test")
+            yield AIMessageChunk(content=streamed[-1])
+
+    graph = fake_graph("unknown_tool", lambda llm, on_tool_call: llm._collect_stream(answer(), on_tool_call))
+    return graph, streamed
+
+
+def test_cancellation_stops_the_stream_and_keeps_history_consistent(fake_graph) -> None:
+    graph, streamed = _graph(fake_graph)
+    state = {"messages": [HumanMessage(content="hi")], "chat_history": [], "session_id": "s"}
+    result = graph.run(state, context=RunContext())
+
+    assert result["stop_reason"] == StopReason.CANCELLED
+    # The stream is abandoned right after the chunk during which the run was cancelled
+    assert len(streamed) == 3
+
+    history = graph.get_chat_history("s").messages
+    tool_call_ids = [tc["id"] for m in history if isinstance(m, AIMessage) for tc in m.additional_kwargs.get("tool_calls", [])]
+    tool_result_ids = [m.tool_call_id for m in history if isinstance(m, ToolMessage)]
+    assert tool_call_ids == tool_result_ids == ["call_1"]
+    assert history[-1].content == "Stopped before completing the task: run cancelled."
+
+
+def test_run_cancelled_before_start_does_not_call_the_model(fake_graph) -> None:
+    graph, _ = _graph(fake_graph)
+    context = RunContext()
+    context.cancellation.cancel("client disconnected")
+    state = {"messages": [HumanMessage(content="hi")], "chat_history": [], "session_id": "s"}
+    result = graph.run(state, context=context)
+
+    assert result["stop_reason"] == StopReason.CANCELLED
+    assert graph.llm.calls == 0
+
+
+def test_callbacks_fire_once_and_can_be_unregistered() -> None:
+    token = CancellationToken()
+    fired = []
+    token.add_callback(fired.append)
+    unregister = token.add_callback(lambda reason: fired.append("unregistered"))
+    unregister()
+
+    token.cancel("first")
+    token.cancel("second")
+    assert fired == ["first"]
+
+    # Registering after cancellation fires immediately
+    token.add_callback(fired.append)
+    assert fired == ["first", "first"]
@@ -0,0 +1,55 @@
+import pytest
+from langchain_core.messages import HumanMessage
+
+from benchmarks.fakes import DevContainerStub
+from src.agent.graph import AgentGraph
+from src.config.llm_config import LLMConfig
+from src.llm.cassette import RecordingLLM, ReplayLLM
+from src.runtime.budget import ExecutionBudget
+from src.runtime.cassette import Cassette, CassetteMiss
+from tools.dev_container_client import dev_container
+
+
+def _run(graph: AgentGraph, base_url: str, prompt: str = "Build it [steps=4]"):
+    graph.speculative_tool_calls = False
+    for tool in graph.tools:
+        tool.base_url = base_url
+    state = {"messages": [HumanMessage(content=prompt)], "chat_history": [], "session_id": "s"}
+    return graph.run(state, budget=ExecutionBudget.unlimited())
+
+
+@pytest.fixture
+def recorded(tmp_path, monkeypatch):
+    path = str(tmp_path / "session.jsonl.gz")
+    cassette = Cassette(path, "record")
+    monkeypatch.setattr(dev_container, "cassette", cassette)
+    graph = AgentGraph(LLMConfig(llm_type="scripted", model_name="scripted", temperature=0.0))
+    graph.llm = RecordingLLM(graph.llm, cassette)
+    with DevContainerStub() as stub:
+        result = _run(graph, stub.url)
+    cassette.close()
+    return path, result
+
+
+def test_replay_reproduces_a_recorded_session_offline(recorded, monkeypatch) -> None:
+    path, original = recorded
+    cassette = Cassette(path, "replay")
+    monkeypatch.setattr(dev_container, "cassette", cassette)
+    graph = AgentGraph(LLMConfig(llm_type="scripted", model_name="scripted", temperature=0.0))
+    graph.llm = ReplayLLM("scripted", cassette)
+
+    # Nothing listens on the discard port; every response comes from the cassette
+    result = _run(graph, "http://127.0.0.1:9")
+    assert [m.content for m in result["messages"]] == [m.content for m in original["messages"]]
+    assert result["messages"][-1].content == "Done after 4 steps."
+
+
+def test_replay_rejects_unrecorded_requests(recorded, monkeypatch) -> None:
+    path, _ = recorded
+    cassette = Cassette(path, "replay")
+    monkeypatch.setattr(dev_container, "cassette", cassette)
+    graph = AgentGraph(LLMConfig(llm_type="scripted", model_name="scripted", temperature=0.0))
+    graph.llm = ReplayLLM("scripted", cassette)
+
+    with pytest.raises(CassetteMiss):
+        _run(graph, "http://127.0.0.1:9", prompt="Something else [steps=4]")
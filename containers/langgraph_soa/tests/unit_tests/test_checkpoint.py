@@ -0,0 +1,85 @@
+import time
+from datetime import datetime, timezone
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.checkpoint.memory import MemorySaver
+
+from src.agent.checkpoint import prune_checkpoints
+from src.agent.graph import AgentGraph, WorkspaceUnknown
+from src.runtime.context import RunContext
+
+
+def _graph(fake_graph, *steps) -> AgentGraph:
+    # Requests one tool call, then fails once before answering
+    steps = steps or ("missing_tool", TimeoutError("provider timed out"), AIMessage(content="done"))
+    return fake_graph(*steps, checkpointer=MemorySaver())
+
+
+def test_resume_continues_without_repeating_completed_steps(fake_graph) -> None:
+    graph = _graph(fake_graph)
+    state = {"messages": [HumanMessage(content="hi")], "chat_history": [], "session_id": "s1"}
+    with pytest.raises(TimeoutError):
+        graph.run(state, run_id="r1")
+    assert graph.llm.calls == 2
+
+    result = graph.resume("s1")
+    assert result["run_id"] == "r1"
+    assert result["messages"][-1].content == "done"
+    # Only the failed call is repeated
+    assert graph.llm.calls == 3
+
+    with pytest.raises(LookupError):
+        graph.resume("s1")
+
+
+def test_resume_stays_on_the_recorded_dev_container(fake_graph) -> None:
+    graph = _graph(fake_graph)
+    state = {"messages": [HumanMessage(content="hi")], "chat_history": [], "session_id": "s3"}
+    with pytest.raises(TimeoutError):
+        graph.run(state, run_id="r1", context=RunContext(dev_container_url="http://dev-1:8030"))
+    assert graph.recorded_workspace("s3") == "http://dev-1:8030"
+
+    context = RunContext(dev_container_url="http://elsewhere:8030")
+    graph.resume("s3", context=context)
+    assert context.dev_container_url == "http://dev-1:8030"
+
+    # Runs checkpointed without a dev_container are not resumed on the default one
+    config = graph._thread_config("s3", "legacy")
+    graph.graph.update_state(config, {"messages": [HumanMessage(content="hi")], "session_id": "s3"}, as_node="__start__")
+    with pytest.raises(WorkspaceUnknown):
+        graph.resume("s3", run_id="legacy")
+
+
+def test_latest_run_is_the_newest_one(fake_graph) -> None:
+    graph = _graph(fake_graph, AIMessage(content="done"))
+    for session_id, run_id in (("a", "r1"), ("b", "r2"), ("a", "r3")):
+        graph.run({"messages": [HumanMessage(content="hi")], "chat_history": [], "session_id": session_id}, run_id=run_id)
+    assert graph.latest_run_id("a") == "r3"
+
+    # After a restart the runs are ordered by checkpoint time
+    restarted = AgentGraph(graph.llm_config, checkpointer=graph.checkpointer)
+    assert restarted.latest_run_id("a") == "r3" and restarted.latest_run_id("b") == "r2"
+    assert restarted.latest_run_id("c") is None
+
+
+def test_prune_removes_expired_threads(fake_graph) -> None:
+    graph = _graph(fake_graph)
+    state = {"messages": [HumanMessage(content="hi")], "chat_history": [], "session_id": "s2"}
+    before = datetime.now(timezone.utc)
+    time.sleep(0.001)
+    with pytest.raises(TimeoutError):
+        graph.run(state, run_id="r1")
+    time.sleep(0.001)
+    between = datetime.now(timezone.utc)
+    time.sleep(0.001)
+    graph.resume("s2")
+    time.sleep(0.001)
+    after = datetime.now(timezone.utc)
+
+    # Started before the cutoff but resumed since
+    assert prune_checkpoints(graph.checkpointer, max_age_hours=0, now=between) == 0
+    assert prune_checkpoints(graph.checkpointer, max_age_hours=0, now=before) == 0
+    assert prune_checkpoints(graph.checkpointer, max_age_hours=24, now=after) == 0
+    assert prune_checkpoints(graph.checkpointer, max_age_hours=0, now=after) == 1
+    assert graph.latest_run_id("s2") is None
@@ -0,0 +1,78 @@
+import json
+
+import pytest
+import requests
+
+from benchmarks.fakes import DevContainerStub
+from src.runtime.circuit_breaker import CircuitBreaker, CircuitOpen, CircuitState
+from tools.agent_tools import FileSystemTool
+from tools.dev_container_client import DevContainerClient, DevContainerUnavailable, Timeouts
+
+
+def test_breaker_opens_on_failure_rate_and_probes_before_closing() -> None:
+    breaker = CircuitBreaker("dev", window=4, min_calls=4, failure_rate=0.5, open_seconds=60, max_open_seconds=300)
+    for failed in (False, True, False, True):
+        assert breaker.before_call() is False
+        breaker.record(failed, duration=0.01)
+    assert breaker.state == CircuitState.OPEN
+    with pytest.raises(CircuitOpen):
+        breaker.before_call()
+
+    breaker._opened_at -= 60
+    assert breaker.before_call() is True
+    # Only the prober goes through while half-open
+    with pytest.raises(CircuitOpen):
+        breaker.before_call()
+    breaker.probe_finished(healthy=False)
+    assert breaker.state == CircuitState.OPEN and breaker.retry_after() > 60
+
+    breaker._opened_at -= 120
+    assert breaker.before_call() is True
+    breaker.probe_finished(healthy=True)
+    assert breaker.state == CircuitState.CLOSED and breaker.before_call() is False
+
+
+def test_tools_fail_fast_while_the_dev_container_is_down(monkeypatch) -> None:
+    client = DevContainerClient(breaker_factory=lambda target: CircuitBreaker(target, min_calls=3, open_seconds=0))
+    monkeypatch.setattr("tools.agent_tools.dev_container", client)
+
+    with DevContainerStub() as stub:
+        stub.files["app.py"] = "print('hi')"
+        tool = FileSystemTool(base_url=stub.url)
+        stub.unavailable = True
+        for _ in range(3):
+            assert "503" in tool.invoke({"path": "app.py"})
+
+        # The probe finds the container still down; the tool call never reaches it
+        requests_before = stub.requests
+        error = json.loads(tool.invoke({"path": "app.py"}))
+        assert error["error"] == "dev_container_unavailable"
+        assert stub.requests == requests_before + 1
+        assert client.health()[stub.url]["circuit"] == CircuitState.OPEN
+
+        client.breaker_for(stub.url)._opened_at -= 10
+        stub.unavailable = False
+        assert json.loads(tool.invoke({"path": "app.py"}))["content"] == "print('hi')"
+        assert client.health()[stub.url]["circuit"] == CircuitState.CLOSED
+
+
+def test_hung_requests_time_out_and_trip_the_breaker(monkeypatch) -> None:
+    monkeypatch.setenv("DEV_CONTAINER_READ_TIMEOUT", "30")
+    monkeypatch.setenv("DEV_CONTAINER_TIMEOUTS", "http://slow:8030=:120:3600,http://other:8030=1")
+    assert Timeouts.from_env("http://slow:8030") == Timeouts(connect=5, read=120, execute=3600)
+    assert Timeouts.from_env("http://fast:8030").for_url("http://fast:8030/read") == (5, 30)
+
+    client = DevContainerClient(
+        breaker_factory=lambda target: CircuitBreaker(target, min_calls=3, open_seconds=60),
+        timeouts_factory=lambda target: Timeouts(connect=1, read=0.05, execute=0.5),
+    )
+    with DevContainerStub(latency=0.2) as stub:
+        # Commands get the longer read timeout
+        assert client.post(f"{stub.url}/execute", json={"command": "true", "args": []}).status_code == 200
+        for _ in range(2):
+            with pytest.raises(requests.exceptions.Timeout):
+                client.get(f"{stub.url}/read", params={"path": "app.py"})
+        health = client.health()[stub.url]
+        assert health["failures"] == 2 and health["circuit"] == CircuitState.OPEN
+        with pytest.raises(DevContainerUnavailable):
+            client.get(f"{stub.url}/read", params={"path": "app.py"})
@@ -0,0 +1,55 @@
+from benchmarks.fakes import DevContainerStub
+from tools import agent_tools
+from tools.agent_tools import CommandExecutionTool, FileSystemTool
+from tools.command_cache import CommandCache, WorkspaceState
+
+
+def test_read_only_commands_are_scoped_to_what_they_read() -> None:
+    cache = CommandCache(enabled=True)
+    assert cache.scopes("cat package.json") == ["package.json"]
+    assert cache.scopes("ls -R ./src/") == ["src"]
+    assert cache.scopes("ls") == cache.scopes("cat src/*.ts") == cache.scopes("npx tsc --noEmit") == ["."]
+    for command in ("npm install", "npx tsc", "npx eslint . --fix", "cat a.txt > b.txt", "ls $(pwd)"):
+        assert cache.scopes(command) is None
+    # Writing the output to a file is not reading
+    for command in ("git diff --output=out.txt", "git log --output x", "tree -o listing.txt .", "eslint -o report.txt src", "npx eslint --output-file=report.txt ."):
+        assert cache.scopes(command) is None
+    assert cache.scopes("git log --oneline") == ["."]
+    assert CommandCache().scopes("cat package.json") is None
+
+    state = WorkspaceState()
+    state.apply({"instance": "a", "version": 1, "reset": False, "changes": []})
+    package, listing = state.digest(["package.json"]), state.digest(["src"])
+    state.apply({"instance": "a", "version": 2, "reset": False, "changes": [{"path": "src/app.ts", "hash": "1"}]})
+    assert state.digest(["package.json"]) == package and state.digest(["src"]) != listing
+    # Deleting the directory changes what is below it
+    changed = state.digest(["src/app.ts"])
+    state.apply({"instance": "a", "version": 3, "reset": False, "changes": [{"path": "src", "hash": None}]})
+    assert state.digest(["src/app.ts"]) != changed and "src/app.ts" not in state.hashes
+    state.apply({"instance": "a", "version": 4, "reset": True, "changes": []})
+    assert state.digest(["package.json"]) != package
+
+
+def test_cached_commands_rerun_only_after_their_files_change(monkeypatch) -> None:
+    cache = CommandCache(enabled=True)
+    monkeypatch.setattr(agent_tools, "get_command_cache", lambda: cache)
+
+    with DevContainerStub() as stub:
+        files, shell = FileSystemTool(base_url=stub.url), CommandExecutionTool(base_url=stub.url)
+        files.invoke({"path": "package.json", "content": "{}"})
+        first = shell.invoke({"command": "cat", "args": ["package.json"]})
+        assert shell.invoke({"command": "cat", "args": ["package.json"]}) == first
+        assert stub.commands == 1
+
+        # Other files do not matter, the file read does
+        files.invoke({"path": "src/app.ts", "content": "export {}"})
+        shell.invoke({"command": "cat", "args": ["package.json"]})
+        assert stub.commands == 1
+        files.invoke({"path": "package.json", "content": '{"name": "app"}'})
+        shell.invoke({"command": "cat", "args": ["package.json"]})
+        assert stub.commands == 2
+
+        # Any other command may have changed it
+        shell.invoke({"command": "npm", "args": ["install"]})
+        shell.invoke({"command": "cat", "args": ["package.json"]})
+        assert stub.commands == 4
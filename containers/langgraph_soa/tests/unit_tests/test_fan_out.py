@@ -0,0 +1,58 @@
+import time
+
+from langchain_core.messages import HumanMessage
+
+from benchmarks.fakes import DevContainerStub
+from src.agent.fan_out import join_results, parse_plan
+from src.agent.graph import AgentGraph
+from src.config.llm_config import LLMConfig
+from src.runtime.budget import ExecutionBudget
+from src.runtime.context import RunContext
+
+
+def test_plans_need_at_least_two_well_formed_subtasks() -> None:
+    reply = 'Plan:\n```json\n{"subtasks": [{"title": "a", "files": ["a.py"]}, {"title": "b", "instructions": "do b"}, {"title": "c"}]}\n```'
+    subtasks = parse_plan(reply, max_subtasks=2)
+    assert [(s.title, s.instructions, s.files) for s in subtasks] == [("a", "a", ["a.py"]), ("b", "do b", [])]
+    assert parse_plan('{"subtasks": [{"title": "only"}]}', 6) == []
+    assert parse_plan("no plan here", 6) == []
+    assert parse_plan('{"subtasks": [{"instructions": "untitled"}, {"title": "b"}]}', 6) == []
+
+    report, conflicts = join_results([
+        {"title": "a", "summary": "did a", "files": ["x.py", "a.py"], "stop_reason": "completed"},
+        {"title": "b", "summary": "did b", "files": ["x.py"], "stop_reason": "max_steps"},
+    ])
+    assert conflicts == {"x.py": ["a", "b"]}
+    assert "(stopped: max_steps)" in report and "- x.py: a, b" in report
+
+
+def _run(graph: AgentGraph, stub: DevContainerStub, prompt: str):
+    graph.speculative_tool_calls = False
+    state = {"messages": [HumanMessage(content=prompt)], "chat_history": [], "session_id": "fan-out"}
+    context = RunContext(dev_container_url=stub.url, fan_out=True)
+    return graph.run(state, budget=ExecutionBudget.unlimited(), context=context)
+
+
+def test_subtasks_run_in_parallel_and_conflicts_are_reported() -> None:
+    graph = AgentGraph(LLMConfig(llm_type="scripted", model_name="scripted", temperature=0.0))
+    graph.llm.first_token_latency = 0.05
+
+    with DevContainerStub() as stub:
+        started_at = time.perf_counter()
+        result = _run(graph, stub, "Add tests for each module [subtasks=4] [steps=3]")
+        elapsed = time.perf_counter() - started_at
+
+    # Planner plus four sub-agents of four LLM calls each; serially that is 17 x 50ms
+    assert result["usage"]["steps"] == 17
+    assert elapsed < 0.6
+    assert result["messages"][-1].content.startswith("Worked on 4 subtasks in parallel")
+    # The scripted sub-agents all write the same module
+    assert result["conflicts"] == {"src/module_0.py": ["Part 1", "Part 2", "Part 3", "Part 4"]}
+
+
+def test_requests_that_do_not_split_run_as_usual() -> None:
+    graph = AgentGraph(LLMConfig(llm_type="scripted", model_name="scripted", temperature=0.0))
+    with DevContainerStub() as stub:
+        result = _run(graph, stub, "Fix the bug [steps=2]")
+    assert result["messages"][-1].content == "Done after 2 steps."
+    assert result["usage"]["steps"] == 4
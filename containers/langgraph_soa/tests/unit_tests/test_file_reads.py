@@ -0,0 +1,24 @@
+import json
+
+from benchmarks.fakes import DevContainerStub
+from tools.agent_tools import FileSystemTool, read_params
+
+
+def test_read_params_pick_one_kind_of_range() -> None:
+    assert read_params() == {}
+    assert read_params(start_line=10, end_line=20) == {"start_line": "10", "end_line": "20"}
+    assert read_params(end_line=5) == {"start_line": "1", "end_line": "5"}
+    assert read_params(offset=100, length=50) == {"offset": "100", "length": "50"}
+    assert read_params(match="def run", context_lines=3) == {"match": "def run", "context": "3"}
+    assert read_params(full=True) == {"full": "true"}
+
+
+def test_file_system_tool_reads_a_line_window() -> None:
+    with DevContainerStub() as stub:
+        stub.files["big.py"] = "\n".join(f"line {i}" for i in range(1, 5001))
+        tool = FileSystemTool(base_url=stub.url)
+
+        result = json.loads(tool.invoke({"path": "big.py", "start_line": 4999, "end_line": 5000}))
+
+    assert result["content"] == "line 4999\nline 5000"
+    assert result["endLine"] == 5000
@@ -0,0 +1,67 @@
+import os
+
+from langchain_core.messages import HumanMessage
+from prometheus_client import REGISTRY
+
+from benchmarks.fakes import ScriptedLLM
+from src.llm.cache import CachingLLM, ResponseCache
+from src.runtime.context import RunContext, use_run_context
+
+
+class CountingLLM(ScriptedLLM):
+    def __init__(self):
+        super().__init__()
+        self.calls = 0
+
+    def invoke(self, messages, tools=None, on_tool_call=None):
+        self.calls += 1
+        return super().invoke(messages, tools=tools, on_tool_call=on_tool_call)
+
+
+def _cache_results(result):
+    return REGISTRY.get_sample_value("rose_llm_cache_requests_total", {"result": result}) or 0.0
+
+
+MESSAGES = [HumanMessage(content="Write the module [steps=3]")]
+
+
+def test_repeated_deterministic_requests_are_served_from_memory() -> None:
+    inner = CountingLLM()
+    llm = CachingLLM(inner, ResponseCache(), "scripted", temperature=0.0)
+    hits_before = _cache_results("memory_hit")
+
+    first = llm.invoke(MESSAGES)
+    reported = []
+    second = llm.invoke(list(MESSAGES), on_tool_call=reported.append)
+
+    assert inner.calls == 1
+    assert second.additional_kwargs == first.additional_kwargs
+    assert second.usage_metadata is None and second.response_metadata["cache"] == "memory"
+    assert [call["id"] for call in reported] == ["call_1"]
+    assert _cache_results("memory_hit") - hits_before == 1
+
+    with use_run_context(RunContext(llm_cache=False)):
+        llm.invoke(MESSAGES)
+    assert inner.calls == 2
+    # Sampled responses are never cached
+    sampled = CachingLLM(inner, ResponseCache(), "scripted", temperature=0.7)
+    sampled.invoke(MESSAGES)
+    sampled.invoke(MESSAGES)
+    assert inner.calls == 4
+
+
+def test_disk_tier_survives_restarts_and_honours_ttl_and_size(tmp_path) -> None:
+    inner = CountingLLM()
+    CachingLLM(inner, ResponseCache(str(tmp_path)), "scripted", 0.0).invoke(MESSAGES)
+
+    restarted = CachingLLM(inner, ResponseCache(str(tmp_path)), "scripted", 0.0)
+    assert restarted.invoke(MESSAGES).response_metadata["cache"] == "disk"
+    assert inner.calls == 1
+
+    expired = CachingLLM(inner, ResponseCache(str(tmp_path), ttl_seconds=0), "scripted", 0.0)
+    expired.invoke(MESSAGES)
+    assert inner.calls == 2
+
+    small = ResponseCache(str(tmp_path), max_disk_bytes=1)
+    CachingLLM(inner, small, "scripted", 0.0).invoke([HumanMessage(content="Another task [steps=2]")])
+    assert not [name for _, _, names in os.walk(tmp_path) for name in names]
@@ -0,0 +1,36 @@
+import json
+import logging
+import queue
+from concurrent.futures import ThreadPoolExecutor
+import contextvars
+
+from src.observability.logs import JsonFormatter, _PayloadLimitingQueueHandler, parse_levels, use_correlation_id
+
+
+def _emit(handler, logger_name, message, *args):
+    logger = logging.getLogger(logger_name)
+    record = logger.makeRecord(logger_name, logging.INFO, __file__, 1, message, args, None)
+    handler.handle(record)
+
+
+def test_records_are_truncated_redacted_and_tagged_with_correlation_id() -> None:
+    log_queue = queue.Queue()
+    handler = _PayloadLimitingQueueHandler(log_queue, max_chars=40)
+
+    with use_correlation_id("req-1"):
+        _emit(handler, "src.test", "key %s and a long tail %s", "sk-ant-REDACTED", "x" * 100)
+        # Worker threads started with a copy of the context keep the id
+        with ThreadPoolExecutor(1) as pool:
+            pool.submit(contextvars.copy_context().run, _emit, handler, "src.test", "from worker").result()
+    _emit(handler, "src.test", "outside")
+
+    entries = [json.loads(JsonFormatter().format(log_queue.get_nowait())) for _ in range(3)]
+    assert "sk-ant" not in entries[0]["message"]
+    assert entries[0]["message"].startswith("key [REDACTED]")
+    assert entries[0]["message"].endswith("[truncated 91 chars]")
+    assert [e.get("correlation_id") for e in entries] == ["req-1", "req-1", None]
+
+
+def test_parse_levels() -> None:
+    assert parse_levels("src.agent.graph=debug, httpx=WARNING") == {"src.agent.graph": "DEBUG", "httpx": "WARNING"}
+    assert parse_levels("") == {}
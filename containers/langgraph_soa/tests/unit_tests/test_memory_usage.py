@@ -0,0 +1,49 @@
+from langchain_core.messages import HumanMessage
+
+from benchmarks.fakes import DevContainerStub
+from src.agent.graph import AgentGraph
+from src.agent.memory import MemoryStore
+from src.config.llm_config import LLMConfig
+from src.observability.memory_usage import AllocationTracker, message_footprint
+from src.runtime.budget import ExecutionBudget
+from src.runtime.context import RunContext
+
+
+def test_sessions_are_accounted_and_evicted(tmp_path) -> None:
+    size, tokens = message_footprint([{"role": "user", "content": "hi"}])
+    assert size == len('{"role": "user", "content": "hi"}') and tokens > 0
+
+    graph = AgentGraph(LLMConfig(llm_type="scripted", model_name="scripted", temperature=0.0))
+    graph.speculative_tool_calls = False
+    graph.memory = MemoryStore(directory=str(tmp_path))
+    with DevContainerStub() as stub:
+        for session_id, steps in (("small", 1), ("large", 3)):
+            state = {"messages": [HumanMessage(content=f"Build it [steps={steps}]")], "chat_history": [], "session_id": session_id}
+            graph.run(state, budget=ExecutionBudget.unlimited(), context=RunContext(dev_container_url=stub.url))
+
+    footprints = graph.session_footprints()
+    small, large = footprints["small"], footprints["large"]
+    assert (small.messages, large.messages) == (4, 8)
+    assert 0 < small.bytes < large.bytes and 0 < small.tokens < large.tokens
+    assert large.memory_snippets > 0 and large.memory_bytes > 0
+    assert large.last_access >= small.last_access
+
+    assert graph.evict_session("large") and not graph.evict_session("large")
+    assert set(graph.session_footprints()) == {"small"}
+    # The retrieval index was saved before it was dropped
+    assert len(graph.memory.get("large")) == large.memory_snippets
+
+
+def test_allocation_snapshots_show_growth() -> None:
+    tracker = AllocationTracker()
+    try:
+        assert tracker.snapshot()["tracing_started"]
+        retained = [f"value {n}" * 20 for n in range(20000)]
+        snapshot = tracker.snapshot(limit=5)
+        assert not snapshot["tracing_started"] and snapshot["traced_bytes"] > 0
+        assert "test_memory_usage.py" in snapshot["growth"][0]["location"] and 0 < len(snapshot["top"]) <= 5
+        assert snapshot["growth"][0]["bytes_diff"] > 20000 * 100
+        del retained
+    finally:
+        assert tracker.stop()
+    assert not tracker.stop()
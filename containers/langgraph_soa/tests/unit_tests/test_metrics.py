@@ -0,0 +1,36 @@
+from prometheus_client import REGISTRY
+from langchain_core.messages import HumanMessage
+
+from src.observability import metrics
+
+
+def _sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+def test_run_records_node_llm_tool_and_token_metrics(fake_graph) -> None:
+    before = {
+        "agent": _sample("rose_graph_node_duration_seconds_count", node="agent"),
+        "llm": _sample("rose_llm_call_duration_seconds_count", provider="fake", model="fake"),
+        "tool": _sample("rose_tool_call_duration_seconds_count", tool="missing_tool", status="ok"),
+        "input": _sample("rose_llm_tokens_total", provider="fake", model="fake", kind="input"),
+        "runs": _sample("rose_runs_total", stop_reason="max_steps"),
+    }
+
+    graph = fake_graph("missing_tool")
+    state = {"messages": [HumanMessage(content="hi")], "chat_history": [], "session_id": "metrics"}
+    graph.run(state, budget=graph.llm_config.budget.merged({"max_steps": 2}))
+
+    # Two LLM steps, then the agent node runs once more to stop the run
+    assert _sample("rose_graph_node_duration_seconds_count", node="agent") - before["agent"] == 3
+    assert _sample("rose_llm_call_duration_seconds_count", provider="fake", model="fake") - before["llm"] == 2
+    assert _sample("rose_llm_tokens_total", provider="fake", model="fake", kind="input") - before["input"] == 200
+    assert _sample("rose_runs_total", stop_reason="max_steps") - before["runs"] == 1
+    # Unknown tools never execute, so no tool latency is recorded
+    assert _sample("rose_tool_call_duration_seconds_count", tool="missing_tool", status="ok") == before["tool"]
+
+
+def test_render_exposes_prometheus_text() -> None:
+    payload, content_type = metrics.render()
+    assert content_type.startswith("text/plain")
+    assert b"rose_run_queue_depth" in payload
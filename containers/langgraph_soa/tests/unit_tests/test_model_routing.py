@@ -0,0 +1,65 @@
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from prometheus_client import REGISTRY
+
+from benchmarks.fakes import DevContainerStub, ScriptedLLM
+from src.agent.graph import AgentGraph
+from src.config.llm_config import LLMConfig
+from src.llm.router import RoutedLLM, Tier, classify_step, tool_failed
+from src.runtime.budget import ExecutionBudget
+from src.runtime.context import RunContext
+from src.runtime.scheduler import ConcurrencySlots
+
+
+def _routes(tier, reason):
+    return REGISTRY.get_sample_value("rose_llm_routes_total", {"tier": tier, "reason": reason}) or 0.0
+
+
+def test_steps_are_classified_by_what_they_follow_up_on() -> None:
+    call = AIMessage(content="", additional_kwargs={"tool_calls": [{"id": "1", "function": {"name": "file_system", "arguments": "{}"}}]})
+    prompt = [HumanMessage(content="Fix the bug")]
+    assert classify_step(prompt) == (Tier.FLAGSHIP, "plan")
+    assert classify_step(prompt + [call, ToolMessage(content='{"content": "x = 1"}', tool_call_id="1")]) == (Tier.FAST, "follow_up")
+    failed = ToolMessage(content="Error executing command: 500 Server Error", tool_call_id="1")
+    assert classify_step(prompt + [call, failed]) == (Tier.FLAGSHIP, "tool_error")
+
+    # Failures are told by the result's status, not by words in a file or in passing output
+    for content, failure in [
+        ('{"content": "raise ValueError(\'Error: bad input\')"}', False),
+        ("1\tclass ParseError(Exception):\n2\t    pass", False),
+        ("$ pytest\n3 passed, 0 FAILED", False),
+        ("Command exited with code 2\nusage: app [-h]", True),
+        ('{"error": "Process exited with code 1", "stdout": "", "code": 1}', True),
+        ('{"status": "failed", "passed": 1, "failed": 1}', True),
+    ]:
+        assert tool_failed(ToolMessage(content=content, tool_call_id="1")) is failure, content
+    assert tool_failed(ToolMessage(content="ok", tool_call_id="1", additional_kwargs={"is_error": True}))
+
+
+def test_simple_steps_go_to_the_fast_model_and_code_is_escalated() -> None:
+    graph = AgentGraph(LLMConfig(llm_type="scripted", model_name="scripted", temperature=0.0))
+    fast = ScriptedLLM("fast")
+    graph.llm = RoutedLLM(ScriptedLLM("flagship"), fast, flagship_provider="anthropic", fast_provider="openai")
+    # Each call holds the slot of the provider it goes to, even at one slot per provider
+    slots = ConcurrencySlots({"llm": 1, "llm:anthropic": 1, "llm:openai": 1})
+    held = []
+    invoke = fast.invoke
+    fast.invoke = lambda messages, **kwargs: held.append(slots.in_use()) or invoke(messages, **kwargs)
+    graph.speculative_tool_calls = False
+    before = {key: _routes(*key) for key in [("flagship", "plan"), ("fast", "follow_up"), ("escalated", "code_generation")]}
+
+    with DevContainerStub() as stub:
+        state = {"messages": [HumanMessage(content="Build it [steps=4]")], "chat_history": [], "session_id": "routing"}
+        result = graph.run(state, budget=ExecutionBudget.unlimited(), context=RunContext(dev_container_url=stub.url, slots=slots))
+
+    # Plan on the flagship; read, run and the final summary on the fast model; the second write escalated
+    assert {key: _routes(*key) - count for key, count in before.items()} == {
+        ("flagship", "plan"): 1, ("fast", "follow_up"): 3, ("escalated", "code_generation"): 1,
+    }
+    assert result["messages"][-1].content == "Done after 4 steps."
+    assert result["messages"][-1].response_metadata["routed_model"] == "fast"
+    # Calls are counted under the provider that answered them
+    assert result["messages"][-1].response_metadata["routed_provider"] == "openai"
+    assert held[0] == {"llm": 1, "llm:anthropic": 0, "llm:openai": 1}
+    assert REGISTRY.get_sample_value("rose_llm_call_duration_seconds_count", {"provider": "openai", "model": "fast"}) >= 3
+    # The discarded fast response counts towards tokens but not steps
+    assert result["usage"]["steps"] == 5 and result["usage"]["input_tokens"] == 6000
@@ -0,0 +1,65 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from langchain_core.messages import HumanMessage
+from prometheus_client import REGISTRY
+
+from benchmarks.fakes import DevContainerStub
+from src.agent.graph import AgentGraph
+from src.config.llm_config import LLMConfig
+from src.llm.pool import LLMPool
+from src.runtime.budget import ExecutionBudget
+from src.runtime.context import RunContext
+
+
+def _input_tokens(model):
+    return REGISTRY.get_sample_value("rose_llm_tokens_total", {"provider": "scripted", "model": model, "kind": "input"}) or 0.0
+
+
+def test_selections_resolve_to_shared_clients() -> None:
+    base = LLMConfig(llm_type="scripted", model_name="scripted", temperature=0.0, budget=ExecutionBudget(max_steps=3))
+    selected = base.selected({"model_name": "scripted-large", "temperature": 0.5})
+    assert (selected.llm_type, selected.model_name, selected.temperature) == ("scripted", "scripted-large", 0.5)
+    assert selected.budget is base.budget
+    with pytest.raises(ValueError, match="Unknown"):
+        base.selected({"model": "x"})
+    with pytest.raises(ValueError, match="model_name"):
+        base.selected({"llm_type": "openai"})
+
+    pool = LLMPool(max_entries=2)
+    first = pool.get(selected)
+    assert pool.get(base.selected({"model_name": "scripted-large", "temperature": 0.5})) is first
+    pool.get(base)
+    pool.get(base.selected({"model_name": "third"}))
+    # The least recently used client was dropped
+    assert pool.get(selected) is not first
+    with pytest.raises(ValueError, match="Unknown LLM type"):
+        pool.get(base.selected({"llm_type": "missing", "model_name": "x"}))
+
+
+def test_concurrent_runs_use_their_own_models_on_one_graph() -> None:
+    graph = AgentGraph(LLMConfig(llm_type="scripted", model_name="scripted", temperature=0.0))
+    graph.speculative_tool_calls = False
+    compiled = graph.graph
+    selection = LLMConfig(llm_type="scripted", model_name="scripted-selected", temperature=0.0)
+    before = _input_tokens("scripted-selected")
+
+    def run(session_id, llm_config):
+        state = {"messages": [HumanMessage(content="Build it [steps=1]")], "chat_history": [], "session_id": session_id}
+        context = RunContext(dev_container_url=stub.url, llm_config=llm_config)
+        return graph.run(state, budget=ExecutionBudget.unlimited(), context=context)
+
+    with DevContainerStub() as stub, ThreadPoolExecutor(max_workers=2) as executor:
+        default_run = executor.submit(run, "default-model", None)
+        selected_run = executor.submit(run, "selected-model", selection)
+        assert default_run.result()["stop_reason"] == selected_run.result()["stop_reason"] == "completed"
+
+    # The selected model answered both steps of its run; the default is unchanged
+    assert _input_tokens("scripted-selected") - before == 2000
+    assert graph.llm.get_model_name() == "scripted"
+
+    # Changing the default keeps the compiled graph and the sessions
+    graph.configure_llm(LLMConfig(llm_type="scripted", model_name="scripted-default", temperature=0.0))
+    assert graph.graph is compiled
+    assert graph.llm.get_model_name() == "scripted-default"
+    assert len(graph.get_chat_history("selected-model").messages) > 0
@@ -0,0 +1,37 @@
+import time
+
+from src.observability.profiler import ProfileStore, SamplingProfiler
+
+
+def _spin(seconds: float) -> None:
+    deadline = time.perf_counter() + seconds
+    while time.perf_counter() < deadline:
+        pass
+
+
+def test_only_attached_threads_are_sampled() -> None:
+    profiler = SamplingProfiler(interval=0.001)
+    profiler.start()
+    _spin(0.05)
+    assert profiler.samples == 0
+    with profiler.attach():
+        _spin(0.1)
+    profiler.stop()
+
+    collapsed = profiler.to_collapsed()
+    assert profiler.samples > 0
+    for line in collapsed.splitlines():
+        stack, count = line.rsplit(" ", 1)
+        assert int(count) > 0
+        assert "test_only_attached_threads_are_sampled" in stack
+    assert "_spin (unit_tests/test_profiler.py:" in collapsed
+
+
+def test_armed_runs_are_consumed_per_session() -> None:
+    store = ProfileStore()
+    store.arm(1, session_id="s1")
+    store.arm(1)
+    assert store.take_armed("s2")  # uses the run armed for any session
+    assert not store.take_armed("s2")
+    assert store.take_armed("s1")
+    assert not store.take_armed("s1")
@@ -0,0 +1,45 @@
+import json
+
+from prometheus_client import REGISTRY
+
+from benchmarks.fakes import DevContainerStub
+from src.runtime.context import RunContext, use_run_context
+from tools.agent_tools import CommandExecutionTool, FileSystemTool
+from tools.rendering import compact_command_output, compact_file_result, result_format_for
+
+
+def _saved(tool):
+    return REGISTRY.get_sample_value("rose_tool_result_tokens_saved_total", {"tool": tool}) or 0.0
+
+
+def test_results_render_compactly() -> None:
+    listing = [
+        {"name": "app.ts", "isDirectory": False, "size": 2048},
+        {"name": "src", "isDirectory": True},
+    ]
+    assert compact_file_result(listing) == "src/\napp.ts  2.0K"
+    assert compact_file_result({"path": "a.py", "content": "x = 1\ny = 2"}) == "1\tx = 1\n2\ty = 2"
+    assert compact_file_result({"path": "a.py", "content": "y = 2", "startLine": 2, "endLine": 2}) == "a.py lines 2-2:\n2\ty = 2"
+
+    progress = "\x1b[32mok\x1b[0m\n" + "\n".join(f"line {n}" for n in range(200)) + "\n10%\r50%\r100%\n"
+    output = compact_command_output(progress, "warning", 2).split("\n")
+    assert output[:2] == ["Command exited with code 2", "ok"]
+    assert "... 82 lines omitted ..." in output and output[-3:] == ["100%", "[stderr]", "warning"]
+
+
+def test_tools_render_per_provider_format(monkeypatch) -> None:
+    monkeypatch.setenv("TOOL_RESULT_FORMAT", "compact")
+    monkeypatch.setenv("TOOL_RESULT_FORMAT_OPENAI", "json")
+    assert (result_format_for("openai"), result_format_for("anthropic")) == ("json", "compact")
+
+    with DevContainerStub() as stub:
+        files, shell = FileSystemTool(base_url=stub.url), CommandExecutionTool(base_url=stub.url)
+        files.invoke({"path": "src/app.py", "content": "print('hi')"})
+        assert json.loads(files.invoke({"path": "src/app.py"})) == {"content": "print('hi')"}
+
+        before = _saved("file_system")
+        with use_run_context(RunContext(tool_result_format="compact")):
+            assert files.invoke({"path": "src/app.py"}) == "1\tprint('hi')"
+            assert files.invoke({"path": "src"}) == "app.py"
+            assert shell.invoke({"command": "pytest", "args": []}) == "$ pytest\n1 passed in 0.01s"
+        assert _saved("file_system") > before
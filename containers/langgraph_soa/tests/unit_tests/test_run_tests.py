@@ -0,0 +1,92 @@
+import json
+import shlex
+
+from benchmarks.fakes import DevContainerStub
+from tools.agent_tools import CommandExecutionTool, FileSystemTool, MoveFileTool, RunTestsTool
+from tools.test_impact import affected_tests, is_test_file, parse_pytest
+
+PYTEST_OUTPUT = """\
+=================================== FAILURES ===================================
+___________________________________ test_bad ___________________________________
+tests/test_a.py:4: in test_bad
+    assert x == 3
+E   assert 2 == 3
+=========================== short test summary info ============================
+PASSED tests/test_a.py::test_ok
+PASSED tests/test_c.py::test_x
+FAILED tests/test_a.py::test_bad - assert 2 == 3
+1 failed, 2 passed in 0.07s
+"""
+
+
+def test_changes_map_to_tests_and_results_are_parsed_per_file() -> None:
+    tests = ["tests/test_parser.py", "tests/test_cli.py", "web/src/parser/parser.test.js", "web/src/app.spec.ts"]
+    affected = affected_tests(
+        ["src/parser.py", "web/src/parser/index.js", "tests/test_cli.py", "src/unused.py"],
+        tests,
+        referencing={"parser": {"tests/test_cli.py"}},
+    )
+    assert affected == {
+        "src/parser.py": ["tests/test_cli.py", "tests/test_parser.py", "web/src/parser/parser.test.js"],
+        "web/src/parser/index.js": ["tests/test_cli.py", "tests/test_parser.py", "web/src/parser/parser.test.js"],
+        "tests/test_cli.py": ["tests/test_cli.py"],
+        "src/unused.py": [],
+    }
+    assert is_test_file("web/src/app.spec.ts") and not is_test_file("src/testing.py")
+
+    results = parse_pytest(PYTEST_OUTPUT, ["tests/test_a.py", "tests/test_c.py", "tests/test_d.py"])
+    assert (results["tests/test_a.py"].status, results["tests/test_a.py"].passed, results["tests/test_a.py"].failed) == ("failed", 1, 1)
+    assert results["tests/test_a.py"].failures[0]["excerpt"].endswith("E   assert 2 == 3")
+    assert results["tests/test_c.py"].status == "passed"
+    # Not reported, so it did not run
+    assert results["tests/test_d.py"].status == "error"
+
+
+def test_only_affected_tests_run_and_unchanged_ones_are_reused() -> None:
+    commands = []
+
+    with DevContainerStub() as stub:
+        def shell(command):
+            commands.append(command)
+            args = shlex.split(command)
+            if args[0] == "find":
+                return 0, "\n".join(f"./{path}" for path in stub.files if is_test_file(path))
+            if args[0] == "grep":
+                hits = [path for path in args[4:] if args[3] in stub.files.get(path, "")]
+                return (0 if hits else 1), "\n".join(hits)
+            lines = [
+                f"FAILED {test}::test_it - assert False" if "assert False" in stub.files[test] else f"PASSED {test}::test_it"
+                for test in args if test.endswith(".py") and test in stub.files
+            ]
+            return (1 if any(line.startswith("FAILED") for line in lines) else 0), "\n".join(lines)
+
+        stub.command_handler = shell
+        files, tests = FileSystemTool(base_url=stub.url), RunTestsTool(base_url=stub.url)
+        files.invoke({"path": "tests/test_other.py", "content": "def test_it(): pass"})
+        files.invoke({"path": "tests/test_parser.py", "content": "from src.parser import parse\ndef test_it(): assert parse()"})
+        files.invoke({"path": "src/parser.py", "content": "def parse(): return 1"})
+
+        first = json.loads(tests.invoke({}))
+        assert first["status"] == "passed" and first["ran"] == ["tests/test_other.py", "tests/test_parser.py"]
+        assert json.loads(tests.invoke({}))["status"] == "no_changes"
+
+        # Nothing changed since the last result, so nothing runs
+        commands.clear()
+        cached = json.loads(tests.invoke({"paths": ["src/parser.py"]}))
+        assert cached["cached"] == ["tests/test_parser.py"] and cached["ran"] == [] and len(commands) == 1
+
+        # A command may have changed anything, so no result is reused
+        stub.files["src/parser.py"] = "def parse(): return 0"
+        CommandExecutionTool(base_url=stub.url).invoke({"command": "sed", "args": ["-i", "s/1/0/", "src/parser.py"]})
+        assert json.loads(tests.invoke({}))["status"] == "unknown_changes"
+        rerun = json.loads(tests.invoke({"paths": ["src/parser.py"]}))
+        assert rerun["ran"] == ["tests/test_parser.py"] and rerun["cached"] == []
+        assert json.loads(tests.invoke({"paths": ["src/parser.py"]}))["cached"] == ["tests/test_parser.py"]
+
+        files.invoke({"path": "tests/test_parser.py", "content": "def test_it(): assert False"})
+        MoveFileTool(base_url=stub.url).invoke({"source": "src/parser.py", "destination": "src/legacy/parser.py"})
+        failed = json.loads(tests.invoke({}))
+
+    assert failed["status"] == "failed" and failed["ran"] == ["tests/test_parser.py"]
+    assert failed["failures"] == [{"test": "tests/test_parser.py::test_it", "excerpt": "assert False"}]
+    assert failed["files"] == {"tests/test_parser.py": "failed"}
@@ -0,0 +1,187 @@
+import asyncio
+
+import pytest
+
+from src.runtime.cancellation import CancellationToken, RunCancelled
+from src.runtime.scheduler import Lane, RunScheduler, SchedulerOverloaded
+
+
+async def _run_all(scheduler, requests, order, hold=0.005):
+    async def run(name, session_id, tenant, lane):
+        async with scheduler.admit(session_id, tenant=tenant, lane=lane):
+            order.append(name)
+            await asyncio.sleep(hold)
+
+    tasks = []
+    for request in requests:
+        tasks.append(asyncio.create_task(run(*request)))
+        # Let each task enqueue before the next one
+        await asyncio.sleep(0)
+    await asyncio.gather(*tasks)
+
+
+def test_runs_of_a_session_are_serialized_in_arrival_order() -> None:
+    order = []
+    scheduler = RunScheduler(max_concurrent_runs=4)
+
+    async def run(name):
+        async with scheduler.admit("s1"):
+            order.append(f"{name} start")
+            await asyncio.sleep(0.01)
+            order.append(f"{name} end")
+
+    async def main():
+        await asyncio.gather(run("a"), run("b"), run("c"))
+
+    asyncio.run(main())
+    assert order == ["a start", "a end", "b start", "b end", "c start", "c end"]
+
+
+def test_interactive_runs_are_dispatched_before_batch_runs() -> None:
+    order = []
+    scheduler = RunScheduler(max_concurrent_runs=1)
+    requests = [
+        ("blocker", "s0", "t", Lane.INTERACTIVE),
+        ("batch", "s1", "t", Lane.BATCH),
+        ("interactive", "s2", "t", Lane.INTERACTIVE),
+    ]
+    asyncio.run(_run_all(scheduler, requests, order))
+    assert order == ["blocker", "interactive", "batch"]
+
+
+def test_tenants_share_capacity_by_weight() -> None:
+    order = []
+    scheduler = RunScheduler(max_concurrent_runs=1, max_queue_depth=100, tenant_weights={"heavy": 2.0})
+    requests = [("blocker", "s0", "other", Lane.INTERACTIVE)]
+    requests += [(f"light{i}", f"l{i}", "light", Lane.INTERACTIVE) for i in range(4)]
+    requests += [(f"heavy{i}", f"h{i}", "heavy", Lane.INTERACTIVE) for i in range(8)]
+    asyncio.run(_run_all(scheduler, requests, order))
+
+    # A tenant flooding the queue does not starve the other, and gets twice its share
+    first_nine = order[1:10]
+    assert sum(name.startswith("heavy") for name in first_nine) == 6
+    assert sum(name.startswith("light") for name in first_nine) == 3
+
+
+def test_saturated_scheduler_sheds_load_with_retry_after() -> None:
+    scheduler = RunScheduler(max_concurrent_runs=1, max_queue_depth=1)
+
+    async def main():
+        release = asyncio.Event()
+
+        async def hold(session_id):
+            async with scheduler.admit(session_id):
+                await release.wait()
+
+        running = asyncio.create_task(hold("s1"))
+        queued = asyncio.create_task(hold("s2"))
+        await asyncio.sleep(0)
+        assert scheduler.queue_depth() == 1
+        with pytest.raises(SchedulerOverloaded) as excinfo:
+            async with scheduler.admit("s3"):
+                pass
+        release.set()
+        await asyncio.gather(running, queued)
+        return excinfo.value
+
+    error = asyncio.run(main())
+    assert error.retry_after >= 1
+    assert scheduler.stats()["queued"] == 0
+
+
+def test_session_queue_holds_at_most_max_session_queue_runs() -> None:
+    scheduler = RunScheduler(max_concurrent_runs=4, max_session_queue=2)
+
+    async def main():
+        release = asyncio.Event()
+
+        async def hold():
+            async with scheduler.admit("s1"):
+                await release.wait()
+
+        async def admit_once():
+            async with scheduler.admit("s1"):
+                pass
+
+        # One running and one waiting fill the session's queue
+        runs = [asyncio.create_task(hold()) for _ in range(2)]
+        await asyncio.sleep(0)
+        assert len(scheduler._session_queues["s1"]) == 2
+        with pytest.raises(SchedulerOverloaded):
+            await asyncio.wait_for(admit_once(), timeout=1)
+        release.set()
+        await asyncio.gather(*runs)
+
+    asyncio.run(main())
+
+
+def test_cancelling_a_queued_run_gives_up_its_place() -> None:
+    scheduler = RunScheduler(max_concurrent_runs=1)
+    token = CancellationToken()
+
+    async def main():
+        release = asyncio.Event()
+
+        async def hold():
+            async with scheduler.admit("s1"):
+                await release.wait()
+
+        async def wait(session_id):
+            async with scheduler.admit(session_id, cancellation=token):
+                pass
+
+        running = asyncio.create_task(hold())
+        await asyncio.sleep(0)
+        queued = asyncio.create_task(wait("s2"))
+        await asyncio.sleep(0)
+        assert scheduler.queue_depth() == 1
+
+        # Cancelled from another thread, as by /cancel or a client disconnect
+        await asyncio.to_thread(token.cancel, "cancelled by client")
+        with pytest.raises(RunCancelled):
+            await asyncio.wait_for(queued, timeout=1)
+        assert scheduler.queue_depth() == 0 and "s2" not in scheduler._session_queues
+
+        # A run cancelled before it is queued is not queued at all
+        with pytest.raises(RunCancelled):
+            await wait("s3")
+        release.set()
+        await running
+
+    asyncio.run(main())
+    assert scheduler.stats()["queued"] == 0 and scheduler.stats()["running"][Lane.INTERACTIVE] == 0
+
+
+def test_run_cancelled_as_its_session_frees_up_is_not_granted() -> None:
+    scheduler = RunScheduler(max_concurrent_runs=1)
+    token = CancellationToken()
+
+    async def main():
+        release = asyncio.Event()
+
+        async def hold():
+            async with scheduler.admit("s1"):
+                await release.wait()
+
+        async def wait():
+            async with scheduler.admit("s1", cancellation=token):
+                pass
+
+        running = asyncio.create_task(hold())
+        await asyncio.sleep(0)
+        queued = asyncio.create_task(wait())
+        await asyncio.sleep(0)
+
+        # Both land in the same loop iteration: the cancellation first, then the release
+        token.cancel("cancelled by client")
+        release.set()
+        await asyncio.wait_for(running, timeout=1)
+        with pytest.raises(RunCancelled):
+            await asyncio.wait_for(queued, timeout=1)
+
+        # The session is admitted again
+        async with scheduler.admit("s1"):
+            pass
+
+    asyncio.run(main())
+    assert scheduler.stats()["queued"] == 0 and scheduler.stats()["running"][Lane.INTERACTIVE] == 0
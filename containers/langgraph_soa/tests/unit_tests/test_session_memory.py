@@ -0,0 +1,59 @@
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+
+from benchmarks.fakes import DevContainerStub
+from src.agent.graph import AgentGraph
+from src.agent.memory import MemoryStore, SessionMemory, window_start
+from src.config.llm_config import LLMConfig
+from src.runtime.budget import ExecutionBudget
+from src.runtime.context import RunContext
+
+
+def test_index_ranks_relevant_snippets_and_round_trips() -> None:
+    memory = SessionMemory(max_snippets=4)
+    error = ToolMessage(content="TypeError: parse_config() missing 1 required argument", tool_call_id="1", name="execute_command")
+    assert memory.add([HumanMessage(content="Set up the project"), error, AIMessage(content="The config parser needs a path")]) == 3
+    # Adding a message again indexes nothing new
+    assert memory.add([error]) == 0
+
+    hits = memory.search("why does parse_config fail with TypeError", k=2)
+    assert [hit.role for hit in hits] == ["tool execute_command"]
+    assert memory.search("parse_config", k=2, exclude={hits[0].key}) == []
+
+    restored = SessionMemory.from_dict(memory.to_dict(), max_snippets=4)
+    assert [hit.key for hit in restored.search("config", k=3)] == [hit.key for hit in memory.search("config", k=3)]
+
+    # The oldest snippets make room for new ones
+    memory.add([HumanMessage(content=f"message {n}") for n in range(3)])
+    assert len(memory) == 4 and memory.search("project", k=1) == []
+
+    messages = [HumanMessage(content="a"), AIMessage(content="b"), ToolMessage(content="c", tool_call_id="1"), AIMessage(content="d")]
+    assert window_start(messages, 2) == 3 and window_start(messages, 10) == 0
+
+
+def test_long_sessions_send_a_window_and_recall_the_rest(tmp_path) -> None:
+    graph = AgentGraph(LLMConfig(llm_type="scripted", model_name="scripted", temperature=0.0))
+    graph.speculative_tool_calls = False
+    graph.memory = MemoryStore(directory=str(tmp_path), window=6, top_k=2)
+    prompts = []
+    invoke = graph.llm.invoke
+    graph.llm.invoke = lambda messages, **kwargs: prompts.append(messages) or invoke(messages, **kwargs)
+
+    def run(prompt):
+        state = {"messages": [HumanMessage(content=prompt)], "chat_history": [], "session_id": "long"}
+        return graph.run(state, budget=ExecutionBudget.unlimited(), context=RunContext(dev_container_url=stub.url))
+
+    with DevContainerStub() as stub:
+        assert run("Write the module [steps=3]")["stop_reason"] == "completed"
+        prompts.clear()
+        assert run("What does function_7 return? [steps=0]")["stop_reason"] == "completed"
+
+    # The prompt carries the last messages and recalls the write of function_7, the first step of the first run
+    system, *conversation = prompts[0]
+    assert isinstance(system, SystemMessage) and len(conversation) == 6
+    assert "Earlier in this session" in system.content and "return value * 7" in system.content
+    assert len(graph.get_chat_history("long").messages) == 10
+
+    # The index was saved with the session and is there after a restart
+    restored = MemoryStore(directory=str(tmp_path)).get("long")
+    assert len(restored) == len(graph.memory.get("long"))
+    assert restored.search("function_7", k=1)
@@ -0,0 +1,110 @@
+import json
+import time
+
+from langchain_core.messages import AIMessageChunk, HumanMessage, ToolMessage
+
+from benchmarks.fakes import DevContainerStub
+from src.agent.graph import AgentGraph
+from src.config.llm_config import LLMConfig
+from src.llm import base
+from src.llm.base import BaseLLM
+from src.runtime.budget import ExecutionBudget
+from src.runtime.context import RunContext
+
+
+class StreamOnlyLLM(BaseLLM):
+    def initialize(self) -> None:
+        pass
+
+    def invoke(self, messages, tools=None, on_tool_call=None):
+        raise NotImplementedError
+
+    def get_model_name(self) -> str:
+        return "stream-only"
+
+
+def _tool_chunk(index, args, id=None, name=None):
+    return AIMessageChunk(content="", tool_call_chunks=[{"index": index, "id": id, "name": name, "args": args}])
+
+
+def test_tool_calls_are_dispatched_as_soon_as_complete() -> None:
+    events = []
+
+    def chunks():
+        yield AIMessageChunk(content="Reading both files.", usage_metadata={"input_tokens": 10, "output_tokens": 0, "total_tokens": 10})
+        yield _tool_chunk(1, "", id="call_a", name="file_system")
+        yield _tool_chunk(1, '{"path": ')
+        yield _tool_chunk(1, '"a.py"}')
+        events.append("first call streamed")
+        yield _tool_chunk(2, "", id="call_b", name="execute_command")
+        events.append("second call started")
+        yield _tool_chunk(2, '{"command": "ls"}')
+        yield AIMessageChunk(content="", usage_metadata={"input_tokens": 0, "output_tokens": 25, "total_tokens": 25})
+
+    message = StreamOnlyLLM()._collect_stream(chunks(), on_tool_call=lambda call: events.append(call["id"]))
+
+    assert events == ["call_a", "first call streamed", "second call started", "call_b"]
+    assert message.content == "Reading both files."
+    assert [tc["function"]["arguments"] for tc in message.additional_kwargs["tool_calls"]] == ['{"path": "a.py"}', '{"command": "ls"}']
+    assert message.tool_calls[0]["args"] == {"path": "a.py"}
+    assert message.usage_metadata["output_tokens"] == 25
+
+
+def test_argumentless_tool_call_is_dispatched_at_end_of_stream() -> None:
+    dispatched = []
+    message = StreamOnlyLLM()._collect_stream(
+        iter([_tool_chunk(0, "", id="call_c", name="list_all")]),
+        on_tool_call=dispatched.append,
+    )
+    assert [call["function"]["arguments"] for call in dispatched] == ["{}"]
+    assert message.tool_calls[0]["args"] == {}
+
+
+def test_reads_after_a_write_in_the_same_response_are_not_started_early() -> None:
+    class WriteThenReadLLM(StreamOnlyLLM):
+        def invoke(self, messages, tools=None, on_tool_call=None):
+            if isinstance(messages[-1], ToolMessage):
+                return self._collect_stream(iter([AIMessageChunk(content="Done.")]), on_tool_call)
+
+            def chunks():
+                yield _tool_chunk(0, json.dumps({"path": "a.py", "content": "new"}), id="call_write", name="file_system")
+                yield _tool_chunk(1, json.dumps({"path": "a.py"}), id="call_read", name="file_system")
+                # Time for a read started early to finish before the write runs
+                time.sleep(0.05)
+            return self._collect_stream(chunks(), on_tool_call)
+
+    graph = AgentGraph(LLMConfig(llm_type="scripted", model_name="scripted", temperature=0.0))
+    graph.llm = WriteThenReadLLM()
+    with DevContainerStub() as stub:
+        stub.files["a.py"] = "old"
+        state = {"messages": [HumanMessage(content="Update a.py")], "chat_history": [], "session_id": "write-then-read"}
+        result = graph.run(state, budget=ExecutionBudget.unlimited(), context=RunContext(dev_container_url=stub.url))
+
+    read = next(msg for msg in result["messages"] if isinstance(msg, ToolMessage) and msg.tool_call_id == "call_read")
+    assert "new" in read.content and "old" not in read.content
+
+
+def test_interleaved_tool_calls_are_dispatched_in_order() -> None:
+    dispatched = []
+    StreamOnlyLLM()._collect_stream(
+        iter([
+            _tool_chunk(0, '{"path": ', id="call_a", name="file_system"),
+            _tool_chunk(1, '{"path": "b.py"}', id="call_b", name="file_system"),
+            _tool_chunk(0, '"a.py"}'),
+        ]),
+        on_tool_call=lambda call: dispatched.append(call["id"]),
+    )
+    assert dispatched == ["call_a", "call_b"]
+
+
+def test_long_arguments_are_parsed_once_complete(monkeypatch) -> None:
+    attempts = []
+    parses = base._parses
+    monkeypatch.setattr(base, "_parses", lambda arguments: attempts.append(arguments) or parses(arguments))
+    content = "".join(f"function f{i}() {{ return \"}}\"; }}\n" for i in range(500))
+    encoded = json.dumps({"path": "a.js", "content": content})
+    chunks = [_tool_chunk(0, encoded[i:i + 7], id="call_a" if i == 0 else None, name="file_system" if i == 0 else None) for i in range(0, len(encoded), 7)]
+
+    dispatched = []
+    StreamOnlyLLM()._collect_stream(iter(chunks), on_tool_call=dispatched.append)
+    assert len(attempts) == 1 and json.loads(dispatched[0]["function"]["arguments"])["content"] == content
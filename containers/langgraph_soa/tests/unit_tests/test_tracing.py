@@ -0,0 +1,40 @@
+import threading
+
+import pytest
+
+from src.observability.tracing import Tracer, TraceStore
+
+
+def test_spans_are_exported_as_chrome_trace_events() -> None:
+    tracer = Tracer()
+    with tracer.span("outer", category="graph") as args:
+        args["steps"] = 1
+        worker = threading.Thread(target=lambda: tracer.instant("first_token"), name="worker")
+        worker.start()
+        worker.join()
+    with pytest.raises(ValueError):
+        with tracer.span("failing"):
+            raise ValueError("boom")
+
+    trace = tracer.to_chrome_trace(request_id="r1")
+    events = {e["name"]: e for e in trace["traceEvents"] if e["ph"] != "M"}
+    assert events["outer"]["ph"] == "X" and events["outer"]["args"] == {"steps": 1}
+    assert events["outer"]["ts"] <= events["first_token"]["ts"] <= events["outer"]["ts"] + events["outer"]["dur"]
+    assert events["first_token"]["tid"] != events["outer"]["tid"]
+    assert events["failing"]["args"]["error"] == "ValueError"
+    assert {"worker", threading.current_thread().name} <= {e["args"]["name"] for e in trace["traceEvents"] if e["ph"] == "M"}
+    assert trace["otherData"] == {"request_id": "r1"}
+
+
+def test_store_keeps_only_slow_failed_or_forced_traces() -> None:
+    store = TraceStore(slow_threshold_seconds=60, max_traces=2)
+    assert not store.offer("fast", Tracer())
+    assert store.offer("forced", Tracer(), forced=True)
+    assert store.offer("failed", Tracer(), failed=True)
+    assert store.get("fast") is None
+
+    store.slow_threshold_seconds = 0
+    assert store.offer("slow", Tracer())
+    # The oldest trace is evicted once the store is full
+    assert store.get("forced") is None
+    assert store.get("slow")["otherData"]["request_id"] == "slow"
@@ -0,0 +1,58 @@
+import pytest
+from langchain_core.messages import HumanMessage
+
+from benchmarks.fakes import DevContainerStub
+from src.agent.graph import AgentGraph
+from src.config.llm_config import LLMConfig
+from src.runtime.budget import ExecutionBudget
+from src.runtime.context import RunContext
+from tools import agent_tools
+from tools.dev_container_client import DevContainerClient
+from tools.workspace_router import WorkspaceRouter
+
+
+def test_sessions_keep_the_target_they_name() -> None:
+    router = WorkspaceRouter("http://default:8030", routes={"static": "http://static:8030/"})
+    assert router.resolve("a") == "http://default:8030"
+    assert router.resolve("static") == "http://static:8030"
+    assert router.resolve("a", workspace="http://dev-1:8030/") == "http://dev-1:8030"
+    # Later runs and resumes of the session stay on its dev_container
+    assert router.resolve("a") == "http://dev-1:8030"
+
+    with pytest.raises(ValueError):
+        router.resolve("b", workspace="dev-1:8030")
+    with pytest.raises(ValueError, match="ORCHESTRATOR_URL"):
+        router.resolve("b", container_id="abc")
+
+
+def test_bindings_are_recalled_and_kept_while_in_use() -> None:
+    recorded = {"old": "http://dev-old:8030"}
+    active = {"busy"}
+    router = WorkspaceRouter("http://default:8030", max_sessions=2, recall=recorded.get, in_use=active.__contains__)
+    # After a restart the session continues where its runs were recorded
+    assert router.resolve("old") == "http://dev-old:8030"
+    assert router.resolve("new") == "http://default:8030"
+
+    router.resolve("busy", workspace="http://dev-1:8030")
+    router.resolve("other", workspace="http://dev-2:8030")
+    router.resolve("third", workspace="http://dev-3:8030")
+    # The least recently used idle session was dropped, the active one kept
+    assert router.bindings() == {"busy": "http://dev-1:8030", "third": "http://dev-3:8030"}
+
+
+def test_runs_drive_their_own_dev_container_through_separate_pools(monkeypatch) -> None:
+    client = DevContainerClient(pool_size=2)
+    monkeypatch.setattr(agent_tools, "dev_container", client)
+    graph = AgentGraph(LLMConfig(llm_type="scripted", model_name="scripted", temperature=0.0))
+    graph.speculative_tool_calls = False
+
+    with DevContainerStub() as first, DevContainerStub() as second:
+        for session_id, stub in (("one", first), ("two", second)):
+            state = {"messages": [HumanMessage(content="Build it [steps=1]")], "chat_history": [], "session_id": session_id}
+            graph.run(state, budget=ExecutionBudget.unlimited(), context=RunContext(dev_container_url=stub.url))
+
+        assert list(first.files) == ["src/module_0.py"] and list(second.files) == ["src/module_0.py"]
+        health = client.health()
+        assert set(health) == {first.url, second.url}
+        assert all(target["healthy"] and target["requests"] >= 1 for target in health.values())
+        assert client.session_for(first.url) is not client.session_for(second.url)
@@ -1,7 +1,7 @@
 # file: agent_tools.py
 import requests
 from pydantic import Field
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Set, Tuple
 import logging
 import os
 
@@ -9,16 +9,32 @@ from langchain.tools import BaseTool
 from langchain.callbacks.manager import CallbackManagerForToolRun
 import requests
 import json
+import shlex
 from pydantic import BaseModel, Field
 
-# Configure logging
-logging.basicConfig(level=logging.DEBUG)
+from src.observability import metrics
+from tools.command_cache import get_command_cache
+from tools.dev_container_client import DevContainerUnavailable, dev_container, resolve_base_url
+from tools.rendering import compact_command_output, compact_file_result, compact_test_report, render
+from tools.test_impact import (
+    FIND_TESTS_COMMAND, JEST_COMMAND, PYTEST_COMMAND, TestFileResult, WorkspaceTests,
+    affected_tests, excerpt, get_test_impact_tracker, is_test_file, module_name, normalize_path, parse_jest, parse_pytest, summarize,
+)
+from tools.workspace_router import default_dev_container_url
+
 logger = logging.getLogger(__name__)
 
 class FileOperationInput(BaseModel):
     path: str = Field(..., description="File or directory path relative to app directory")
     content: str | None = Field(None, description="Content for file operations")
     is_directory: bool | None = Field(False, description="Whether the path is a directory")
+    start_line: int | None = Field(None, description="Read from this line (1-based)")
+    end_line: int | None = Field(None, description="Read up to and including this line")
+    offset: int | None = Field(None, description="Read from this byte offset")
+    length: int | None = Field(None, description="Number of bytes to read from offset")
+    match: str | None = Field(None, description="Read only the lines matching this regular expression, with context_lines around each")
+    context_lines: int | None = Field(None, description="Lines of context around each match (default 5)")
+    full: bool | None = Field(False, description="Read a large file in full instead of its outline")
 
 class MoveOperationInput(BaseModel):
     source: str = Field(..., description="Source path")
@@ -28,15 +44,53 @@ class CommandExecutionInput(BaseModel):
     command: str = Field(..., description="Command to execute")
     args: List[str] = Field(default_factory=list, description="Command arguments")
 
+class RunTestsInput(BaseModel):
+    paths: List[str] = Field(default_factory=list, description="Source or test files to test, in addition to the files changed since the last test run")
+    rerun: bool | None = Field(False, description="Run the tests even if their files have not changed since their last result")
+
+def read_params(
+    start_line: int | None = None,
+    end_line: int | None = None,
+    offset: int | None = None,
+    length: int | None = None,
+    match: str | None = None,
+    context_lines: int | None = None,
+    full: bool | None = False,
+) -> Dict[str, str]:
+    """Query parameters of a ranged read from the dev_container; empty for a plain read."""
+    params = {}
+    if start_line is not None or end_line is not None:
+        params["start_line"] = str(start_line or 1)
+        if end_line is not None:
+            params["end_line"] = str(end_line)
+    elif offset is not None or length is not None:
+        params["offset"] = str(offset or 0)
+        if length is not None:
+            params["length"] = str(length)
+    elif match:
+        params["match"] = match
+        if context_lines is not None:
+            params["context"] = str(context_lines)
+    elif full:
+        params["full"] = "true"
+    return params
+
 class FileSystemTool(BaseTool):
     name: str = "file_system"
     description: str = """Tool for managing files and directories. Supports:
-    1. Read file/directory: Pass only path
+    1. Read file/directory: Pass only path. Large files return their size, line count
+       and an outline of declarations; then read the part you need with start_line/end_line,
+       offset/length, or match (with context_lines). Pass full=True only if the whole file is needed.
+       File contents may be shown with each line prefixed by its line number and a tab; the numbers are not part of the file
     2. Create directory: Pass path and is_directory=True
     3. Create/Update file: Pass path and content
     4. Delete: Pass path and content='' (empty string) and is_directory flag"""
     args_schema: type[BaseModel] = FileOperationInput
-    base_url: str = "http://host.docker.internal:8030"  # Host machine URL
+    base_url: str = Field(default_factory=default_dev_container_url)  # Used when the session has no dev_container of its own
+
+    def is_read_only(self, args: Dict[str, Any]) -> bool:
+        """Whether a call only reads, so it can be started before the model finishes its turn."""
+        return args.get("content") is None and not args.get("is_directory")
 
     def _agenerate(
         self,
@@ -44,6 +98,7 @@ class FileSystemTool(BaseTool):
         content: str | None = None,
         is_directory: bool = False,
         run_manager: CallbackManagerForToolRun | None = None,
+        **read_options: Any,
     ) -> str:
         """Use the tool asynchronously."""
         raise NotImplementedError("FileSystemTool does not support async")
@@ -53,90 +108,107 @@ class FileSystemTool(BaseTool):
         path: str,
         content: str | None = None,
         is_directory: bool = False,
+        start_line: int | None = None,
+        end_line: int | None = None,
+        offset: int | None = None,
+        length: int | None = None,
+        match: str | None = None,
+        context_lines: int | None = None,
+        full: bool | None = False,
         run_manager: CallbackManagerForToolRun | None = None,
     ) -> str:
         """Run the file system tool."""
+        base_url = resolve_base_url(self.base_url)
         try:
-            logger.debug(f"FileSystemTool._run called with: path='{path}', content={content!r}, is_directory={is_directory}")
+            logger.debug("FileSystemTool._run called with: path='%s', content=%r, is_directory=%s", path, content, is_directory)
             
             if content == "":
                 # Delete operation (content must be empty string)
                 if is_directory:
                     # Use /delete endpoint for directories
-                    url = f"{self.base_url}/delete"
-                    logger.debug(f"Deleting directory at URL: {url}")
-                    logger.debug(f"Request data: {{'path': {path!r}}}")
-                    response = requests.delete(url, json={"path": path})
+                    url = f"{base_url}/delete"
+                    logger.debug("Deleting directory at URL: %s", url)
+                    logger.debug("Request data: {'path': %r}", path)
+                    response = dev_container.delete(url, json={"path": path})
                 else:
                     # Use /files endpoint for files
-                    url = f"{self.base_url}/files/{path.lstrip('/')}"
-                    logger.debug(f"Deleting file at URL: {url}")
-                    response = requests.delete(url)
+                    url = f"{base_url}/files/{path.lstrip('/')}"
+                    logger.debug("Deleting file at URL: %s", url)
+                    response = dev_container.delete(url)
                 
-                logger.debug(f"Delete response status: {response.status_code}")
-                logger.debug(f"Delete response headers: {dict(response.headers)}")
-                try:
-                    logger.debug(f"Delete response body: {response.json()}")
-                except:
-                    logger.debug(f"Delete response text: {response.text}")
+                logger.debug("Delete response status: %s", response.status_code)
+                logger.debug("Delete response headers: %s", response.headers)
+                if logger.isEnabledFor(logging.DEBUG):
+                    try:
+                        logger.debug("Delete response body: %s", response.json())
+                    except:
+                        logger.debug("Delete response text: %s", response.text)
                 
                 if response.status_code == 200:
+                    get_test_impact_tracker().record_change(base_url, path)
                     return json.dumps({"message": "Deleted successfully"})
             elif content is not None or is_directory:
                 # Create/Update file or directory
-                url = f"{self.base_url}/files/{path.lstrip('/')}"
+                url = f"{base_url}/files/{path.lstrip('/')}"
                 data = {"content": content or "", "isDirectory": is_directory}
                 
                 # Check if file exists to determine if we should create or update
                 try:
-                    check_response = requests.get(url)
+                    check_response = dev_container.get(url, params={"meta": "true"})
                     file_exists = check_response.status_code == 200
                 except:
                     file_exists = False
                 
-                logger.debug(f"File exists: {file_exists}")
+                logger.debug("File exists: %s", file_exists)
                 if file_exists and not is_directory:
                     # Update existing file with PUT
-                    logger.debug(f"Updating file at URL: {url}")
-                    logger.debug(f"Request data: {data}")
-                    response = requests.put(url, json=data)
+                    logger.debug("Updating file at URL: %s", url)
+                    logger.debug("Request data: %s", data)
+                    response = dev_container.put(url, json=data)
                 else:
                     # Create new file/directory with POST
-                    logger.debug(f"Creating file/directory at URL: {url}")
-                    logger.debug(f"Request data: {data}")
-                    response = requests.post(url, json=data)
+                    logger.debug("Creating file/directory at URL: %s", url)
+                    logger.debug("Request data: %s", data)
+                    response = dev_container.post(url, json=data)
             else:
                 # Read file or directory (content is None and not is_directory)
-                url = f"{self.base_url}/files/{path.lstrip('/')}"
-                logger.debug(f"Reading from URL: {url}")
-                response = requests.get(url)
+                url = f"{base_url}/files/{path.lstrip('/')}"
+                params = read_params(start_line, end_line, offset, length, match, context_lines, full)
+                logger.debug("Reading from URL: %s with %s", url, params)
+                response = dev_container.get(url, params=params or None)
             
             response.raise_for_status()
+            if content is not None and not is_directory:
+                get_test_impact_tracker().record_change(base_url, path)
             try:
-                result = json.dumps(response.json(), indent=2)
-                logger.debug(f"Operation successful. Result: {result}")
-                return result
+                payload = response.json()
+                result = json.dumps(payload, indent=2)
+                logger.debug("Operation successful. Result: %s", result)
+                return render(self.name, result, lambda: compact_file_result(payload))
             except json.JSONDecodeError:
-                logger.error(f"Failed to decode JSON response: {response.text}")
+                logger.error("Failed to decode JSON response: %s", response.text)
                 return f"Error: Invalid JSON response: {response.text}"
             
+        except DevContainerUnavailable as e:
+            logger.warning("Skipping %s: %s", self.name, e)
+            return e.tool_error()
         except requests.exceptions.RequestException as e:
             error_msg = f"Error performing file operation: {str(e)}"
             logger.error(error_msg)
-            if hasattr(e, 'response'):
-                logger.error(f"Response status: {e.response.status_code}")
-                logger.error(f"Response headers: {dict(e.response.headers)}")
+            if e.response is not None:
+                logger.error("Response status: %s", e.response.status_code)
+                logger.error("Response headers: %s", e.response.headers)
                 try:
-                    logger.error(f"Response body: {e.response.json()}")
+                    logger.error("Response body: %s", e.response.json())
                 except:
-                    logger.error(f"Response text: {e.response.text}")
+                    logger.error("Response text: %s", e.response.text)
             return error_msg
 
 class MoveFileTool(BaseTool):
     name: str = "move_file"
     description: str = "Move a file or directory from source to destination. If the destination directory doesn't exist, it will be created."
     args_schema: type[BaseModel] = MoveOperationInput
-    base_url: str = "http://host.docker.internal:8030"
+    base_url: str = Field(default_factory=default_dev_container_url)
 
     def _run(
         self,
@@ -145,50 +217,56 @@ class MoveFileTool(BaseTool):
         run_manager: CallbackManagerForToolRun | None = None,
     ) -> str:
         """Run the move file tool."""
-        url = f"{self.base_url}/move"
+        base_url = resolve_base_url(self.base_url)
+        url = f"{base_url}/move"
         data = {"sourcePath": source, "targetPath": destination}
         
         try:
             # First ensure the target directory exists
             target_dir = os.path.dirname(destination)
             if target_dir:  # Only create if there's a directory part
-                logger.debug(f"Ensuring target directory exists: {target_dir}")
-                dir_url = f"{self.base_url}/files/{target_dir.lstrip('/')}"
-                dir_response = requests.post(dir_url, json={"content": "", "isDirectory": True})
+                logger.debug("Ensuring target directory exists: %s", target_dir)
+                dir_url = f"{base_url}/files/{target_dir.lstrip('/')}"
+                dir_response = dev_container.post(dir_url, json={"content": "", "isDirectory": True})
                 dir_response.raise_for_status()
             
             # Now move the file
-            logger.debug(f"Moving file/directory from {source} to {destination}")
-            logger.debug(f"Request URL: {url}")
-            logger.debug(f"Request data: {data}")
+            logger.debug("Moving file/directory from %s to %s", source, destination)
+            logger.debug("Request URL: %s", url)
+            logger.debug("Request data: %s", data)
             
-            response = requests.post(url, json=data)
-            logger.debug(f"Response status: {response.status_code}")
-            logger.debug(f"Response headers: {dict(response.headers)}")
-            try:
-                logger.debug(f"Response body: {response.json()}")
-            except:
-                logger.debug(f"Response text: {response.text}")
+            response = dev_container.post(url, json=data)
+            logger.debug("Response status: %s", response.status_code)
+            logger.debug("Response headers: %s", response.headers)
+            if logger.isEnabledFor(logging.DEBUG):
+                try:
+                    logger.debug("Response body: %s", response.json())
+                except:
+                    logger.debug("Response text: %s", response.text)
             
             response.raise_for_status()
+            get_test_impact_tracker().record_change(base_url, source, destination)
             return f"Successfully moved {source} to {destination}"
+        except DevContainerUnavailable as e:
+            logger.warning("Skipping %s: %s", self.name, e)
+            return e.tool_error()
         except requests.exceptions.RequestException as e:
             error_msg = f"Error moving file: {str(e)}"
             logger.error(error_msg)
-            if hasattr(e, 'response'):
-                logger.error(f"Response status: {e.response.status_code}")
-                logger.error(f"Response headers: {dict(e.response.headers)}")
+            if e.response is not None:
+                logger.error("Response status: %s", e.response.status_code)
+                logger.error("Response headers: %s", e.response.headers)
                 try:
-                    logger.error(f"Response body: {e.response.json()}")
+                    logger.error("Response body: %s", e.response.json())
                 except:
-                    logger.error(f"Response text: {e.response.text}")
+                    logger.error("Response text: %s", e.response.text)
             return error_msg
 
 class CommandExecutionTool(BaseTool):
     name: str = "execute_command"
     description: str = "Execute a shell command in the app directory"
     args_schema: type[BaseModel] = CommandExecutionInput
-    base_url: str = "http://host.docker.internal:8030"
+    base_url: str = Field(default_factory=default_dev_container_url)
 
     def _run(
         self,
@@ -197,22 +275,207 @@ class CommandExecutionTool(BaseTool):
         run_manager: CallbackManagerForToolRun | None = None,
     ) -> str:
         """Run the command execution tool."""
-        url = f"{self.base_url}/execute"
-        data = {"command": command, "args": args or []}
-        
+        base_url = resolve_base_url(self.base_url)
+        # Read-only commands are answered from the cache while the files they read are unchanged
+        command_line = " ".join([command] + list(args or []))
+        scopes = get_command_cache().scopes(command_line)
+        key = None
         try:
-            response = requests.post(url, json=data)
-            response.raise_for_status()
-            return response.text
+            cached = None
+            if scopes is not None:
+                key = self._cache_key(base_url, command_line, scopes)
+                cached = get_command_cache().get(key) if key else None
+                metrics.record_command_cache("hit" if cached is not None else "miss")
+            if cached is not None:
+                logger.debug("Serving %r from the command cache", command_line)
+                text, error_msg = cached
+            else:
+                response = dev_container.execute(base_url, command, args or [], read_only=scopes is not None)
+                text, error_msg = response.text, None
+                try:
+                    response.raise_for_status()
+                except requests.exceptions.HTTPError as e:
+                    # The command ran and failed; anything else is an error of the dev_container
+                    if response.status_code != 500:
+                        raise
+                    error_msg = f"Error executing command: {str(e)}"
+                    logger.error(error_msg)
+                # A command that exited with an error fails the same way until its files change
+                if key:
+                    get_command_cache().put(key, (text, error_msg))
+            return self._render(text, error_msg)
+        except DevContainerUnavailable as e:
+            logger.warning("Skipping %s: %s", self.name, e)
+            return e.tool_error()
         except requests.exceptions.RequestException as e:
             error_msg = f"Error executing command: {str(e)}"
             logger.error(error_msg)
             return error_msg
 
+    def _render(self, text: str, error_msg: Optional[str]) -> str:
+        """Command result in the run's format; compactly, failed commands show their output too."""
+        try:
+            body = json.loads(text)
+        except ValueError:
+            body = None
+        if not isinstance(body, dict):
+            body = {"stdout": text}
+
+        def compact() -> str:
+            if error_msg and not isinstance(body.get("code"), int):
+                return f"Error executing command: {body.get('error') or error_msg}"
+            return compact_command_output(body.get("stdout", ""), body.get("stderr", ""), body.get("code", 0) if error_msg else 0)
+
+        return render(self.name, error_msg or text, compact)
+
+    def _cache_key(self, base_url: str, command_line: str, scopes: List[str]) -> str | None:
+        """Cache key of a command for the current state of the workspace.
+        
+        Returns:
+            The key, or None if the dev_container has no change journal
+        """
+        cache = get_command_cache()
+        response = dev_container.get(f"{base_url}/workspace/changes", params={"since": str(cache.since(base_url))})
+        if response.status_code == 404:
+            return None
+        response.raise_for_status()
+        return cache.key(base_url, command_line, scopes, response.json())
+
+class RunTestsTool(BaseTool):
+    name: str = "run_tests"
+    description: str = """Run the tests affected by your changes and get a compact report: pass/fail per test file
+    and an excerpt of each failure. Tests the files changed with file_system and move_file since the last
+    run_tests call, plus any paths given; after changing files with execute_command, pass the paths to test.
+    Tests whose files have not changed are reported from their last result unless rerun=True. Use this
+    instead of running whole test suites with execute_command."""
+    args_schema: type[BaseModel] = RunTestsInput
+    base_url: str = Field(default_factory=default_dev_container_url)
+
+    def _run(
+        self,
+        paths: List[str] = None,
+        rerun: bool | None = False,
+        run_manager: CallbackManagerForToolRun | None = None,
+    ) -> str:
+        """Run the test tool."""
+        base_url = resolve_base_url(self.base_url)
+        tracker = get_test_impact_tracker()
+        workspace = tracker.workspace(base_url)
+        requested = [path for path in (normalize_path(path) for path in paths or []) if path]
+        changed: List[str] = []
+        try:
+            # Commands and the terminal may have changed files behind the file tools' back
+            journal = self._journal(base_url, workspace.journal_version)
+            reset = journal is not None and tracker.apply_journal(base_url, journal)
+            changed = tracker.take_changes(base_url)
+            if not changed and not requested:
+                if reset:
+                    return json.dumps({"status": "unknown_changes", "message": "Files may have changed through commands or the terminal; pass paths to test specific files"})
+                return json.dumps({"status": "no_changes", "message": "No files changed since the last test run; pass paths to test specific files"})
+            
+            test_files = self._test_files(base_url, workspace)
+            names = {module_name(path) for path in changed + requested if not is_test_file(path)}
+            referencing = self._referencing(base_url, names, test_files)
+            by_change = affected_tests(changed, test_files, referencing)
+            by_request = affected_tests(requested, test_files, referencing)
+            
+            # Tests of changed files always run; requested tests only without a result to reuse
+            to_run = {test for tests in by_change.values() for test in tests}
+            requested_tests = {test for tests in by_request.values() for test in tests}
+            to_run |= {test for test in requested_tests if rerun or test not in workspace.results}
+            cached = requested_tests - to_run
+            results = {test: workspace.results[test] for test in cached}
+            for test, result in self._run_tests(base_url, sorted(to_run)).items():
+                results[test] = result
+                if result.status == "error":
+                    workspace.results.pop(test, None)
+                else:
+                    workspace.results[test] = result
+            if to_run and journal is not None:
+                # Running the tests resets the journal; what they write themselves does not invalidate their results
+                tracker.sync_journal(base_url, self._journal(base_url, workspace.journal_version) or journal)
+            
+            untested = [path for path, tests in {**by_change, **by_request}.items() if not tests]
+            if not results:
+                return json.dumps({"status": "no_tests", "changed_without_tests": sorted(untested)})
+            report = summarize(results, to_run, cached, untested)
+            return render(self.name, json.dumps(report), lambda: compact_test_report(report))
+        except DevContainerUnavailable as e:
+            tracker.record_change(base_url, *changed)
+            logger.warning("Skipping %s: %s", self.name, e)
+            return e.tool_error()
+        except requests.exceptions.RequestException as e:
+            # The changes are still untested
+            tracker.record_change(base_url, *changed)
+            error_msg = f"Error running tests: {str(e)}"
+            logger.error(error_msg)
+            return error_msg
+
+    def _journal(self, base_url: str, since: int) -> Optional[Dict[str, Any]]:
+        """Changes since a version of the dev_container's change journal, or None if it has none."""
+        response = dev_container.get(f"{base_url}/workspace/changes", params={"since": str(since)})
+        if response.status_code == 404:
+            return None
+        response.raise_for_status()
+        return response.json()
+
+    def _test_files(self, base_url: str, workspace: WorkspaceTests) -> List[str]:
+        """Test files of the workspace, found once and again after test files changed."""
+        if workspace.test_files is None:
+            _, output = self._shell(base_url, FIND_TESTS_COMMAND, read_only=True)
+            workspace.test_files = sorted({normalize_path(line) for line in output.splitlines() if is_test_file(line.strip())})
+            logger.debug("Found %s test files in %s", len(workspace.test_files), base_url)
+        return workspace.test_files
+
+    def _referencing(self, base_url: str, names: Set[str], test_files: List[str]) -> Dict[str, Set[str]]:
+        """Test files mentioning each module name, e.g. in an import."""
+        referencing: Dict[str, Set[str]] = {}
+        if not names or not test_files:
+            return referencing
+        for name in sorted(names):
+            # grep exits with 1 when nothing matches
+            code, output = self._shell(base_url, f"grep -lw -- {shlex.quote(name)} {' '.join(shlex.quote(test) for test in test_files)}", read_only=True)
+            if code in (0, 1):
+                referencing[name] = {normalize_path(line) for line in output.splitlines() if line.strip()}
+        return referencing
+
+    def _run_tests(self, base_url: str, tests: List[str]) -> Dict[str, TestFileResult]:
+        """Run test files with pytest or jest and read their results."""
+        results: Dict[str, TestFileResult] = {}
+        python_tests = [test for test in tests if test.endswith(".py")]
+        js_tests = [test for test in tests if not test.endswith(".py")]
+        if python_tests:
+            _, output = self._shell(base_url, f"{PYTEST_COMMAND} {' '.join(shlex.quote(test) for test in python_tests)}")
+            results.update(parse_pytest(output, python_tests))
+        if js_tests:
+            _, output = self._shell(base_url, f"{JEST_COMMAND} {' '.join(shlex.quote(test) for test in js_tests)}")
+            js_results = parse_jest(output, js_tests)
+            for test in js_tests:
+                results[test] = js_results.get(test) or TestFileResult(status="error", failures=[{"test": test, "excerpt": excerpt(output)}])
+        return results
+
+    def _shell(self, base_url: str, command: str, read_only: bool = False) -> Tuple[int, str]:
+        """Run a shell command in the dev_container.
+        
+        Returns:
+            The exit code and the combined output
+        """
+        response = dev_container.execute(base_url, command, [], read_only=read_only)
+        try:
+            body = response.json()
+        except ValueError:
+            body = {}
+        # A command that exits with an error is reported as 500 with its exit code
+        if response.status_code == 500 and isinstance(body, dict) and isinstance(body.get("code"), int):
+            return body["code"], f"{body.get('stdout', '')}{body.get('stderr', '')}"
+        response.raise_for_status()
+        return 0, f"{body.get('stdout', '')}{body.get('stderr', '')}"
+
 def get_agent_tools() -> List[BaseTool]:
     """Get a list of all available agent tools."""
     return [
         FileSystemTool(),
         MoveFileTool(),
-        CommandExecutionTool()
+        CommandExecutionTool(),
+        RunTestsTool()
     ]
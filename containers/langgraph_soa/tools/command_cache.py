@@ -0,0 +1,163 @@
+import hashlib
+import logging
+import os
+import posixpath
+import re
+import shlex
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Commands that only read the workspace, so their output is the same until it changes
+DEFAULT_ALLOWLIST = (
+    r"^(ls|cat|head|tail|wc|stat|file|tree|du)(\s|$)",
+    r"^git (status|diff|log|show|ls-files)(\s|$)",
+    r"^(npx )?tsc\s(?=.*--noEmit)",
+    r"^(npx )?eslint(\s|$)(?!.*--fix)",
+    r"^(python -m )?(flake8|pylint|mypy)(\s|$)",
+    r"^(python -m )?ruff check(\s|$)(?!.*--fix)",
+)
+# Commands whose output only depends on the paths they are given
+_PATH_SCOPED = {"ls", "cat", "head", "tail", "wc", "stat", "file", "tree", "du"}
+# Pipes, redirects, chaining and substitutions can do anything
+_SHELL_SYNTAX = re.compile(r"[;&|<>`$(){}\n]")
+# Flags that write the output to a file, e.g. git diff --output=x, tree -o x, eslint -o x
+_OUTPUT_FLAG = re.compile(r"(^|\s)(-o|--output)")
+
+@dataclass
+class WorkspaceState:
+    """Changes of one workspace, as reported by its dev_container's change journal."""
+    instance: Optional[str] = None
+    version: int = 0
+    # Bumped whenever anything may have changed
+    epoch: int = 0
+    # Content hash of each changed path; "-" for deleted paths
+    hashes: Dict[str, str] = field(default_factory=dict)
+
+    def apply(self, journal: Dict[str, Any]) -> None:
+        """Apply the changes reported since ``version``."""
+        if journal.get("reset") or journal.get("instance") != self.instance:
+            logger.debug("Workspace may have changed anywhere since version %s", self.version)
+            self.instance = journal.get("instance")
+            self.epoch += 1
+            self.hashes.clear()
+        for change in journal.get("changes") or []:
+            path = change["path"]
+            # A change of a directory replaces what was known about its contents
+            for known in [known for known in self.hashes if known.startswith(f"{path}/")]:
+                del self.hashes[known]
+            hash_ = change.get("hash")
+            self.hashes[path] = "-" if hash_ is None else f"*{journal['version']}" if hash_ == "*" else hash_
+        self.version = journal.get("version", self.version)
+
+    def digest(self, scopes: Sequence[str]) -> str:
+        """Hash of the workspace subtrees a command reads."""
+        digest = hashlib.sha256(f"{self.instance}:{self.epoch}".encode())
+        for path, hash_ in sorted(self.hashes.items()):
+            if any(_overlaps(path, scope) for scope in scopes):
+                digest.update(f"{path}\0{hash_}\n".encode())
+        return digest.hexdigest()
+
+class CommandCache:
+    """Caches the output of read-only commands until the files they read change.
+
+    Commands matching the allowlist are cached under the command line and a
+    hash of the workspace subtrees they read: the paths given to listing and
+    reading commands, the whole workspace for linters and type checkers. The
+    hash is kept up to date from the dev_container's change journal, which
+    reports the content hash of every file written through the file tools
+    and resets when a command, terminal or upload may have changed anything.
+    """
+
+    def __init__(self, enabled: bool = False, allowlist: Sequence[str] = DEFAULT_ALLOWLIST, max_entries: int = 256):
+        self.enabled = enabled
+        self.allowlist = [re.compile(pattern) for pattern in allowlist]
+        self.max_entries = max_entries
+        self._workspaces: Dict[str, WorkspaceState] = {}
+        # Response body and, for commands that failed, the error reported for them
+        self._results: 'OrderedDict[str, Tuple[str, Optional[str]]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> 'CommandCache':
+        """Create a cache configured by COMMAND_CACHE_* environment variables.
+
+        COMMAND_CACHE_ALLOWLIST adds regular expressions, separated by
+        semicolons, for further commands to cache.
+        """
+        extra = [pattern for pattern in os.getenv("COMMAND_CACHE_ALLOWLIST", "").split(";") if pattern.strip()]
+        return cls(
+            enabled=os.getenv("COMMAND_CACHE_ENABLED", "false").lower() == "true",
+            allowlist=list(DEFAULT_ALLOWLIST) + extra,
+            max_entries=int(os.getenv("COMMAND_CACHE_SIZE", "256")),
+        )
+
+    def scopes(self, command_line: str) -> Optional[List[str]]:
+        """Workspace paths a command reads, or None if it is not cacheable."""
+        if not self.enabled or _SHELL_SYNTAX.search(command_line) or _OUTPUT_FLAG.search(command_line):
+            return None
+        if not any(pattern.search(command_line) for pattern in self.allowlist):
+            return None
+        try:
+            args = shlex.split(command_line)
+        except ValueError:
+            return None
+        if args[0] not in _PATH_SCOPED:
+            return ["."]
+        paths = [arg for arg in args[1:] if not arg.startswith("-")]
+        if not paths or any(re.search(r"[*?\[]", path) or _normalize(path).startswith("..") for path in paths):
+            return ["."]
+        return [_normalize(path) for path in paths]
+
+    def key(self, base_url: str, command_line: str, scopes: Sequence[str], journal: Dict[str, Any]) -> str:
+        """Cache key of a command, after applying the workspace's latest changes."""
+        with self._lock:
+            state = self._workspaces.setdefault(base_url, WorkspaceState())
+            state.apply(journal)
+            digest = state.digest(scopes)
+        return hashlib.sha256(f"{base_url}\0{command_line}\0{digest}".encode()).hexdigest()
+
+    def since(self, base_url: str) -> int:
+        """Journal version of the workspace's last known changes."""
+        with self._lock:
+            state = self._workspaces.get(base_url)
+            return state.version if state else 0
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._results)
+
+    def get(self, key: str) -> Optional[Tuple[str, Optional[str]]]:
+        with self._lock:
+            result = self._results.get(key)
+            if result is not None:
+                self._results.move_to_end(key)
+            return result
+
+    def put(self, key: str, result: Tuple[str, Optional[str]]) -> None:
+        with self._lock:
+            self._results[key] = result
+            self._results.move_to_end(key)
+            while len(self._results) > self.max_entries:
+                self._results.popitem(last=False)
+
+_cache: Optional[CommandCache] = None
+_cache_lock = threading.Lock()
+
+def get_command_cache() -> CommandCache:
+    """Get the process-wide command result cache."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = CommandCache.from_env()
+        return _cache
+
+def _normalize(path: str) -> str:
+    return posixpath.normpath(path.strip("/")) or "."
+
+def _overlaps(path: str, scope: str) -> bool:
+    """Whether a change of path can affect what a command reading scope sees."""
+    return scope == "." or path in (".", scope) or path.startswith(f"{scope}/") or scope.startswith(f"{path}/")
@@ -0,0 +1,401 @@
+import http.client
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlencode, urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from src.observability import metrics
+from src.runtime.cassette import Cassette, get_cassette
+from src.runtime.circuit_breaker import CircuitBreaker, CircuitOpen, CircuitState
+from src.runtime.context import get_run_context
+
+logger = logging.getLogger(__name__)
+
+# Statuses of a dev_container that is restarting or behind an overloaded proxy
+UNAVAILABLE_STATUSES = (502, 503, 504)
+
+class DevContainerUnavailable(requests.exceptions.ConnectionError):
+    """Raised without contacting a dev_container whose circuit is open."""
+
+    def __init__(self, target: str, retry_after: float):
+        super().__init__(f"dev_container {target} is unavailable, retry in {retry_after:.0f}s")
+        self.target = target
+        self.retry_after = retry_after
+
+    def tool_error(self) -> str:
+        """Tool result that tells the agent to stop calling the dev_container for now."""
+        return json.dumps({
+            "error": "dev_container_unavailable",
+            "retry_after_seconds": round(self.retry_after),
+            "message": "The development container is not responding, so no file or command tools can run. "
+                       "Do not retry tool calls now; tell the user the workspace is unavailable.",
+        })
+
+@dataclass
+class Timeouts:
+    """Timeouts in seconds of the requests to one dev_container.
+
+    Commands run as long as they take, so ``/execute`` gets its own, longer
+    read timeout; None waits indefinitely.
+    """
+    connect: float = 5.0
+    read: float = 60.0
+    execute: Optional[float] = 900.0
+
+    @classmethod
+    def from_env(cls, target: str) -> 'Timeouts':
+        """Timeouts of a target from DEV_CONTAINER_*_TIMEOUT environment variables.
+
+        DEV_CONTAINER_TIMEOUTS overrides them per target, as comma-separated
+        ``target=connect:read:execute`` entries; an empty field keeps the default.
+        """
+        execute = os.getenv("DEV_CONTAINER_EXECUTE_TIMEOUT", "900")
+        timeouts = cls(
+            connect=float(os.getenv("DEV_CONTAINER_CONNECT_TIMEOUT", "5")),
+            read=float(os.getenv("DEV_CONTAINER_READ_TIMEOUT", "60")),
+            execute=float(execute) if execute else None,
+        )
+        for item in filter(None, os.getenv("DEV_CONTAINER_TIMEOUTS", "").split(",")):
+            url, values = item.split("=", 1)
+            if _target(url.strip()) != target:
+                continue
+            connect, read, execute = (values.split(":") + ["", ""])[:3]
+            timeouts.connect = float(connect) if connect else timeouts.connect
+            timeouts.read = float(read) if read else timeouts.read
+            timeouts.execute = float(execute) if execute else timeouts.execute
+        return timeouts
+
+    def for_url(self, url: str, limit: Optional[float] = None) -> Tuple[float, Optional[float]]:
+        """Connect and read timeout of a request, as passed to requests.
+
+        Args:
+            url: URL of the request
+            limit: Seconds the request may take at most, e.g. the time left
+                before the run's deadline
+        """
+        read = self.execute if _is_execute(url) else self.read
+        if limit is None or (read is not None and read <= limit):
+            return (self.connect, read)
+        # Without any time left the request times out at once; requests rejects 0
+        limit = max(limit, 0.001)
+        return (min(self.connect, limit), limit)
+
+@dataclass
+class TargetHealth:
+    """Request outcomes of one dev_container."""
+    requests: int = 0
+    failures: int = 0
+    consecutive_failures: int = 0
+    # Moving average of the request latency
+    latency_ms: float = 0.0
+    last_error: Optional[str] = None
+    last_success_at: Optional[float] = None
+    last_failure_at: Optional[float] = None
+
+    @property
+    def healthy(self) -> bool:
+        return self.consecutive_failures == 0
+
+class DevContainerClient:
+    """HTTP client for the dev_container API shared by the agent tools.
+
+    Every request checks the cancellation token of the active run first, and
+    running commands are killed in the dev_container when the run is cancelled.
+    Each dev_container (scheme, host and port) gets its own connection pool of
+    at most ``pool_size`` connections, its own health record and its own
+    circuit breaker; the pools of the least recently used targets are closed
+    beyond ``max_targets``. While a circuit is open, requests fail fast with
+    DevContainerUnavailable, and the first request after the open period
+    probes ``/server/status`` before it is sent. Requests time out as set
+    by the target's ``Timeouts``, or earlier at the active run's deadline; a
+    timeout of the target's own counts as a failure of the target.
+    With a cassette, requests are recorded, or served from the recording
+    without contacting the dev_container.
+    """
+
+    def __init__(
+        self,
+        cassette: Optional[Cassette] = None,
+        pool_size: int = 10,
+        max_targets: int = 64,
+        breaker_factory: Callable[[str], CircuitBreaker] = lambda target: CircuitBreaker(target),
+        probe_timeout: float = 2.0,
+        timeouts_factory: Callable[[str], Timeouts] = lambda target: Timeouts(),
+    ):
+        self.cassette = cassette
+        self.pool_size = pool_size
+        self.max_targets = max_targets
+        self.breaker_factory = breaker_factory
+        self.probe_timeout = probe_timeout
+        self.timeouts_factory = timeouts_factory
+        self._sessions: 'OrderedDict[str, requests.Session]' = OrderedDict()
+        self._health: Dict[str, TargetHealth] = {}
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._timeouts: Dict[str, Timeouts] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, cassette: Optional[Cassette] = None) -> 'DevContainerClient':
+        """Create a client configured from DEV_CONTAINER_* environment variables.
+
+        DEV_CONTAINER_POOL_SIZE and DEV_CONTAINER_MAX_TARGETS size the pools;
+        DEV_CONTAINER_BREAKER_* configure the circuit breakers and
+        DEV_CONTAINER_*_TIMEOUT(S) the request timeouts.
+        """
+        return cls(
+            cassette,
+            pool_size=int(os.getenv("DEV_CONTAINER_POOL_SIZE", "10")),
+            max_targets=int(os.getenv("DEV_CONTAINER_MAX_TARGETS", "64")),
+            breaker_factory=lambda target: CircuitBreaker.from_env("DEV_CONTAINER_BREAKER", target),
+            timeouts_factory=Timeouts.from_env,
+        )
+
+    def session_for(self, url: str) -> requests.Session:
+        """Get the connection pool of the dev_container a URL points at."""
+        target = _target(url)
+        with self._lock:
+            session = self._sessions.get(target)
+            if session is not None:
+                self._sessions.move_to_end(target)
+                return session
+            session = requests.Session()
+            # Requests beyond the pool size wait for a free connection instead of opening more
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, pool_block=True)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            self._sessions[target] = session
+            evicted = []
+            while len(self._sessions) > self.max_targets:
+                evicted.append(self._sessions.popitem(last=False))
+            for old_target, _ in evicted:
+                self._health.pop(old_target, None)
+                self._breakers.pop(old_target, None)
+                self._timeouts.pop(old_target, None)
+        for old_target, old_session in evicted:
+            logger.info("Closing idle connection pool of %s", old_target)
+            old_session.close()
+            metrics.forget_circuit(old_target)
+        return session
+
+    def breaker_for(self, url: str) -> CircuitBreaker:
+        """Get the circuit breaker of the dev_container a URL points at."""
+        target = _target(url)
+        with self._lock:
+            breaker = self._breakers.get(target)
+            if breaker is None:
+                breaker = self._breakers[target] = self.breaker_factory(target)
+            return breaker
+
+    def timeouts_for(self, url: str) -> Timeouts:
+        """Get the request timeouts of the dev_container a URL points at."""
+        target = _target(url)
+        with self._lock:
+            timeouts = self._timeouts.get(target)
+            if timeouts is None:
+                timeouts = self._timeouts[target] = self.timeouts_factory(target)
+            return timeouts
+
+    def health(self) -> Dict[str, Dict[str, Any]]:
+        """Health of the dev_containers used so far, by target."""
+        with self._lock:
+            breakers = dict(self._breakers)
+            return {
+                target: {**asdict(health), "healthy": health.healthy, "circuit": breakers[target].state if target in breakers else CircuitState.CLOSED}
+                for target, health in self._health.items()
+            }
+
+    def _check_circuit(self, url: str) -> None:
+        """Fail fast while the circuit of a dev_container is open, probing it once the open period ends.
+
+        Raises:
+            DevContainerUnavailable: If the circuit is open or the probe failed
+        """
+        target = _target(url)
+        breaker = self.breaker_for(target)
+        try:
+            probe = breaker.before_call()
+        except CircuitOpen as e:
+            metrics.record_circuit_rejection(target)
+            raise DevContainerUnavailable(target, e.retry_after) from None
+        if not probe:
+            return
+
+        try:
+            healthy = self.session_for(target).get(f"{target}/server/status", timeout=self.probe_timeout).status_code < 500
+        except requests.exceptions.RequestException:
+            healthy = False
+        breaker.probe_finished(healthy)
+        metrics.record_circuit_state(target, breaker.state)
+        if not healthy:
+            metrics.record_circuit_rejection(target)
+            raise DevContainerUnavailable(target, breaker.retry_after())
+
+    def _record(self, url: str, error: Optional[str], duration: Optional[float]) -> None:
+        """Record the outcome of a request; ``duration`` is None for requests that are slow by nature."""
+        target = _target(url)
+        now = time.time()
+        breaker = self.breaker_for(target)
+        breaker.record(error is not None, duration or 0.0)
+        metrics.record_circuit_state(target, breaker.state)
+        with self._lock:
+            health = self._health.setdefault(target, TargetHealth())
+            health.requests += 1
+            if duration is not None:
+                latency_ms = duration * 1000
+                health.latency_ms = latency_ms if not health.latency_ms else 0.8 * health.latency_ms + 0.2 * latency_ms
+            if error is None:
+                health.consecutive_failures = 0
+                health.last_success_at = now
+            else:
+                health.failures += 1
+                health.consecutive_failures += 1
+                health.last_error = error
+                health.last_failure_at = now
+
+    def request(self, method: str, url: str, **kwargs: Any) -> requests.Response:
+        """Send a request unless the active run has been cancelled.
+
+        Raises:
+            RunCancelled: If the active run has been cancelled
+            DevContainerUnavailable: If the circuit of the dev_container is open
+            requests.exceptions.Timeout: If the dev_container did not answer in time
+        """
+        context = get_run_context()
+        context.cancellation.raise_if_cancelled()
+        with context.tracer.span(f"http {method}", category="http", url=url) as span:
+            if self.cassette is not None and self.cassette.replaying:
+                response = self._replay(method, url, kwargs)
+            else:
+                self._check_circuit(url)
+                started_at = time.perf_counter()
+                # Commands take as long as they take, so only API calls count towards latency
+                timed = not _is_execute(url)
+                # A request does not outlast the run's deadline
+                timeouts = self.timeouts_for(url)
+                kwargs.setdefault("timeout", timeouts.for_url(url, context.budget.remaining_seconds()))
+                try:
+                    response = self.session_for(url).request(method, url, **kwargs)
+                except requests.exceptions.RequestException as e:
+                    # Running out of the run's time is not a failure of the dev_container
+                    if not isinstance(e, requests.exceptions.Timeout) or kwargs["timeout"] == timeouts.for_url(url):
+                        self._record(url, str(e), time.perf_counter() - started_at if timed else None)
+                    raise
+                # Failed commands and missing files are 500s too; only gateway errors mean the container is down
+                error = f"HTTP {response.status_code}" if response.status_code in UNAVAILABLE_STATUSES else None
+                self._record(url, error, time.perf_counter() - started_at if timed else None)
+                if self.cassette is not None:
+                    self.cassette.record(
+                        "http",
+                        _http_request(method, url, kwargs),
+                        {"status": response.status_code, "content_type": response.headers.get("Content-Type"), "body": response.text},
+                        time.perf_counter() - started_at,
+                        summary=f"{method} {urlsplit(url).path}",
+                    )
+            span["status"] = response.status_code
+        return response
+
+    def get(self, url: str, **kwargs: Any) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs: Any) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def put(self, url: str, **kwargs: Any) -> requests.Response:
+        return self.request("PUT", url, **kwargs)
+
+    def delete(self, url: str, **kwargs: Any) -> requests.Response:
+        return self.request("DELETE", url, **kwargs)
+
+    def execute(self, base_url: str, command: str, args: List[str], read_only: bool = False) -> requests.Response:
+        """Run a command in the dev_container, killing it if the run is cancelled.
+
+        A read-only command is not reported as a change of the workspace by the
+        dev_container's change journal.
+
+        Raises:
+            RunCancelled: If the active run has been cancelled before the command starts
+            requests.exceptions.Timeout: If the command outlived the execute timeout;
+                it is killed
+        """
+        execution_id = uuid.uuid4().hex
+        headers = {"X-Execution-Id": execution_id}
+        if read_only:
+            headers["X-Read-Only"] = "true"
+        cancellation = get_run_context().cancellation
+        unregister = cancellation.add_callback(lambda reason: self._kill(base_url, execution_id))
+        try:
+            return self.post(
+                f"{base_url}/execute",
+                json={"command": command, "args": args},
+                headers=headers
+            )
+        except requests.exceptions.Timeout:
+            self._kill(base_url, execution_id)
+            raise
+        finally:
+            unregister()
+
+    def _replay(self, method: str, url: str, kwargs: Dict[str, Any]) -> requests.Response:
+        """Build the recorded response to a request.
+
+        Raises:
+            CassetteMiss: If the request was not recorded
+        """
+        entry = self.cassette.play("http", _http_request(method, url, kwargs))
+        self.cassette.wait(entry["duration"])
+        recorded = entry["response"]
+        response = requests.Response()
+        response.status_code = recorded["status"]
+        response.reason = http.client.responses.get(recorded["status"], "")
+        response.url = url
+        response.encoding = "utf-8"
+        response._content = recorded["body"].encode("utf-8")
+        if recorded.get("content_type"):
+            response.headers["Content-Type"] = recorded["content_type"]
+        return response
+
+    def _kill(self, base_url: str, execution_id: str) -> None:
+        """Ask the dev_container to kill a running command."""
+        try:
+            self.session_for(base_url).delete(f"{base_url}/execute/{execution_id}", timeout=5)
+        except requests.exceptions.RequestException as e:
+            logger.warning("Failed to kill command %s: %s", execution_id, e)
+
+def resolve_base_url(default: str) -> str:
+    """Address of the dev_container of the active run, as routed for its session."""
+    return get_run_context().dev_container_url or default
+
+def _target(url: str) -> str:
+    """Scheme, host and port of a URL, which identify a dev_container."""
+    parts = urlsplit(url)
+    return f"{parts.scheme}://{parts.netloc}"
+
+def _is_execute(url: str) -> bool:
+    return urlsplit(url).path.endswith("/execute")
+
+def _http_request(method: str, url: str, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+    """Canonical form of a dev_container request.
+
+    The host is left out so a recording can be replayed against any
+    dev_container address; per-call headers such as the execution id are
+    left out because they are random.
+    """
+    parts = urlsplit(url)
+    query = "&".join(part for part in (parts.query, urlencode(kwargs.get("params") or {})) if part)
+    return {
+        "method": method,
+        "path": parts.path + (f"?{query}" if query else ""),
+        "json": kwargs.get("json"),
+    }
+
+# Shared by all tools so connections to each dev_container are reused
+dev_container = DevContainerClient.from_env(get_cassette())
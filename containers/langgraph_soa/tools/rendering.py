@@ -0,0 +1,148 @@
+import json
+import logging
+import os
+import re
+from typing import Any, Callable, Dict, List
+
+from src.observability import metrics
+from src.runtime.context import get_run_context
+
+logger = logging.getLogger(__name__)
+
+# Tool result formats: the JSON the dev_container returns, or compact text
+JSON = "json"
+COMPACT = "compact"
+FORMATS = (JSON, COMPACT)
+
+# Lines of command output kept from its start and end
+HEAD_LINES = 40
+TAIL_LINES = 80
+
+_ANSI = re.compile(r"\x1b\[[0-9;?]*[A-Za-z]")
+# Rough tokenizer: words and single punctuation characters, close to how BPE splits code and JSON
+_TOKEN = re.compile(r"\w+|[^\w\s]")
+
+def result_format_for(llm_type: str) -> str:
+    """Tool result format for a provider.
+
+    TOOL_RESULT_FORMAT sets the default, TOOL_RESULT_FORMAT_<PROVIDER> (e.g.
+    TOOL_RESULT_FORMAT_OPENAI) overrides it for one provider.
+    """
+    value = os.getenv(f"TOOL_RESULT_FORMAT_{llm_type.upper()}") or os.getenv("TOOL_RESULT_FORMAT") or COMPACT
+    if value not in FORMATS:
+        logger.warning("Unknown tool result format %r for %s, using %s", value, llm_type, COMPACT)
+        return COMPACT
+    return value
+
+def estimate_tokens(text: str) -> int:
+    return len(_TOKEN.findall(text))
+
+def render(tool: str, verbose: str, compact: Callable[[], str]) -> str:
+    """Render a tool result in the active run's format.
+
+    Args:
+        tool: Name of the tool
+        verbose: The result as the dev_container returned it
+        compact: Builds the compact rendering of the result
+
+    Returns:
+        The compact rendering in compact runs, recording the tokens it saved,
+        else the verbose result
+    """
+    if get_run_context().tool_result_format != COMPACT:
+        return verbose
+    text = compact()
+    metrics.record_tool_result_tokens(tool, estimate_tokens(verbose), estimate_tokens(text))
+    return text
+
+def number_lines(content: str, start: int = 1) -> str:
+    """File content with each line prefixed by its number and a tab, like ``cat -n``."""
+    return "\n".join(f"{number}\t{line}" for number, line in enumerate(content.split("\n"), start))
+
+def compact_file_result(result: Any) -> str:
+    """Directory listings as one entry per line, file bodies as numbered lines."""
+    if isinstance(result, list):
+        return _listing(result)
+    if not isinstance(result, dict):
+        return json.dumps(result, separators=(",", ":"))
+    path = result.get("path", "")
+    if "matches" in result:
+        if not result["matches"]:
+            return f"{path}: no matching lines"
+        return "\n".join(
+            f"{path} lines {match['startLine']}-{match['endLine']}:\n{number_lines(match['content'], match['startLine'])}"
+            for match in result["matches"]
+        )
+    if "startLine" in result:
+        return f"{path} lines {result['startLine']}-{result['endLine']}:\n{number_lines(result['content'], result['startLine'])}"
+    if "offset" in result and "content" in result:
+        return f"{path} bytes {result['offset']}-{result['offset'] + result['length']} of {result.get('size')}:\n{result['content']}"
+    if "content" in result:
+        return number_lines(result["content"])
+    if result.get("truncated"):
+        outline = "\n".join(f"{entry['line']}\t{entry['text']}" for entry in result.get("outline") or [])
+        return (
+            f"{path}: {result.get('lines')} lines, {_size(result.get('size'))}, too large to show whole. "
+            f"Read a part with start_line/end_line or match. Outline:\n{outline}"
+        )
+    if "message" in result:
+        return result["message"]
+    if "size" in result:
+        return f"{path}: {_size(result['size'])}, modified {result.get('modified')}"
+    return json.dumps(result, separators=(",", ":"))
+
+def compact_command_output(stdout: str, stderr: str = "", exit_code: int = 0) -> str:
+    """Command output without terminal escapes and progress redraws, its middle cut if long."""
+    parts = []
+    if exit_code:
+        parts.append(f"Command exited with code {exit_code}")
+    for name, text in (("stdout", stdout), ("stderr", stderr)):
+        text = _trim(text or "")
+        if text:
+            parts.append(text if name == "stdout" else f"[stderr]\n{text}")
+    return "\n".join(parts) or "(no output)"
+
+def compact_test_report(report: Dict[str, Any]) -> str:
+    """Test run report as a status line and the failures."""
+    if report.get("status") not in ("passed", "failed"):
+        return json.dumps(report, separators=(",", ":"))
+    lines = [
+        f"{report['status']}: {report['passed']} passed, {report['failed']} failed "
+        f"({len(report['ran'])} files run, {len(report['cached'])} from earlier results)"
+    ]
+    lines.extend(f"{status.upper()} {path}" for path, status in report["files"].items() if status != "passed")
+    for failure in report["failures"]:
+        lines.append(f"--- {failure['test']}\n{failure['excerpt']}")
+    if report.get("more_failures"):
+        lines.append(f"... {report['more_failures']} more failures")
+    if report.get("changed_without_tests"):
+        lines.append(f"Changed without tests: {', '.join(report['changed_without_tests'])}")
+    return "\n".join(lines)
+
+def _listing(entries: List[Dict[str, Any]]) -> str:
+    if not entries:
+        return "(empty directory)"
+    entries = sorted(entries, key=lambda entry: (not entry.get("isDirectory"), entry.get("name", "")))
+    return "\n".join(
+        f"{entry['name']}/" if entry.get("isDirectory") else
+        f"{entry['name']}" if entry.get("size") is None else f"{entry['name']}  {_size(entry['size'])}"
+        for entry in entries
+    )
+
+def _size(size: Any) -> str:
+    if not isinstance(size, (int, float)):
+        return "?"
+    for unit in ("B", "K", "M"):
+        if size < 1024:
+            return f"{size:.0f}{unit}" if unit == "B" or size >= 10 else f"{size:.1f}{unit}"
+        size /= 1024
+    return f"{size:.1f}G"
+
+def _trim(text: str) -> str:
+    text = _ANSI.sub("", text)
+    # Progress bars redraw their line; keep what was drawn last
+    lines = [line.rsplit("\r", 1)[-1].rstrip() for line in text.rstrip().split("\n")]
+    if len(lines) > HEAD_LINES + TAIL_LINES:
+        omitted = len(lines) - HEAD_LINES - TAIL_LINES
+        lines = lines[:HEAD_LINES] + [f"... {omitted} lines omitted ..."] + lines[-TAIL_LINES:]
+    return "\n".join(lines)
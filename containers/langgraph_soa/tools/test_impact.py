@@ -0,0 +1,285 @@
+import json
+import logging
+import os
+import posixpath
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+# Test files by the naming conventions of pytest, jest and mocha
+_TEST_FILE = re.compile(r"(^|/)(test_[^/]+\.py|[^/]+_test\.py|[^/]+\.(test|spec)\.[cm]?[jt]sx?)$")
+_TEST_MARKERS = re.compile(r"^test_|_test$|\.(test|spec)$")
+# Files named after their directory rather than what they contain
+_PACKAGE_FILES = {"__init__", "index", "main", "mod"}
+
+FIND_TESTS_COMMAND = (
+    "find . -type d \\( -name node_modules -o -name .git -o -name .venv -o -name venv -o -name __pycache__ \\) -prune"
+    " -o -type f \\( -name 'test_*.py' -o -name '*_test.py' -o -name '*.test.*' -o -name '*.spec.*' \\) -print"
+)
+PYTEST_COMMAND = "python -m pytest -q -rA --tb=short -p no:cacheprovider --continue-on-collection-errors"
+JEST_COMMAND = "npx jest --ci --json"
+
+# Bounds on what a test run reports back to the model
+MAX_FAILURES = 10
+EXCERPT_CHARS = 800
+
+@dataclass
+class TestFileResult:
+    """Outcome of the tests in one test file."""
+    status: str
+    passed: int = 0
+    failed: int = 0
+    failures: List[Dict[str, str]] = field(default_factory=list)
+
+@dataclass
+class WorkspaceTests:
+    """What is known about the tests of one workspace."""
+    # Files written by the file tools since the tests affected by them last ran
+    changed: Set[str] = field(default_factory=set)
+    # Last result of each test file
+    results: Dict[str, TestFileResult] = field(default_factory=dict)
+    # Test files found in the workspace; None until discovered or after a test file changed
+    test_files: Optional[List[str]] = None
+    # Change journal of the workspace's dev_container, as of the last test run
+    journal_instance: Optional[str] = None
+    journal_version: int = 0
+
+class TestImpactTracker:
+    """Remembers file changes and test results per workspace.
+
+    The file tools record the paths they write, and the run_tests tool adds
+    those the dev_container's change journal reports, e.g. written by
+    commands. It maps them to the tests they affect and serves tests without
+    relevant changes from their last result. The ``max_workspaces`` most
+    recently used workspaces are kept.
+    """
+
+    def __init__(self, max_workspaces: int = 64):
+        self.max_workspaces = max_workspaces
+        self._workspaces: 'OrderedDict[str, WorkspaceTests]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> 'TestImpactTracker':
+        """Create a tracker sized by DEV_CONTAINER_MAX_TARGETS."""
+        return cls(max_workspaces=int(os.getenv("DEV_CONTAINER_MAX_TARGETS", "64")))
+
+    def workspace(self, base_url: str) -> WorkspaceTests:
+        """State of a workspace, created on first use."""
+        with self._lock:
+            workspace = self._workspaces.get(base_url)
+            if workspace is None:
+                workspace = self._workspaces[base_url] = WorkspaceTests()
+                while len(self._workspaces) > self.max_workspaces:
+                    self._workspaces.popitem(last=False)
+            self._workspaces.move_to_end(base_url)
+            return workspace
+
+    def record_change(self, base_url: str, *paths: str) -> None:
+        """Record files created, changed, deleted or moved in a workspace."""
+        workspace = self.workspace(base_url)
+        with self._lock:
+            for path in paths:
+                path = normalize_path(path)
+                if not path:
+                    continue
+                workspace.changed.add(path)
+                # New, moved or deleted test files, or a directory that may contain some
+                if is_test_file(path) or not posixpath.splitext(path)[1]:
+                    workspace.test_files = None
+
+    def apply_journal(self, base_url: str, journal: Dict[str, Any]) -> bool:
+        """Record the changes a dev_container's change journal reports since the last test run.
+
+        Changes the dev_container cannot attribute to paths, such as those of
+        commands and terminal input, reset the journal; anything may have
+        changed then, so every result is dropped.
+
+        Returns:
+            Whether the results were dropped
+        """
+        workspace = self.workspace(base_url)
+        with self._lock:
+            reset = bool(journal.get("reset")) or journal.get("instance") != workspace.journal_instance
+            if reset:
+                workspace.results.clear()
+                workspace.test_files = None
+            workspace.journal_instance = journal.get("instance")
+            workspace.journal_version = journal.get("version", workspace.journal_version)
+        self.record_change(base_url, *(change.get("path") or "" for change in journal.get("changes") or []))
+        return reset
+
+    def sync_journal(self, base_url: str, journal: Dict[str, Any]) -> None:
+        """Take a journal's version as seen without recording its changes, e.g. the writes of a test run itself."""
+        workspace = self.workspace(base_url)
+        with self._lock:
+            workspace.journal_instance = journal.get("instance")
+            workspace.journal_version = journal.get("version", workspace.journal_version)
+
+    def take_changes(self, base_url: str) -> List[str]:
+        """Files changed since the last test run, which are then considered tested."""
+        workspace = self.workspace(base_url)
+        with self._lock:
+            changed = sorted(workspace.changed)
+            workspace.changed.clear()
+            return changed
+
+_tracker: Optional[TestImpactTracker] = None
+_tracker_lock = threading.Lock()
+
+def get_test_impact_tracker() -> TestImpactTracker:
+    """Get the process-wide test impact tracker."""
+    global _tracker
+    with _tracker_lock:
+        if _tracker is None:
+            _tracker = TestImpactTracker.from_env()
+        return _tracker
+
+def normalize_path(path: str) -> str:
+    """Path relative to the app directory, as reported by find."""
+    path = posixpath.normpath((path or "").strip().lstrip("/"))
+    return "" if path in (".", "") else path[2:] if path.startswith("./") else path
+
+def is_test_file(path: str) -> bool:
+    return bool(_TEST_FILE.search(path))
+
+def module_name(path: str) -> str:
+    """Name a test or an import would use for a file, e.g. ``parser`` for src/parser/index.js."""
+    name = posixpath.splitext(posixpath.basename(path))[0]
+    name = _TEST_MARKERS.sub("", name)
+    if name in _PACKAGE_FILES:
+        name = posixpath.basename(posixpath.dirname(path)) or name
+    return name
+
+def affected_tests(changed: Iterable[str], test_files: Iterable[str], referencing: Optional[Dict[str, Set[str]]] = None) -> Dict[str, List[str]]:
+    """Map changed files to the test files they affect.
+
+    A changed test file affects itself; a source file affects the tests named
+    after it (``parser.py`` -> ``test_parser.py``, ``parser.test.js``) and
+    the tests that mention its module name, as found by a search.
+
+    Args:
+        changed: Paths of the changed files
+        test_files: Paths of the test files in the workspace
+        referencing: For each module name, the test files mentioning it
+
+    Returns:
+        For each changed file, the tests it affects; empty if none
+    """
+    test_files = list(test_files)
+    by_module: Dict[str, List[str]] = {}
+    for test in test_files:
+        by_module.setdefault(module_name(test), []).append(test)
+
+    affected: Dict[str, List[str]] = {}
+    for path in changed:
+        if is_test_file(path):
+            tests = [path] if path in test_files else []
+        else:
+            name = module_name(path)
+            tests = sorted(set(by_module.get(name, [])) | set((referencing or {}).get(name, ())))
+        affected[path] = tests
+    return affected
+
+def parse_pytest(output: str, test_files: Iterable[str]) -> Dict[str, TestFileResult]:
+    """Read the results of ``pytest -rA --tb=short`` per test file.
+
+    Returns:
+        Results of the test files, with status "error" for those not reported
+    """
+    excerpts = _traceback_sections(output)
+    results: Dict[str, TestFileResult] = {}
+    for line in output.splitlines():
+        match = re.match(r"^(PASSED|FAILED|ERROR) (\S+?)(?:::(\S+))?(?: - (.*))?$", line.strip())
+        if not match:
+            continue
+        outcome, path, test, message = match.groups()
+        result = results.setdefault(normalize_path(path), TestFileResult(status="passed"))
+        if outcome == "PASSED":
+            result.passed += 1
+            continue
+        result.status = "failed"
+        result.failed += 1
+        name = f"{path}::{test}" if test else path
+        section = excerpts.get((test or "").replace("::", "."), "") if test else excerpts.get(f"collecting {path}", "")
+        result.failures.append({"test": name, "excerpt": excerpt(section or message or "")})
+
+    # Files without any result did not run, e.g. because pytest is not installed
+    for path in test_files:
+        if path not in results:
+            results[path] = TestFileResult(status="error", failures=[{"test": path, "excerpt": excerpt(output)}])
+    return results
+
+def parse_jest(output: str, test_files: Iterable[str]) -> Dict[str, TestFileResult]:
+    """Read the results of ``jest --json`` per test file.
+
+    Returns:
+        Results of the test files that ran, empty if the output is not a jest report
+    """
+    start = output.find("{")
+    try:
+        # Anything jest logs to stderr follows the report
+        report = json.JSONDecoder().raw_decode(output[start:])[0] if start >= 0 else {}
+    except json.JSONDecodeError:
+        return {}
+    test_files = list(test_files)
+    results: Dict[str, TestFileResult] = {}
+    for suite in report.get("testResults") or []:
+        # Jest reports absolute paths
+        path = next((test for test in test_files if suite.get("name", "").endswith(f"/{test}")), normalize_path(suite.get("name", "")))
+        result = results[path] = TestFileResult(status="passed" if suite.get("status") == "passed" else "failed")
+        for assertion in suite.get("assertionResults") or []:
+            if assertion.get("status") == "passed":
+                result.passed += 1
+            elif assertion.get("status") == "failed":
+                result.failed += 1
+                result.failures.append({"test": f"{path}::{assertion.get('fullName')}", "excerpt": excerpt("\n".join(assertion.get("failureMessages") or []))})
+        if result.status == "failed" and not result.failures:
+            # The suite failed to run, e.g. a syntax error
+            result.failed = max(result.failed, 1)
+            result.failures.append({"test": path, "excerpt": excerpt(suite.get("message") or "")})
+    return results
+
+def summarize(results: Dict[str, TestFileResult], ran: Iterable[str], cached: Iterable[str], untested: Iterable[str]) -> Dict[str, object]:
+    """Compact report of a test run for the model."""
+    failures = [failure for result in results.values() for failure in result.failures]
+    summary = {
+        "status": "failed" if any(result.status != "passed" for result in results.values()) else "passed",
+        "passed": sum(result.passed for result in results.values()),
+        "failed": sum(result.failed for result in results.values()),
+        "files": {path: result.status for path, result in sorted(results.items())},
+        "ran": sorted(ran),
+        "cached": sorted(cached),
+        "failures": failures[:MAX_FAILURES],
+    }
+    if len(failures) > MAX_FAILURES:
+        summary["more_failures"] = len(failures) - MAX_FAILURES
+    untested = sorted(untested)
+    if untested:
+        summary["changed_without_tests"] = untested
+    return summary
+
+def excerpt(text: str) -> str:
+    """End of a failure report, where the assertion and error are."""
+    text = text.strip()
+    return text if len(text) <= EXCERPT_CHARS else "..." + text[-EXCERPT_CHARS:]
+
+def _traceback_sections(output: str) -> Dict[str, str]:
+    """Sections of pytest's failure and error reports, by test name."""
+    sections: Dict[str, str] = {}
+    name, lines = None, []
+    for line in output.splitlines():
+        header = re.match(r"^_{3,} (?:ERROR at setup of |ERROR )?(.+?) _{3,}$", line)
+        if header or re.match(r"^={3,}", line):
+            if name:
+                sections[name] = "\n".join(lines)
+            name, lines = (header.group(1) if header else None), []
+        elif name:
+            lines.append(line)
+    if name:
+        sections[name] = "\n".join(lines)
+    return sections
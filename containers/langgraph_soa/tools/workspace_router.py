@@ -0,0 +1,164 @@
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+from urllib.parse import urlsplit
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+# Port of the dev_container API inside the container
+DEV_CONTAINER_API_PORT = 4000
+
+def default_dev_container_url() -> str:
+    """Dev_container used by sessions without a target of their own."""
+    return os.getenv("DEV_CONTAINER_URL", "http://host.docker.internal:8030").rstrip("/")
+
+def _check_url(url: str) -> str:
+    if not isinstance(url, str) or not url.startswith(("http://", "https://")):
+        raise ValueError(f"workspace must be an http(s) URL of a dev_container, got {url!r}")
+    return url.rstrip("/")
+
+class WorkspaceRouter:
+    """Decides which dev_container the tools of a session talk to.
+
+    A session is bound to a target the first time it names one, either as a
+    dev_container URL or as the id of a container created by the
+    container_orchestrator, and keeps it for later runs and resumes. Sessions
+    that never name a target use ``DEV_CONTAINER_ROUTES`` or the default.
+
+    Bindings are kept for the ``max_sessions`` most recently used sessions,
+    never dropping those ``in_use`` reports active. A session without a
+    binding, after a restart or once dropped, gets the target ``recall``
+    finds recorded with its runs before falling back to the routes.
+    """
+
+    def __init__(
+        self,
+        default_url: Optional[str] = None,
+        routes: Optional[Dict[str, str]] = None,
+        orchestrator_url: Optional[str] = None,
+        container_host: Optional[str] = None,
+        max_sessions: int = 10000,
+        recall: Optional[Callable[[str], Optional[str]]] = None,
+        in_use: Optional[Callable[[str], bool]] = None,
+    ):
+        self.default_url = _check_url(default_url or default_dev_container_url())
+        self.routes = {session_id: _check_url(url) for session_id, url in (routes or {}).items()}
+        self.orchestrator_url = orchestrator_url.rstrip("/") if orchestrator_url else None
+        # Host the orchestrator publishes container ports on
+        self.container_host = container_host or (urlsplit(self.orchestrator_url).hostname if self.orchestrator_url else None)
+        self.max_sessions = max_sessions
+        self.recall = recall
+        self.in_use = in_use
+        self._bindings: 'OrderedDict[str, str]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> 'WorkspaceRouter':
+        """Create a router configured from the environment.
+
+        DEV_CONTAINER_ROUTES maps sessions to dev_containers, e.g.
+        "alice=http://dev-1:8030,bob=http://dev-2:8030"; ORCHESTRATOR_URL
+        enables targets given as container ids.
+        """
+        routes = {}
+        for item in os.getenv("DEV_CONTAINER_ROUTES", "").split(","):
+            if item.strip():
+                session_id, _, url = item.partition("=")
+                routes[session_id.strip()] = url.strip()
+        return cls(
+            routes=routes,
+            orchestrator_url=os.getenv("ORCHESTRATOR_URL") or None,
+            container_host=os.getenv("ORCHESTRATOR_CONTAINER_HOST") or None,
+        )
+
+    def resolve(self, session_id: str, workspace: Optional[str] = None, container_id: Optional[str] = None) -> str:
+        """Get the dev_container of a session, binding it to a new target if one is given.
+
+        Args:
+            session_id: Session the run belongs to
+            workspace: URL of a dev_container
+            container_id: Id or name of a container created by the orchestrator
+
+        Returns:
+            Base URL of the dev_container API
+
+        Raises:
+            ValueError: If the target is invalid or the container cannot be found
+        """
+        if workspace:
+            target = _check_url(workspace)
+        elif container_id:
+            target = self._lookup_container(container_id)
+        else:
+            with self._lock:
+                bound = self._bindings.get(session_id)
+                if bound:
+                    self._bindings.move_to_end(session_id)
+                    return bound
+            recalled = self.recall(session_id) if self.recall else None
+            if not recalled:
+                return self.routes.get(session_id, self.default_url)
+            logger.info("Session %s continues on its recorded dev_container %s", session_id, recalled)
+            target = recalled
+
+        with self._lock:
+            self._bindings[session_id] = target
+            self._bindings.move_to_end(session_id)
+            self._evict()
+        logger.info("Session %s uses dev_container %s", session_id, target)
+        return target
+
+    def release(self, session_id: str) -> None:
+        """Forget the target of a session."""
+        with self._lock:
+            self._bindings.pop(session_id, None)
+
+    def bindings(self) -> Dict[str, str]:
+        """Targets of the sessions bound so far."""
+        with self._lock:
+            return dict(self._bindings)
+
+    def _evict(self) -> None:
+        """Forget the least recently used bindings of idle sessions beyond max_sessions."""
+        excess = len(self._bindings) - self.max_sessions
+        for session_id in list(self._bindings):
+            if excess <= 0:
+                break
+            if self.in_use and self.in_use(session_id):
+                continue
+            del self._bindings[session_id]
+            excess -= 1
+
+    def _lookup_container(self, container_id: str) -> str:
+        """Find the published dev_container API port of an orchestrator container."""
+        if not self.orchestrator_url:
+            raise ValueError("container_id requires ORCHESTRATOR_URL to be configured")
+        try:
+            response = requests.get(f"{self.orchestrator_url}/api/containers", timeout=5)
+            response.raise_for_status()
+            containers: List[Dict[str, Any]] = response.json()
+        except (requests.exceptions.RequestException, ValueError) as e:
+            raise ValueError(f"Failed to look up container {container_id}: {e}") from e
+
+        for container in containers:
+            if container.get("name") == container_id or str(container.get("id", "")).startswith(container_id):
+                for port in container.get("ports", []):
+                    if port.get("internal") == DEV_CONTAINER_API_PORT and port.get("external"):
+                        return f"http://{self.container_host}:{port['external']}"
+                raise ValueError(f"Container {container_id} does not publish the dev_container API")
+        raise ValueError(f"Container {container_id} is not running")
+
+_router: Optional[WorkspaceRouter] = None
+_router_lock = threading.Lock()
+
+def get_workspace_router() -> WorkspaceRouter:
+    """Get the process-wide workspace router configured in the environment."""
+    global _router
+    with _router_lock:
+        if _router is None:
+            _router = WorkspaceRouter.from_env()
+        return _router